@@ -17,33 +17,85 @@
 # limitations under the License.
 #
 import copy
+import hashlib
 import logging
-import sys
-from typing import Optional
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, List, Optional, Tuple
 
 import numpy as np
 import torch
 import tvm
 import tvm.relay
-from hannah.backends.base import AbstractBackend
+from hannah.backends.base import AbstractBackend, ProfilingResult
 from hannah.modules.base import ClassifierModule
-from tvm.auto_scheduler.measure import prepare_input_map
-from tvm.contrib import utils
-from tvm.micro.testing.aot_test_utils import AOT_DEFAULT_RUNNER
-from tvm.testing.aot import AOTTestModel, compile_and_run, generate_ref_data
 
 from hannah_tvm.connectors import init_board_connector
 
-from . import pass_instrument
 from .config import Board, TunerConfig
 from .export import build_relay
 from .passes.legalize import LegalizeQuantizedTypes
-from .task import ModelConfig, TuningTask
-from .tracer import QuantizationTracer, RelayConverter
+from .task import ModelConfig, TaskStatus, TuningTask
+from .utils.dlpack import to_torch, to_tvm
 
 logger = logging.getLogger(__name__)
 
 
+@dataclass
+class PreparedModel:
+    """A model that has been converted, tuned and built for the target"""
+
+    weights_hash: str
+    task: TuningTask
+    torch_model: Any
+    input_names: List[str]
+    input_shapes: List[tuple]
+    input_dtypes: List[str]
+    executors: Any = None
+    device: Any = None
+
+
+def _tensor_bytes(tensor: torch.Tensor) -> bytes:
+    tensor = tensor.detach().cpu().contiguous()
+    if tensor.is_quantized:
+        tensor = tensor.int_repr()
+    try:
+        return tensor.numpy().tobytes()
+    except TypeError:
+        return tensor.float().numpy().tobytes()
+
+
+def model_hashes(module: ClassifierModule) -> Tuple[str, str]:
+    """Calculate the hashes identifying the architecture and the weights of a module
+
+    The architecture hash covers the module structure, the shapes and types of
+    its state and the shape of the example input. The weights hash covers the
+    values of the state dict.
+
+    Returns:
+        Tuple[str, str]: architecture hash and weights hash
+    """
+    arch_hash = hashlib.sha256()
+    weights_hash = hashlib.sha256()
+
+    arch_hash.update(str(module.model).encode())
+    arch_hash.update(str(tuple(module.example_feature_array.shape)).encode())
+    arch_hash.update(str(module.example_feature_array.dtype).encode())
+
+    for name, value in module.model.state_dict().items():
+        if isinstance(value, torch.Tensor):
+            arch_hash.update(f"{name}:{tuple(value.shape)}:{value.dtype}".encode())
+            weights_hash.update(_tensor_bytes(value))
+        else:
+            arch_hash.update(name.encode())
+            weights_hash.update(repr(value).encode())
+
+    return arch_hash.hexdigest(), weights_hash.hexdigest()
+
+
 class TVMBackend(AbstractBackend):
     """Inference backend for tvm"""
 
@@ -51,33 +103,68 @@ class TVMBackend(AbstractBackend):
         self,
         board: Board,
         tuner: Optional[TunerConfig] = None,
+        pipeline_depth: int = 1,
+        cache_size: int = 4,
+        rebind_weights: bool = False,
     ) -> None:
         """Instantiate the tvm backend for a target board and tuner configuration
 
         Args:
             board (BoardConfig): Target board description
             tuner (TunerConfig): Tuner configuration
+            pipeline_depth (int): Number of graph executors running batches concurrently
+            cache_size (int): Number of prepared model architectures kept for reuse across calls of prepare
+            rebind_weights (bool): Build models without linking their parameters, so that new weights
+                for a prepared architecture are set on the existing executors instead of recompiling
         """
         super().__init__()
 
         self.torch_model = None
         self.board_config = board
         self.tuner_config = tuner
+        self.pipeline_depth = pipeline_depth
+        self.cache_size = cache_size
+        self.rebind_weights = rebind_weights
         self.task = None
-        
+
+        self._input_names: List[str] = []
+        self._input_shapes: List[tuple] = []
+        self._input_dtypes: List[str] = []
+        self._executors = None
+        self._device = None
+        self._prepared: "OrderedDict[str, PreparedModel]" = OrderedDict()
+
     def available(self) -> bool:
         return True
 
     def prepare(self, module: ClassifierModule):
         logging.info("Preparing model for target")
-        
-        model = copy.deepcopy(module)
-        model.eval()
-        model.cpu()
+
+        arch_hash, weights_hash = model_hashes(module)
+        prepared = self._prepared.get(arch_hash, None)
+        if prepared is not None and prepared.weights_hash == weights_hash:
+            logger.info("Reusing prepared model %s", arch_hash[:12])
+            self._prepared.move_to_end(arch_hash)
+            self._activate(prepared)
+            return
+
+        model = self._copy_model(module)
+
+        if prepared is not None and not prepared.task.params_bound:
+            logger.info("Updating weights of prepared model %s", arch_hash[:12])
+            _, params = self._build_relay(model)
+            prepared.task.update_params(params)
+            for executor, _ in prepared.executors:
+                prepared.task.set_params(executor)
+            prepared.weights_hash = weights_hash
+            prepared.torch_model = model
+            self._prepared.move_to_end(arch_hash)
+            self._activate(prepared)
+            return
 
         self.torch_model = model
 
-        mod, params = build_relay(model.model, model.example_feature_array)
+        mod, params = self._build_relay(model)
         mod = tvm.relay.transform.InferType()(mod)
 
         try:
@@ -92,15 +179,23 @@ class TVMBackend(AbstractBackend):
 
         input_names = []
         input_types = []
+        input_shapes = []
         for gvar, func in mod.functions.items():
             if gvar.name_hint == "main":
                 for param in func.params:
                     if param.name_hint not in params:
                         input_names.append(param.name_hint)
                         input_types.append(param.type_annotation.dtype)
+                        input_shapes.append(
+                            tuple(int(d) for d in param.type_annotation.shape)
+                        )
 
         assert len(input_names) == 1
 
+        self._input_names = input_names
+        self._input_dtypes = input_types
+        self._input_shapes = input_shapes
+
         input = model.example_feature_array.detach()
 
         if hasattr(model, "normalizer"):
@@ -108,40 +203,194 @@ class TVMBackend(AbstractBackend):
         input = input.numpy()
         input = input.astype(input_types[0])
 
-        model_config = ModelConfig(mod, params, {input_names[0]: input})
-        model_key = "backend_model"
+        model_config = ModelConfig(
+            mod, params, {input_names[0]: input}, bind_params=not self.rebind_weights
+        )
+        model_key = f"backend_model_{arch_hash[:12]}"
 
+        # Same architecture with new weights yields the same tuning tasks
         self.task = TuningTask(
             board_config=self.board_config,
             model_key=model_key,
             model_config=model_config,
             task_connector=task_connector,
             tuner=self.tuner_config,
+            reuse_tuning_log=prepared is not None,
         )
-        
+
         self.task.run()
 
+        if self.task.status != TaskStatus.FINISHED:
+            raise Exception(
+                f"Building model for {self.board_config.name} failed: {self.task.results['error']}"
+            )
+
+        self._init_executors()
+
+        self._prepared[arch_hash] = PreparedModel(
+            weights_hash=weights_hash,
+            task=self.task,
+            torch_model=self.torch_model,
+            input_names=self._input_names,
+            input_shapes=self._input_shapes,
+            input_dtypes=self._input_dtypes,
+            executors=self._executors,
+            device=self._device,
+        )
+        self._prepared.move_to_end(arch_hash)
+        while len(self._prepared) > max(0, self.cache_size):
+            self._prepared.popitem(last=False)
+
+    def _build_relay(self, model: ClassifierModule):
+        micro_config = self.board_config.get("micro", None)
+        pack_weights = bool(micro_config and micro_config.get("pack_weights", False))
+        return build_relay(
+            model.model, model.example_feature_array, pack_weights=pack_weights
+        )
+
+    def _copy_model(self, module: ClassifierModule) -> ClassifierModule:
+        model = copy.deepcopy(module)
+        model.eval()
+        model.cpu()
+        return model
+
+    def _activate(self, prepared: PreparedModel):
+        """Make a cached prepared model the one used by run and profile"""
+        self.task = prepared.task
+        self.torch_model = prepared.torch_model
+        self._input_names = prepared.input_names
+        self._input_shapes = prepared.input_shapes
+        self._input_dtypes = prepared.input_dtypes
+        self._executors = prepared.executors
+        self._device = prepared.device
+
+    def _init_executors(self):
+        """Create the graph executors and preallocate their output arrays"""
+        self._executors = []
+        for _ in range(max(1, self.pipeline_depth)):
+            module, dev = self.task.executor()
+            outputs = []
+            for num in range(module.get_num_outputs()):
+                output = module.get_output(num)
+                outputs.append(tvm.nd.empty(output.shape, output.dtype, dev))
+            self._executors.append((module, outputs))
+            self._device = dev
+
+    def _run_batches(self, inputs):
+        """Run inputs through the compiled model in batches of the compiled batch size
+
+        Returns:
+            Tuple[List[torch.Tensor], List[float]]: the outputs, and the latencies of each batch in us
+        """
+        if self._executors is None:
+            raise Exception("TVMBackend.prepare must be called before running inputs")
+        if len(inputs) != len(self._input_names):
+            raise Exception(
+                f"Expected {len(self._input_names)} inputs but got {len(inputs)}"
+            )
+
+        batch_size = self._input_shapes[0][0]
+        total_size = inputs[0].shape[0]
+        starts = list(range(0, total_size, batch_size))
+
+        results = [None] * len(self._executors[0][1])
+        # Concurrent executors must not allocate the same output twice
+        results_lock = threading.Lock()
+        latencies = [0.0] * len(starts)
+
+        def run_batch(num, executor):
+            module, outputs = executor
+            start = starts[num]
+            valid = min(batch_size, total_size - start)
+            for name, dtype, shape, input in zip(
+                self._input_names, self._input_dtypes, self._input_shapes, inputs
+            ):
+                batch = input[start : start + valid]
+                if valid < batch_size:
+                    padding = batch.new_zeros((batch_size - valid,) + tuple(shape[1:]))
+                    batch = torch.cat([batch, padding])
+                module.set_input(name, to_tvm(batch, dtype))
+
+            start_time = time.perf_counter()
+            module.run()
+            self._device.sync()
+            latencies[num] = (time.perf_counter() - start_time) * 1e6
+
+            for out_num, output in enumerate(outputs):
+                module.get_output(out_num, output)
+                output_tensor = to_torch(output)
+                with results_lock:
+                    if results[out_num] is None:
+                        results[out_num] = output_tensor.new_empty(
+                            (total_size,) + tuple(output_tensor.shape[1:]),
+                            device="cpu",
+                        )
+                results[out_num][start : start + valid].copy_(output_tensor[:valid])
+
+        def run_executor(executor_num):
+            executor = self._executors[executor_num]
+            for num in range(executor_num, len(starts), len(self._executors)):
+                run_batch(num, executor)
+
+        if len(self._executors) == 1 or len(starts) == 1:
+            for num in range(len(starts)):
+                run_batch(num, self._executors[0])
+        else:
+            with ThreadPoolExecutor(len(self._executors)) as pool:
+                futures = [
+                    pool.submit(run_executor, executor_num)
+                    for executor_num in range(len(self._executors))
+                ]
+                for future in futures:
+                    future.result()
+
+        return results, latencies
 
     def run(self, *inputs):
-        for input in inputs:
-            # Create ndarray from tensor
-            input_nd = tvm.nd.array(input.numpy(), device=self.task.device())
-            
-               
-            
+        outputs, _ = self._run_batches(inputs)
+        return outputs[0] if len(outputs) == 1 else outputs
+
     def profile(self, *inputs):
-        return self.run(*inputs)
+        """Run inputs like run and report the latency of each executed batch in us"""
+        outputs, latencies = self._run_batches(inputs)
+        outputs = outputs[0] if len(outputs) == 1 else outputs
+
+        metrics = {
+            "duration": float(np.sum(latencies)),
+            "batch_latency_mean": float(np.mean(latencies)),
+            "batch_latency_stdev": float(np.std(latencies)),
+        }
+
+        return ProfilingResult(
+            outputs=outputs, metrics=metrics, profile={"batch_latencies": latencies}
+        )
 
-    
     def __getstate__(self):
         "Do not pickle and copy auto generated values"
-        state = self.__dict__
+        state = self.__dict__.copy()
 
         if "_connector" in state:
             state.pop("_connector")
         if "_task" in state:
             state.pop("_task")
+        if "task" in state:
+            state.pop("task")
         if "torch_model" in state:
             state.pop("torch_model")
+        if "_executors" in state:
+            state.pop("_executors")
+        if "_device" in state:
+            state.pop("_device")
+        if "_prepared" in state:
+            state.pop("_prepared")
 
         return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        # Prepared models are not copied, prepare has to be called again
+        self.task = None
+        self.torch_model = None
+        self._executors = None
+        self._device = None
+        self._prepared = OrderedDict()
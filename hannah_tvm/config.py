@@ -55,7 +55,8 @@ class AOTConfig:
     # FIXME: support linkage sections
     # data_linkage: AOTDataLinkage = None
     use_workspace_io: bool = False
-    workspace_bytes: int = 256 * 1024
+    # None: use the workspace size planned during the build
+    workspace_bytes: Optional[int] = None
 
 
 @dataclass
@@ -70,6 +71,48 @@ class MicroConfig:
     include_dirs: List[str] = field(default_factory=list)
     libs: List[str] = field(default_factory=list)
     aot: Optional[AOTConfig] = None
+    # RAM available for workspace and io, models exceeding it are rejected before building
+    ram_bytes: Optional[int] = None
+    # Flash available for constants, models exceeding it are rejected before building
+    flash_bytes: Optional[int] = None
+    pack_weights: bool = False  # Store weights of 4 bits or less packed, trading flash for an unpack buffer in RAM
+
+
+@dataclass
+class ThroughputConfig:
+    """Multi stream throughput measurement, the batch size is set by the model config"""
+
+    streams: int = 2  # Number of concurrently running graph executors
+    duration_s: float = 10.0
+    warmup_runs: int = 5
+    affinity_mode: int = 0  # runtime.config_threadpool mode of each stream: 1 big cores, -1 little cores, 0 default
+    # Threadpool size of each stream, 0 uses the tvm default
+    threads_per_stream: int = 0
+
+
+@dataclass
+class ThreadSweepConfig:
+    """Threadpool configurations measured in addition to the default configuration
+
+    Affinity modes are those of runtime.config_threadpool: 1 big cores, -1 little cores,
+    0 default, -2 one thread per core of a cpu set and -3 all threads share a cpu set.
+    """
+
+    num_threads: List[int] = field(default_factory=lambda: [1, 2, 4])
+    affinity_modes: List[int] = field(default_factory=lambda: [0])
+    # Core affinity masks used with modes -2 and -3
+    cpu_sets: List[List[int]] = field(default_factory=list)
+
+
+@dataclass
+class PowerConfig:
+    """Power rails sampled during measurements"""
+
+    # Rail name to file on the board containing its current power draw, e.g. INA3221 sysfs nodes
+    rails: Dict[str, str] = field(default_factory=dict)
+    # Conversion of the file contents to W, the default is for files in mW
+    scale: float = 1e-3
+    interval_s: float = 0.05
 
 
 @dataclass
@@ -90,13 +133,39 @@ class Board:
     rpc_runner: Optional[str] = None
     disable_vectorize: Optional[bool] = None
     connector: str = "default"
+    # Target names of the uma backends registered and partitioned for
+    uma_backends: List[str] = field(default_factory=list)
+    # Peak compute throughput in GOP/s, used for roofline analysis
+    peak_gops: Optional[float] = None
+    # Peak memory bandwidth in GB/s, used for roofline analysis
+    peak_bandwidth: Optional[float] = None
+    # Additionally measure multi stream throughput
+    throughput: Optional[ThroughputConfig] = None
+    # Additionally measure with different threadpool configurations
+    thread_sweep: Optional[ThreadSweepConfig] = None
+    power: Optional[PowerConfig] = None  # Measure power and energy per inference
+    # Attach to the tracker of a hannah-tvm-daemon on this host instead of starting tracker and server
+    daemon_port: Optional[int] = None
 
 
 @dataclass
 class Model:
     url: str = MISSING
     filename: Optional[str] = None
-    input_shapes: Any = None  # Input shapes for models from sources that do not encode input shapes e.g. PyTorch/TorchScript
+    # Expected hash of remote model files, checked when they are downloaded to the model cache
+    sha256: Optional[str] = None
+    input_shapes: Any = None  # Input shapes for models from sources that do not encode input shapes e.g. PyTorch/TorchScript, overrides the shapes of other models
+    batch_size: Optional[int] = None  # Overrides the leading dimension of all inputs
+    # Sweep: measure the model once per batch size
+    batch_sizes: Optional[List[int]] = None
+    # Sweep: measure the model once per entry, each entry is used as input_shapes
+    input_shape_sweep: Optional[List[Any]] = None
+    input_data: Any = None  # Representative inputs used for measurements instead of random data, see hannah_tvm.inputs
+    # Maximum number of samples from input_data measured, None: 8 and 1 on micro boards, 0 measures all
+    num_input_samples: Optional[int] = None
+    check: bool = True  # Run the onnx model checker, results are cached per model file
+    # Run onnx shape inference, the inferred model is cached per model file
+    infer_shapes: bool = True
 
 
 @dataclass
@@ -118,10 +187,23 @@ class BackendConfig:
     tune: bool = False
 
 
+@dataclass
+class DaemonConfig:
+    """Configuration of hannah-tvm-daemon"""
+
+    port: int = 9190  # Tracker port tuning runs attach to
+    # Board configs served in addition to backend.board
+    boards: List[str] = field(default_factory=list)
+    health_check_interval_s: float = 30.0
+    # Restart servers not registered at the tracker for this long
+    registration_timeout_s: float = 600.0
+
+
 @dataclass
 class Config:
     model: Dict[str, Model] = MISSING
     backend: BackendConfig = MISSING
+    daemon: DaemonConfig = field(default_factory=DaemonConfig)
 
 
 cs = ConfigStore.instance()
@@ -16,26 +16,44 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 #
+import importlib
 import logging
 
-from .automate import AutomateBoardConnector
 from .core import BoardConnector
-from .local import LocalBoardConnector
-from .micro import MicroTVMBoardConnector
 
 logger = logging.getLogger(__name__)
 
+# Connectors are imported on first use, they pull in tuner and target specific modules
+_CONNECTORS = {
+    "AutomateBoardConnector": ".automate",
+    "LocalBoardConnector": ".local",
+    "MicroTVMBoardConnector": ".micro",
+}
+
+
+def __getattr__(name):
+    if name in _CONNECTORS:
+        module = importlib.import_module(_CONNECTORS[name], __name__)
+        return getattr(module, name)
+    raise AttributeError(f"module {__name__} has no attribute {name}")
+
 
 def init_board_connector(board_config) -> BoardConnector:
     logger.info("initializing board connector")
     logger.debug("Board Config: %s", str(board_config))
     if board_config.connector == "local":
+        from .local import LocalBoardConnector
+
         connector = LocalBoardConnector(board_config)
     elif board_config.connector == "micro" or (
         board_config.connector == "default" and board_config.micro
     ):
+        from .micro import MicroTVMBoardConnector
+
         connector = MicroTVMBoardConnector(board_config)
     elif board_config.connector == "automate" or board_config.connector == "default":
+        from .automate import AutomateBoardConnector
+
         connector = AutomateBoardConnector(board_config)
     else:
         raise Exception(
@@ -17,6 +17,7 @@
 # limitations under the License.
 #
 import logging
+import shlex
 import time
 from dataclasses import dataclass
 from typing import Any, Union
@@ -25,11 +26,13 @@ import numpy as np
 import tvm
 import tvm.auto_scheduler as auto_scheduler
 import tvm.autotvm as autotvm
-import tvm.meta_schedule as ms
 import tvm.rpc as rpc
 
-from .automate_server import AutomateServer, automate_context
+from ..utils.dlpack import to_tvm
+from .automate_server import AutomateServer, automate_context, registered_servers
 from .core import BoardConnector, BuildArtifactHandle, TaskConnector
+from .power import FilePowerSensor
+from .throughput import run_streams
 
 logger = logging.getLogger(__name__)
 
@@ -41,6 +44,27 @@ class AutomateBuildArtifactHandle(BuildArtifactHandle):
     lib: Any
 
 
+class AutomatePowerSensor(FilePowerSensor):
+    """Power rails read from files on the board over an ssh connection"""
+
+    def __init__(self, connection, rails, scale=1e-3):
+        super().__init__(rails, scale=scale)
+        self.connection = connection
+
+    def read(self):
+        # Read all rails with a single command to keep the sampling interval short
+        paths = " ".join(shlex.quote(path) for path in self.rails.values())
+        values = self.connection.run(f"cat {paths}", hide=True).stdout.split()
+        if len(values) != len(self.rails):
+            raise Exception(f"Could not read power rails: {' '.join(values)}")
+        return {
+            rail: float(value) * self.scale for rail, value in zip(self.rails, values)
+        }
+
+    def close(self):
+        self.connection.close()
+
+
 class AutomateTaskConnector(TaskConnector):
     def __init__(self, board_config, tracker_port):
         self._board_config = board_config
@@ -71,6 +95,8 @@ class AutomateTaskConnector(TaskConnector):
                 key=self._board_config.name, host="127.0.0.1", port=self._tracker_port
             )
         elif tuner == "meta_scheduler":
+            import tvm.meta_schedule as ms
+
             rpc_config = ms.runner.RPCConfig(
                 tracker_key=self._board_config.name,
                 tracker_host="127.0.0.1",
@@ -89,6 +115,8 @@ class AutomateTaskConnector(TaskConnector):
         elif tuner == "auto_scheduler":
             builder = "local"
         elif tuner == "meta_scheduler":
+            import tvm.meta_schedule as ms
+
             builder = ms.builder.LocalBuilder()
 
         return builder
@@ -111,14 +139,17 @@ class AutomateTaskConnector(TaskConnector):
         logger.info("Upload finished")
         return AutomateBuildArtifactHandle(remote, rlib, lib)
 
-    def measure(self, remote_handle, inputs, reference_outputs):
+    def executor(self, remote_handle):
         dev = self._remote_dev(remote_handle.remote)
         rlib = remote_handle.rlib
-        lib = remote_handle.lib
         module = tvm.contrib.graph_executor.GraphModule(rlib["default"](dev))
+        return module, dev
+
+    def measure(self, remote_handle, inputs, reference_outputs):
+        module, dev = self.executor(remote_handle)
         logger.info("Set inputs")
         for name, val in inputs.items():
-            data_tvm = tvm.nd.array(val)
+            data_tvm = to_tvm(val)
             module.set_input(name, data_tvm)
 
         # Evaluate on Graph Executor
@@ -129,16 +160,86 @@ class AutomateTaskConnector(TaskConnector):
 
         return prof_res
 
+    def power_sensor(self, remote_handle):
+        power_config = self._board_config.get("power", None)
+        if power_config is None:
+            return None
+
+        # The rpc session of the handle is blocked while measuring, and the rpc
+        # servers are busy, so the sensors are read through a separate ssh connection
+        connection = automate_context().board(self._board_config.name).connect()
+        return AutomatePowerSensor(
+            connection, power_config.rails, scale=power_config.scale
+        )
+
+    def configure_threadpool(
+        self, remote_handle, affinity_mode, num_threads, cpus=None
+    ):
+        # The rpc session executes all calls in one thread of its server process
+        config_threadpool = remote_handle.remote.get_function(
+            "runtime.config_threadpool"
+        )
+        if cpus:
+            config_threadpool(affinity_mode, num_threads, [str(cpu) for cpu in cpus])
+        else:
+            config_threadpool(affinity_mode, num_threads)
+
+    def measure_throughput(self, remote_handle, inputs, config):
+        # Fail instead of waiting in the tracker queue for servers that do not exist,
+        # the session of remote_handle already holds one of the board's servers
+        free_servers = self._free_servers()
+        if free_servers < config.streams:
+            raise Exception(
+                f"Measuring throughput with {config.streams} streams needs as many idle rpc servers, "
+                f"but only {free_servers} servers of board {self._board_config.name} are free"
+            )
+
+        tmp = tvm.contrib.utils.tempdir()
+        filename = "net.tar"
+        remote_handle.lib.export_library(tmp.relpath(filename))
+
+        def stream():
+            # Each stream uses its own rpc session, which is served by a separate rpc server
+            remote = auto_scheduler.utils.request_remote(
+                self._board_config.name, "127.0.0.1", self._tracker_port, timeout=10000
+            )
+            remote.upload(tmp.relpath(filename))
+            rlib = remote.load_module(filename)
+            if config.affinity_mode != 0 or config.threads_per_stream != 0:
+                remote.get_function("runtime.config_threadpool")(
+                    config.affinity_mode, config.threads_per_stream
+                )
+            dev = self._remote_dev(remote)
+            module = tvm.contrib.graph_executor.GraphModule(rlib["default"](dev))
+            for name, val in inputs.items():
+                module.set_input(name, to_tvm(val))
+            return module, dev
+
+        def read_proc_stat():
+            # The rpc server resolves absolute paths as is
+            return bytes(remote_handle.remote.download("/proc/stat")).decode()
+
+        first_shape = next(iter(inputs.values())).shape
+        return run_streams(
+            [stream] * config.streams,
+            config.duration_s,
+            warmup_runs=config.warmup_runs,
+            batch_size=first_shape[0] if first_shape else 1,
+            read_proc_stat=read_proc_stat,
+        )
+
     def profile(self, remote_handle, inputs):
         dev = self._remote_dev(remote_handle.remote)
         # Use debug Executor to get per operator runtime
         rlib = remote_handle.rlib
         lib = remote_handle.lib
+        import tvm.contrib.debugger.debug_executor
+
         debug_module = tvm.contrib.debugger.debug_executor.GraphModuleDebug(
             rlib["debug_create"]("default", dev), [dev], lib.get_graph_json(), None
         )
         for name, val in inputs.items():
-            data_tvm = tvm.nd.array(val)
+            data_tvm = to_tvm(val)
             debug_module.set_input(name, data_tvm)
         debug_profile = debug_module.profile()
 
@@ -147,6 +248,11 @@ class AutomateTaskConnector(TaskConnector):
     def teardown(self):
         pass
 
+    def _free_servers(self):
+        tracker = rpc.connect_tracker("127.0.0.1", self._tracker_port)
+        queue_info = tracker.summary()["queue_info"]
+        return queue_info.get(self._board_config.name, {}).get("free", 0)
+
     def _remote_dev(self, remote):
         target = self.target()
         if str(target.kind) == "cuda":
@@ -165,8 +271,15 @@ class AutomateBoardConnector(BoardConnector):
         self._tracker = None
 
         self._server_process: Union[AutomateServer, None] = None
+        # Tracker and server are provided by a hannah-tvm-daemon
+        self._attached = False
 
     def setup(self):
+        daemon_port = self._board_config.get("daemon_port", None)
+        if daemon_port is not None:
+            self._attach_daemon(daemon_port)
+            return
+
         self._start_tracker()
         self._server_process = AutomateServer(self._board_config, self._tracker_port)
         self._server_process.start()
@@ -176,15 +289,24 @@ class AutomateBoardConnector(BoardConnector):
         return connector
 
     def is_alive(self):
+        if self._attached:
+            return self._board_registered()
         if not self._server_process.is_alive():
             return False
         return True
 
     def reset(self):
+        if self._attached:
+            # The daemon restarts the server, reconnect in case the tracker has been restarted
+            self._attach_daemon(self._tracker_port)
+            return
         self._server_process = AutomateServer(self._board_config, self._tracker_port)
         self._server_process.start()
 
     def teardown(self):
+        if self._attached:
+            # Server and board lock are kept by the daemon for the next run
+            return
         self._server_process.finish()
         board = automate_context().board(self._board_config.name)
         board.unlock()
@@ -209,6 +331,34 @@ class AutomateBoardConnector(BoardConnector):
         self._tracker_port = self._tracker.port
         self._tracker_conn = rpc.connect_tracker("127.0.0.1", self._tracker.port)
 
+    def _attach_daemon(self, port, timeout=600.0):
+        """Use the tracker and server of a running hannah-tvm-daemon"""
+        logger.info("Attaching to board daemon on port %d", port)
+        self._attached = True
+        self._tracker_port = port
+        self._tracker_conn = None
+
+        start = time.monotonic()
+        while not self._board_registered():
+            if time.monotonic() - start > timeout:
+                raise Exception(
+                    f"Board {self._board_config.name} is not served by the daemon on port {port}"
+                )
+            time.sleep(2.0)
+
+    def _board_registered(self):
+        try:
+            if self._tracker_conn is None:
+                self._tracker_conn = rpc.connect_tracker(
+                    "127.0.0.1", self._tracker_port
+                )
+            summary = self._tracker_conn.summary()
+        except Exception as e:
+            logger.warning("Could not query tracker: %s", str(e))
+            self._tracker_conn = None
+            return False
+        return registered_servers(summary, self._board_config.name) > 0
+
     def _start_server(self):
         """Start connection to server process"""
         board_config = self._board_config
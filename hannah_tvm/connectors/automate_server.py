@@ -17,6 +17,7 @@
 # limitations under the License.
 #
 import atexit
+import contextlib
 import logging
 import multiprocessing
 import pathlib
@@ -49,6 +50,32 @@ def automate_context():
     return _automate_context
 
 
+def num_servers(board_config) -> int:
+    """Number of rpc servers started per board
+
+    An rpc server serves a single session at a time, so multi stream throughput
+    measurements need a server per stream in addition to the one holding the
+    session of the task.
+    """
+    throughput_config = board_config.get("throughput", None)
+    if throughput_config is None:
+        return 1
+    return 1 + throughput_config.streams
+
+
+def registered_servers(tracker_summary, name) -> int:
+    """Number of rpc servers of a board connected to the tracker
+
+    The queue of a board in "queue_info" is created by the first server or client
+    using the board and is never removed, so it does not tell if servers are alive.
+    """
+    return sum(
+        1
+        for info in tracker_summary.get("server_info", [])
+        if info.get("key") == f"server:{name}"
+    )
+
+
 class AutomateServer(multiprocessing.Process):
     def __init__(self, board_config, tracker_port):
         super().__init__()
@@ -81,42 +108,59 @@ class AutomateServer(multiprocessing.Process):
                         tracker_port,
                     )
                     with board_connection.forward_remote(tracker_port, tracker_port):
-                        local_port = find_local_port(9091, 90199)
-                        logger.info(
-                            "forwarding local port %d to remote port %i",
-                            local_port,
-                            local_port,
-                        )
-                        with board_connection.forward_local(local_port, local_port):
-                            logger.info("Starting remote server")
-                            promise = board_connection.run(
-                                f"python3 -m tvm.exec.rpc_server --key {name} --host localhost --port={local_port} --port-end={local_port+1} --tracker=localhost:{tracker_port}",
-                                env={"PYTHONPATH": str(python_path)},
-                                shell=True,
-                                warn=True,
-                                pty=True,
-                                asynchronous=True,
-                            )
-
+                        with contextlib.ExitStack() as stack:
+                            promises = []
+                            port_start = 9091
+                            for _ in range(num_servers(self.board_config)):
+                                local_port = find_local_port(port_start, 90199)
+                                port_start = local_port + 1
+                                logger.info(
+                                    "forwarding local port %d to remote port %i",
+                                    local_port,
+                                    local_port,
+                                )
+                                stack.enter_context(
+                                    board_connection.forward_local(
+                                        local_port, local_port
+                                    )
+                                )
+                                logger.info("Starting remote server")
+                                promises.append(
+                                    board_connection.run(
+                                        f"python3 -m tvm.exec.rpc_server --key {name} --host localhost --port={local_port} --port-end={local_port+1} --tracker=localhost:{tracker_port}",
+                                        env={"PYTHONPATH": str(python_path)},
+                                        shell=True,
+                                        warn=True,
+                                        pty=True,
+                                        asynchronous=True,
+                                    )
+                                )
+
+                            # Stop all servers when one of them has died, so the board is restarted
                             killed = False
-                            while (
+                            while all(
                                 not promise.runner.process_is_finished
                                 and not promise.runner.has_dead_threads
+                                for promise in promises
                             ):
                                 if self._cconn.poll():
                                     msg = self._cconn.recv()
                                     if msg == "exit":
-                                        promise.runner.send_interrupt(
-                                            Exception("Could not send interrupt")
-                                        )
                                         killed = True
+                                        break
                                 time.sleep(2.0)
 
-                            result = promise.join()
-
-                            if (not result) and (not killed):
-                                logger.info("Result %s", str(result))
-                                self._cconn.send(str(result))
+                            for promise in promises:
+                                if not promise.runner.process_is_finished:
+                                    promise.runner.send_interrupt(
+                                        Exception("Could not send interrupt")
+                                    )
+
+                            for promise in promises:
+                                result = promise.join()
+                                if (not result) and (not killed):
+                                    logger.info("Result %s", str(result))
+                                    self._cconn.send(str(result))
 
                 logger.info("Running teardown commands")
                 for teardown in self.board_config.teardown:
@@ -27,6 +27,9 @@ class BuildArtifactHandle:
 
 
 class TaskConnector(ABC):
+    # Whether measure returns wall clock durations in microseconds
+    measures_wall_clock = True
+
     @abstractmethod
     def setup(self):
         """Setup board for task configuration"""
@@ -67,6 +70,28 @@ class TaskConnector(ABC):
         """Teardown task called at the end of each task executiion"""
         pass
 
+    def power_sensor(self, handle):
+        """Return a PowerSensor for the board running handle, or None if power is not measured"""
+        return None
+
+    def configure_threadpool(self, handle, affinity_mode, num_threads, cpus=None):
+        """Configure the threadpool used by subsequent measurements of handle"""
+        raise NotImplementedError(
+            f"{type(self).__name__} does not support threadpool configuration"
+        )
+
+    def measure_throughput(self, handle, inputs, config):
+        """Measure throughput of concurrent inference streams, returns a ThroughputResult"""
+        raise NotImplementedError(
+            f"{type(self).__name__} does not support throughput measurements"
+        )
+
+    def executor(self, handle):
+        """Return a graph executor module and its device for an uploaded build artifact"""
+        raise NotImplementedError(
+            f"{type(self).__name__} does not support direct execution of build artifacts"
+        )
+
 
 class BoardConnector(ABC):
     def supported_tuners() -> List[Literal["autotvm", "auto_scheduler"]]:
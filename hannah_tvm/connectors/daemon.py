@@ -0,0 +1,175 @@
+#
+# Copyright (c) 2024 hannah-tvm contributors.
+#
+# This file is part of hannah-tvm.
+# See https://atreus.informatik.uni-tuebingen.de/ties/ai/hannah/hannah-tvm for further info.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Long running rpc tracker and board servers
+
+Starting the tracker and the automate board servers takes from seconds up to
+minutes per tuning run, e.g. when the runtime is rebuilt on the board. The
+BoardDaemon keeps them running across runs, tuning runs attach to it by setting
+`daemon_port` in their board config. The servers register at the tracker through
+port forwards on the daemon host, so tuning runs attaching to the daemon must
+run on the same host.
+"""
+
+import logging
+import time
+from typing import Dict, List, Optional
+
+import tvm.rpc as rpc
+import tvm.rpc.tracker
+
+from .automate_server import (
+    AutomateServer,
+    automate_context,
+    num_servers,
+    registered_servers,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class BoardDaemon:
+    def __init__(
+        self,
+        board_configs: List,
+        port: int = 9190,
+        health_check_interval_s: float = 30.0,
+        registration_timeout_s: float = 600.0,
+    ) -> None:
+        self.board_configs = {config.name: config for config in board_configs}
+        self.port = port
+        self.health_check_interval_s = health_check_interval_s
+        self.registration_timeout_s = registration_timeout_s
+
+        self._tracker = None
+        self._tracker_conn = None
+        self._servers: Dict[str, AutomateServer] = {}
+        # Time since when a running server has not been registered at the tracker
+        self._unregistered_since: Dict[str, float] = {}
+        self.restarts: Dict[str, int] = {name: 0 for name in self.board_configs}
+
+    def run(self) -> None:
+        "Serve the boards until the daemon is interrupted"
+        self.start()
+        try:
+            while True:
+                time.sleep(self.health_check_interval_s)
+                self.check_health()
+        except KeyboardInterrupt:
+            logger.info("Stopping board daemon")
+        finally:
+            self.stop()
+
+    def start(self) -> None:
+        self._start_tracker()
+        for name in self.board_configs:
+            self._start_server(name)
+
+    def stop(self) -> None:
+        for name in list(self._servers):
+            self._stop_server(name)
+        if self._tracker is not None:
+            self._tracker.terminate()
+            self._tracker = None
+
+    def check_health(self) -> None:
+        "Restart the tracker if it does not respond and servers that died or lost their registration"
+        summary = self._summary()
+        if summary is None:
+            logger.critical(
+                "Tracker on port %d does not respond, restarting", self.port
+            )
+            self._restart_tracker()
+            return
+
+        now = time.monotonic()
+        for name, server in list(self._servers.items()):
+            if not server.is_alive():
+                logger.critical("Server for %s has terminated, restarting", name)
+                self._restart_server(name)
+            elif registered_servers(summary, name) < num_servers(
+                self.board_configs[name]
+            ):
+                since = self._unregistered_since.setdefault(name, now)
+                if now - since > self.registration_timeout_s:
+                    logger.critical(
+                        "Server for %s has not registered for %.0f s, restarting",
+                        name,
+                        now - since,
+                    )
+                    self._restart_server(name)
+            else:
+                self._unregistered_since.pop(name, None)
+
+    def status(self) -> Dict[str, Dict]:
+        summary = self._summary() or {}
+        queue_info = summary.get("queue_info", {})
+        return {
+            name: {
+                "alive": server.is_alive(),
+                "servers": registered_servers(summary, name),
+                "free": queue_info.get(name, {}).get("free", 0),
+                "restarts": self.restarts[name],
+            }
+            for name, server in self._servers.items()
+        }
+
+    def _summary(self) -> Optional[Dict]:
+        try:
+            return self._tracker_conn.summary()
+        except Exception as e:
+            logger.warning("Could not query tracker: %s", str(e))
+            return None
+
+    def _start_tracker(self) -> None:
+        logger.info("Starting tracker on port %d", self.port)
+        self._tracker = rpc.tracker.Tracker(
+            "0.0.0.0", port=self.port, port_end=self.port + 1, silent=True
+        )
+        time.sleep(1.0)
+        if self._tracker.port != self.port:
+            raise Exception(f"Could not start tracker on port {self.port}")
+        self._tracker_conn = rpc.connect_tracker("127.0.0.1", self.port)
+
+    def _restart_tracker(self) -> None:
+        for name in list(self._servers):
+            self._stop_server(name)
+        if self._tracker is not None:
+            self._tracker.terminate()
+        self._start_tracker()
+        for name in self.board_configs:
+            self._start_server(name)
+            self.restarts[name] += 1
+
+    def _start_server(self, name: str) -> None:
+        logger.info("Starting server for %s", name)
+        server = AutomateServer(self.board_configs[name], self.port)
+        server.start()
+        self._servers[name] = server
+        self._unregistered_since.pop(name, None)
+
+    def _stop_server(self, name: str) -> None:
+        server = self._servers.pop(name)
+        if server.is_alive():
+            server.finish()
+        # Release locks left behind by servers that did not shut down cleanly
+        automate_context().board(name).unlock()
+
+    def _restart_server(self, name: str) -> None:
+        self._stop_server(name)
+        self._start_server(name)
+        self.restarts[name] += 1
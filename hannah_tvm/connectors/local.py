@@ -23,9 +23,11 @@ from typing import Any
 import numpy as np
 import tvm
 from tvm import auto_scheduler, autotvm
-import tvm.meta_schedule as ms
 
+from ..utils.dlpack import to_tvm
 from .core import BoardConnector, BuildArtifactHandle, TaskConnector
+from .power import FilePowerSensor
+from .throughput import read_local_proc_stat, run_streams
 
 logger = logging.getLogger(__name__)
 
@@ -59,6 +61,8 @@ class LocalTaskConnector(TaskConnector):
                 self.auto_scheduler_ctx = auto_scheduler.LocalRPCMeasureContext()
             runner = self.auto_scheduler_ctx.runner
         elif tuner == "meta_scheduler":
+            import tvm.meta_schedule as ms
+
             runner = ms.runner.LocalRunner()
         return runner
 
@@ -68,6 +72,8 @@ class LocalTaskConnector(TaskConnector):
         elif tuner == "auto_scheduler":
             builder = "local"
         elif tuner == "meta_scheduler":
+            import tvm.meta_schedule as ms
+
             builder = ms.builder.LocalBuilder()
         return builder
 
@@ -80,13 +86,17 @@ class LocalTaskConnector(TaskConnector):
         # Upload module to device
         return LocalBuildArtifactHandle(lib)
 
-    def measure(self, remote_handle, inputs, reference_outputs):
+    def executor(self, remote_handle):
         dev = self._remote_dev()
         lib = remote_handle.lib
         module = tvm.contrib.graph_executor.GraphModule(lib["default"](dev))
+        return module, dev
+
+    def measure(self, remote_handle, inputs, reference_outputs):
+        module, dev = self.executor(remote_handle)
         logger.info("Set inputs")
         for name, val in inputs.items():
-            data_tvm = tvm.nd.array(val)
+            data_tvm = to_tvm(val)
             module.set_input(name, data_tvm)
 
         # Evaluate on Graph Executor
@@ -96,15 +106,54 @@ class LocalTaskConnector(TaskConnector):
 
         return prof_res
 
+    def power_sensor(self, remote_handle):
+        power_config = self._board_config.get("power", None)
+        if power_config is None:
+            return None
+        return FilePowerSensor(power_config.rails, scale=power_config.scale)
+
+    def configure_threadpool(
+        self, remote_handle, affinity_mode, num_threads, cpus=None
+    ):
+        # Measurements run in the calling thread, whose threadpool is configured here
+        config_threadpool = tvm.get_global_func("runtime.config_threadpool")
+        if cpus:
+            config_threadpool(affinity_mode, num_threads, [str(cpu) for cpu in cpus])
+        else:
+            config_threadpool(affinity_mode, num_threads)
+
+    def measure_throughput(self, remote_handle, inputs, config):
+        config_threadpool = tvm.get_global_func("runtime.config_threadpool")
+
+        def stream():
+            # Threadpools are thread local, so each stream gets its own
+            if config.affinity_mode != 0 or config.threads_per_stream != 0:
+                config_threadpool(config.affinity_mode, config.threads_per_stream)
+            module, dev = self.executor(remote_handle)
+            for name, val in inputs.items():
+                module.set_input(name, to_tvm(val))
+            return module, dev
+
+        first_shape = next(iter(inputs.values())).shape
+        return run_streams(
+            [stream] * config.streams,
+            config.duration_s,
+            warmup_runs=config.warmup_runs,
+            batch_size=first_shape[0] if first_shape else 1,
+            read_proc_stat=read_local_proc_stat,
+        )
+
     def profile(self, remote_handle, inputs):
         dev = self._remote_dev()
         # Use debug Executor to get per operator runtime
         lib = remote_handle.lib
+        import tvm.contrib.debugger.debug_executor
+
         debug_module = tvm.contrib.debugger.debug_executor.GraphModuleDebug(
             lib["debug_create"]("default", dev), [dev], lib.get_graph_json(), None
         )
         for name, val in inputs.items():
-            data_tvm = tvm.nd.array(val)
+            data_tvm = to_tvm(val)
             debug_module.set_input(name, data_tvm)
         debug_profile = debug_module.profile()
 
@@ -27,6 +27,7 @@ import tvm
 from tvm import auto_scheduler, autotvm
 
 from hannah_tvm.micro.aot import AOTCompiledModel, AOTModel, build_aot_runner
+from hannah_tvm.micro.memory import planned_workspace_bytes
 
 from ..micro.gvsoc_runner import GVSOCRunner
 from .core import BoardConnector, BuildArtifactHandle, TaskConnector
@@ -40,6 +41,9 @@ class MicroBuildArtifactHandle(BuildArtifactHandle):
 
 
 class MicroTVMTaskConnector(TaskConnector):
+    # measure returns cycles of simulators, or -1 if the board is not measured
+    measures_wall_clock = False
+
     def __init__(self, board_config):
         self.board = board_config
         self._target = None
@@ -102,13 +106,34 @@ class MicroTVMTaskConnector(TaskConnector):
     def measure(self, handle: MicroBuildArtifactHandle, inputs, reference_outputs):
         # In case of an AOT build add inputs to build
         if self.board.micro.aot:
+            # Check the planned memory before spending time on building and flashing
+            workspace_bytes = planned_workspace_bytes(handle.lib)
+            io_bytes = sum(val.nbytes for val in inputs.values())
+            if reference_outputs:
+                io_bytes += sum(val.nbytes for val in reference_outputs.values())
+            ram_bytes = self.board.micro.get("ram_bytes", None)
+            if ram_bytes is not None and workspace_bytes + io_bytes > ram_bytes:
+                raise Exception(
+                    f"Planned workspace of {workspace_bytes} bytes and io of {io_bytes} bytes exceed the {ram_bytes} bytes of RAM on {self.board.name}"
+                )
+
+            configured_workspace_bytes = self.board.micro.aot.get(
+                "workspace_bytes", None
+            )
+            if configured_workspace_bytes is not None:
+                workspace_bytes = configured_workspace_bytes
+
             model = AOTModel(
                 handle.lib.ir_mod,
                 inputs=inputs,
                 outputs=reference_outputs if reference_outputs else {},
             )
             compiled_model = AOTCompiledModel(model, handle.lib)
-            build_aot_runner([compiled_model], target_dir=self.project_dir)
+            build_aot_runner(
+                [compiled_model],
+                target_dir=self.project_dir,
+                workspace_bytes=workspace_bytes,
+            )
 
         project = handle.project
         project.build()
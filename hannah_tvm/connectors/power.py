@@ -0,0 +1,179 @@
+#
+# Copyright (c) 2024 hannah-tvm contributors.
+#
+# This file is part of hannah-tvm.
+# See https://atreus.informatik.uni-tuebingen.de/ties/ai/hannah/hannah-tvm for further info.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Power and energy measurements
+
+A PowerSensor reports the current power draw of one or more power rails. While
+a measurement is running, a PowerSampler samples the sensor in a background
+thread. The average power of the samples multiplied by the inference latency
+gives the energy per inference.
+"""
+
+import logging
+import threading
+import time
+from abc import ABC, abstractmethod
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class PowerSensor(ABC):
+    @abstractmethod
+    def read(self) -> Dict[str, float]:
+        """Return the current power draw of each rail in W"""
+        pass
+
+    def close(self) -> None:
+        """Release the connection to the sensor"""
+        pass
+
+
+def read_local_file(path: str) -> str:
+    with open(path) as f:
+        return f.read()
+
+
+class FilePowerSensor(PowerSensor):
+    """Power rails read from files containing a single number
+
+    These are e.g. the sysfs nodes of the INA3221 power monitors on Jetson boards.
+    Pointing the rails to regular files gives a fake sensor for testing.
+    """
+
+    def __init__(
+        self,
+        rails: Mapping[str, str],
+        scale: float = 1e-3,
+        read_file: Callable[[str], str] = read_local_file,
+    ) -> None:
+        self.rails = dict(rails)
+        self.scale = scale
+        self.read_file = read_file
+
+    def read(self) -> Dict[str, float]:
+        return {
+            rail: float(self.read_file(path).strip()) * self.scale
+            for rail, path in self.rails.items()
+        }
+
+
+@dataclass
+class PowerTrace:
+    timestamps: List[float] = field(default_factory=list)
+    samples: List[Dict[str, float]] = field(default_factory=list)
+
+    def average_power(self) -> Dict[str, float]:
+        "Time weighted average power of each rail in W"
+        if not self.samples:
+            return {}
+
+        averages = {}
+        for rail in self.samples[0]:
+            values = np.array([sample[rail] for sample in self.samples])
+            duration = self.timestamps[-1] - self.timestamps[0]
+            if len(values) < 2 or duration <= 0:
+                averages[rail] = float(np.mean(values))
+            else:
+                timestamps = np.array(self.timestamps)
+                # Trapezoidal integration of the energy over the trace
+                energy = np.sum((values[1:] + values[:-1]) / 2 * np.diff(timestamps))
+                averages[rail] = float(energy / duration)
+        return averages
+
+    def total_power(self) -> float:
+        return sum(self.average_power().values())
+
+
+def summarize_power(
+    traces: Sequence[PowerTrace], latencies_us: Sequence[np.ndarray]
+) -> Tuple[Dict[str, float], Optional[float]]:
+    """Average power of each rail and energy per inference in uJ of several measurements
+
+    Traces without samples are skipped, and only rails present in all remaining
+    traces are averaged. The energy is None if no trace contains samples.
+    """
+    averages = []
+    for trace, latencies in zip(traces, latencies_us):
+        trace_averages = trace.average_power()
+        if not trace_averages:
+            logger.warning("No power samples recorded during a measurement")
+            continue
+        averages.append((trace_averages, latencies))
+    if not averages:
+        return {}, None
+
+    rails = [
+        rail
+        for rail in averages[0][0]
+        if all(rail in trace_averages for trace_averages, _ in averages)
+    ]
+    if len(rails) < len(averages[0][0]):
+        logger.warning("Power rails are missing in some traces, using %s", rails)
+
+    rail_power = {
+        rail: float(np.mean([trace_averages[rail] for trace_averages, _ in averages]))
+        for rail in rails
+    }
+    # Energy per inference is the average power while measuring times the latency
+    energy = float(
+        np.mean(
+            [
+                sum(trace_averages[rail] for rail in rails) * np.mean(latencies)
+                for trace_averages, latencies in averages
+            ]
+        )
+    )
+    return rail_power, energy
+
+
+class PowerSampler:
+    """Samples a power sensor in a background thread while the context is active"""
+
+    def __init__(self, sensor: PowerSensor, interval_s: float = 0.05) -> None:
+        self.sensor = sensor
+        self.interval_s = interval_s
+        self.trace = PowerTrace()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _sample(self) -> None:
+        try:
+            sample = self.sensor.read()
+        except Exception as e:
+            logger.warning("Could not read power sensor: %s", str(e))
+            return
+        self.trace.timestamps.append(time.perf_counter())
+        self.trace.samples.append(sample)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval_s):
+            self._sample()
+
+    def __enter__(self) -> "PowerSampler":
+        self._sample()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *args) -> None:
+        self._stop.set()
+        self._thread.join()
+        self._sample()
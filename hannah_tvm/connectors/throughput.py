@@ -0,0 +1,188 @@
+#
+# Copyright (c) 2024 hannah-tvm contributors.
+#
+# This file is part of hannah-tvm.
+# See https://atreus.informatik.uni-tuebingen.de/ties/ai/hannah/hannah-tvm for further info.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Throughput measurements with multiple concurrent inference streams
+
+Each stream runs its own graph executor instance in a separate host thread and
+measures the latency of each inference until the configured duration has
+passed. CPU utilization is calculated from /proc/stat of the device, if the
+connector can read it.
+"""
+
+import logging
+import threading
+import time
+from dataclasses import asdict, dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ThroughputResult:
+    streams: int
+    batch_size: int
+    duration_s: float
+    latencies_us: List[List[float]] = field(default_factory=list)  # Per stream
+    cpu_utilization: Optional[
+        float
+    ] = None  # Average utilization of all cores in percent
+
+    @property
+    def inferences(self) -> int:
+        return sum(len(stream) for stream in self.latencies_us)
+
+    @property
+    def inferences_per_second(self) -> float:
+        return self.inferences / self.duration_s if self.duration_s > 0 else 0.0
+
+    @property
+    def samples_per_second(self) -> float:
+        return self.inferences_per_second * self.batch_size
+
+    def percentiles(self) -> Dict[str, float]:
+        latencies = np.concatenate([np.asarray(s) for s in self.latencies_us] or [[]])
+        if latencies.size == 0:
+            return {}
+        return {f"p{q}": float(np.percentile(latencies, q)) for q in (50, 95, 99)}
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "streams": self.streams,
+            "batch_size": self.batch_size,
+            "inferences_per_second": self.inferences_per_second,
+            "samples_per_second": self.samples_per_second,
+            "cpu_utilization": self.cpu_utilization,
+            **{f"latency_{k}": v for k, v in self.percentiles().items()},
+        }
+
+    def to_dict(self) -> Dict[str, Any]:
+        result = asdict(self)
+        result.update(self.summary())
+        return result
+
+
+def parse_cpu_times(proc_stat: str) -> Tuple[float, float]:
+    "Busy and total jiffies of all cores from the contents of /proc/stat"
+    for line in proc_stat.splitlines():
+        fields = line.split()
+        if fields and fields[0] == "cpu":
+            values = [float(v) for v in fields[1:]]
+            # idle and iowait
+            idle = values[3] + (values[4] if len(values) > 4 else 0.0)
+            # guest times are already contained in user and nice
+            total = sum(values[:8])
+            return total - idle, total
+    raise ValueError("No cpu line in /proc/stat")
+
+
+def read_local_proc_stat() -> str:
+    with open("/proc/stat") as f:
+        return f.read()
+
+
+def run_streams(
+    streams: Sequence[Callable[[], Tuple[Any, Any]]],
+    duration_s: float,
+    warmup_runs: int = 5,
+    batch_size: int = 1,
+    read_proc_stat: Optional[Callable[[], str]] = None,
+) -> ThroughputResult:
+    """Run inference streams concurrently
+
+    Each element of `streams` is called in its own thread and returns a graph
+    executor module with inputs set and its device. After warmup, all streams
+    start together and run inferences for `duration_s` seconds.
+    """
+    num_streams = len(streams)
+    latencies: List[List[float]] = [[] for _ in streams]
+    errors: List[BaseException] = []
+    state: Dict[str, float] = {}
+
+    def start():
+        state["start"] = time.perf_counter()
+        if read_proc_stat is not None:
+            try:
+                state["busy"], state["total"] = parse_cpu_times(read_proc_stat())
+            except Exception as e:
+                logger.warning("Could not read cpu utilization: %s", str(e))
+
+    barrier = threading.Barrier(num_streams, action=start)
+
+    def run(stream_id):
+        try:
+            module, dev = streams[stream_id]()
+            for _ in range(warmup_runs):
+                module.run()
+            dev.sync()
+        except BaseException as e:
+            errors.append(e)
+            barrier.abort()
+            return
+
+        try:
+            barrier.wait()
+        except threading.BrokenBarrierError:
+            return
+
+        deadline = state["start"] + duration_s
+        stream_latencies = latencies[stream_id]
+        try:
+            while True:
+                start_time = time.perf_counter()
+                if start_time >= deadline:
+                    break
+                module.run()
+                dev.sync()
+                stream_latencies.append((time.perf_counter() - start_time) * 1e6)
+        except BaseException as e:
+            errors.append(e)
+
+    threads = [
+        threading.Thread(target=run, args=(stream_id,), daemon=True)
+        for stream_id in range(num_streams)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    if errors:
+        raise errors[0]
+
+    elapsed = time.perf_counter() - state["start"]
+
+    cpu_utilization = None
+    if read_proc_stat is not None and "busy" in state:
+        try:
+            busy, total = parse_cpu_times(read_proc_stat())
+            if total > state["total"]:
+                cpu_utilization = (
+                    100.0 * (busy - state["busy"]) / (total - state["total"])
+                )
+        except Exception as e:
+            logger.warning("Could not read cpu utilization: %s", str(e))
+
+    return ThroughputResult(
+        streams=num_streams,
+        batch_size=batch_size,
+        duration_s=elapsed,
+        latencies_us=latencies,
+        cpu_utilization=cpu_utilization,
+    )
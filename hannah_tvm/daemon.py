@@ -0,0 +1,59 @@
+#
+# Copyright (c) 2024 hannah-tvm contributors.
+#
+# This file is part of hannah-tvm.
+# See https://atreus.informatik.uni-tuebingen.de/ties/ai/hannah/hannah-tvm for further info.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+"""Run the rpc tracker and board servers as long running daemon
+
+    hannah-tvm-daemon backend/board=jetsonagx daemon.boards=[jetsontx2]
+
+Tuning runs attach to it with backend.board.daemon_port=<daemon.port>.
+"""
+
+import logging
+
+import hydra
+from hydra import compose
+from omegaconf import OmegaConf
+
+from .connectors.daemon import BoardDaemon
+
+logger = logging.getLogger(__name__)
+
+
+@hydra.main(config_name="config", config_path="conf", version_base="1.2")
+def main(config):
+    logging.captureWarnings(True)
+    logger.info(OmegaConf.to_yaml(config.daemon))
+
+    board_configs = [config.backend.board]
+    for board_name in config.daemon.boards:
+        board_config = compose(
+            config_name="config", overrides=[f"backend/board={board_name}"]
+        ).backend.board
+        board_configs.append(board_config)
+
+    daemon = BoardDaemon(
+        board_configs,
+        port=config.daemon.port,
+        health_check_interval_s=config.daemon.health_check_interval_s,
+        registration_timeout_s=config.daemon.registration_timeout_s,
+    )
+    daemon.run()
+
+
+if __name__ == "__main__":
+    main()
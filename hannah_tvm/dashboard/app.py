@@ -16,36 +16,177 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 #
+import functools
+import json
 import logging
+import pathlib
+import pickle
 
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objs as go
 from dash import Dash, Input, Output, dash_table, dcc, html
-from matplotlib.pyplot import xlabel
-
-from hannah_tvm.passes.op_order import calculate_op_order
+from dash.exceptions import PreventUpdate
+from omegaconf import OmegaConf
 
 from ..dataset import DatasetFull
 
 logger = logging.getLogger(__name__)
 
+RELOAD_INTERVAL_S = 30
+
+_BOARD_CONFIG_DIR = pathlib.Path(__file__).parent.parent / "conf" / "backend" / "board"
+
+
+def load_board_peaks():
+    """Peak compute (GOP/s) and bandwidth (GB/s) for boards that configure them"""
+    peaks = {}
+    for board_file in _BOARD_CONFIG_DIR.glob("*.yaml"):
+        board_config = OmegaConf.load(board_file)
+        peak_gops = board_config.get("peak_gops", None)
+        peak_bandwidth = board_config.get("peak_bandwidth", None)
+        if peak_gops is None or peak_bandwidth is None:
+            continue
+        try:
+            name = str(board_config.name)
+        except Exception:
+            name = board_file.stem
+        peaks[name] = (float(peak_gops), float(peak_bandwidth))
+
+    return peaks
+
+
+class DashboardData:
+    """Server side view of the dataset shared by all dashboard callbacks"""
+
+    def __init__(self, dataset: DatasetFull):
+        self.dataset = dataset
+        self.version = 0
+        self.measurements = None
+        self.network_results = {}
+        self._mtimes = {}
+
+        self.reload()
+
+    def reload(self) -> bool:
+        """Pick up new or modified measurements, returns True if anything changed"""
+        network_results = self.dataset.network_result_index()
+        mtimes = {
+            key: result.measurement_file.stat().st_mtime
+            for key, result in network_results.items()
+        }
+        if self.measurements is not None and mtimes == self._mtimes:
+            return False
+
+        logger.info("Loading dataset")
+        self.measurements = self.dataset.measurements()
+        self.network_results = network_results
+        self._mtimes = mtimes
+        self.version += 1
+
+        return True
+
+    @property
+    def models(self):
+        models = list(self.measurements["Model"].unique())
+        if "" in models:
+            models.remove("")
+        return models
+
+    @property
+    def boards(self):
+        return list(self.measurements["Board"].unique())
+
+    def network_details(self, board, model, tuner, target):
+        key = (board, model, tuner, target)
+        if key not in self.network_results:
+            return None
+        result = self.network_results[key]
+
+        return _network_details(result.measurement_file, self._mtimes[key])
+
+    def roofline_points(self, board, model, tuner, target):
+        key = (board, model, tuner, target)
+        if key not in self.network_results:
+            return []
+        result = self.network_results[key]
+        if not result.op_counts_file.exists():
+            return []
+
+        return _roofline_points(
+            result.measurement_file,
+            self._mtimes[key],
+            result.op_counts_file,
+            result.op_counts_file.stat().st_mtime,
+        )
+
+
+@functools.lru_cache(maxsize=256)
+def _network_details(measurement_file, mtime):
+    with measurement_file.open() as result_stream:
+        measurement = json.load(result_stream)
+    call_profile = measurement["calls"]
+
+    op_table = []
+    for layer, call in enumerate(call_profile):
+        hash = call["Hash"]["string"]
+        name = call["Name"]["string"]
+        duration = call["Duration (us)"]["microseconds"]
+        op_table.append(dict(layer=layer, hash=hash, name=name, duration=duration))
+
+    op_table_frame = pd.DataFrame.from_records(op_table)
+
+    network_info_figure = px.bar(op_table_frame, y="duration", x="layer")
+
+    return network_info_figure, op_table
+
+
+@functools.lru_cache(maxsize=256)
+def _roofline_points(measurement_file, mtime, op_counts_file, op_counts_mtime):
+    with measurement_file.open() as result_stream:
+        measurement = json.load(result_stream)
+    with op_counts_file.open("rb") as f:
+        op_counts = pickle.load(f)
+
+    points = []
+    for layer, call in enumerate(measurement["calls"]):
+        name = call["Name"]["string"]
+        duration = call["Duration (us)"]["microseconds"]
+        if name not in op_counts or duration <= 0.0:
+            continue
+        counts = op_counts[name]
+        bytes = counts["bytes_loaded"] + counts["bytes_stored"]
+        if bytes == 0:
+            continue
+        points.append(
+            dict(
+                layer=layer,
+                name=name,
+                duration=duration,
+                bytes=bytes,
+                flops=counts["flops"],
+                int_ops=counts["int_ops"],
+            )
+        )
+
+    return points
+
 
 def main():
     app = Dash("Hannah-TVM Results")
 
-    logger.info("Loading dataset")
-    dataset = DatasetFull()
-    measurements = dataset.measurements()
-    models = list(measurements["Model"].unique())
-    if "" in models:
-        models.remove("")
-    boards = measurements["Board"].unique()
-    network_results = dataset.network_results()
+    data = DashboardData(DatasetFull())
+    board_peaks = load_board_peaks()
+    models = data.models
+    boards = data.boards
 
     app.layout = html.Div(
         children=[
             html.H1(children="Tuning Results"),
+            dcc.Interval(
+                id="dataset-reload-interval", interval=RELOAD_INTERVAL_S * 1000
+            ),
+            dcc.Store(id="dataset-version", data=data.version),
             # Overview
             html.H2(children="Overview"),
             dcc.Dropdown(
@@ -75,6 +216,23 @@ def main():
             dcc.Graph(id="overview-graph"),
             # Roofline
             html.H2(children="Roofline analysis"),
+            dcc.Dropdown(
+                models, models[0] if len(models) > 1 else "", id="roofline-model"
+            ),
+            dcc.Dropdown(boards, boards, multi=True, id="roofline-board-selection"),
+            dcc.Dropdown(["c", "cuda", "llvm"], "llvm", id="roofline-target"),
+            dcc.Dropdown(
+                ["baseline", "autotvm", "auto_scheduler"],
+                "baseline",
+                id="roofline-tuner",
+            ),
+            dcc.RadioItems(
+                ["All ops", "FLOPs", "Integer ops"],
+                "All ops",
+                inline=True,
+                id="roofline-ops-selection",
+            ),
+            dcc.Graph(id="roofline-graph"),
             # Network Info
             html.H2(children="Network Info"),
             dcc.Dropdown(
@@ -104,47 +262,109 @@ def main():
     )
 
     @app.callback(
-        Output("network-info-graph", "figure"),
-        Output("network-info-table", "data"),
-        Input("network-info-target", "value"),
-        Input("network-info-model", "value"),
-        Input("network-info-board", "value"),
-        Input("network-info-tuner", "value"),
+        Output("dataset-version", "data"),
+        Output("overview-model-selection", "options"),
+        Output("overview-board-selection", "options"),
+        Output("network-info-model", "options"),
+        Output("network-info-board", "options"),
+        Output("roofline-model", "options"),
+        Output("roofline-board-selection", "options"),
+        Input("dataset-reload-interval", "n_intervals"),
+    )
+    def reload_dataset(n_intervals):
+        if not data.reload():
+            raise PreventUpdate
+
+        return (
+            data.version,
+            data.models,
+            data.boards,
+            data.models,
+            data.boards,
+            data.models,
+            data.boards,
+        )
+
+    @app.callback(
+        Output("roofline-graph", "figure"),
+        Input("roofline-model", "value"),
+        Input("roofline-board-selection", "value"),
+        Input("roofline-target", "value"),
+        Input("roofline-tuner", "value"),
+        Input("roofline-ops-selection", "value"),
+        Input("dataset-version", "data"),
     )
-    def update_network_details(target, model, board, tuner):
-        network_info_figure = go.Figure()
+    def update_roofline(model, boards, target, tuner, ops_type, version):
+        roofline_fig = go.Figure()
+        roofline_fig.update_xaxes(type="log", title="Arithmetic intensity (op/byte)")
+        roofline_fig.update_yaxes(type="log", title="Performance (GOP/s)")
+
+        for board in boards or []:
+            points = data.roofline_points(board, model, tuner, target)
+            if ops_type == "FLOPs":
+                ops = [p["flops"] for p in points]
+            elif ops_type == "Integer ops":
+                ops = [p["int_ops"] for p in points]
+            else:
+                ops = [p["flops"] + p["int_ops"] for p in points]
+
+            points = [(p, o) for p, o in zip(points, ops) if o > 0]
+            if not points:
+                continue
 
-        selected_result = None
-        for result in network_results:
-            if (
-                result.target == target
-                and result.model == model
-                and result.tuner == tuner
-                and result.board == board
-            ):
-                if selected_result is not None:
-                    logger.critical("Multiple results found")
-                selected_result = result
+            intensity = [o / p["bytes"] for p, o in points]
+            performance = [o / p["duration"] / 1e3 for p, o in points]
 
-        if selected_result is None:
-            return network_info_figure, []
+            hover = []
+            for (p, o), x in zip(points, intensity):
+                text = f"{p['layer']}: {p['name']}"
+                if board in board_peaks:
+                    peak_gops, peak_bandwidth = board_peaks[board]
+                    bound = "compute" if x >= peak_gops / peak_bandwidth else "memory"
+                    text += f" ({bound} bound)"
+                hover.append(text)
 
-        relay_model = selected_result.relay
-        measurement = selected_result.measurement
-        call_profile = measurement["calls"]
+            roofline_fig.add_trace(
+                go.Scatter(
+                    x=intensity,
+                    y=performance,
+                    mode="markers",
+                    name=board,
+                    hovertext=hover,
+                )
+            )
 
-        op_table = []
-        for layer, call in enumerate(call_profile):
-            hash = call["Hash"]["string"]
-            name = call["Name"]["string"]
-            duration = call["Duration (us)"]["microseconds"]
-            op_table.append(dict(layer=layer, hash=hash, name=name, duration=duration))
+            if board in board_peaks:
+                peak_gops, peak_bandwidth = board_peaks[board]
+                ridge = peak_gops / peak_bandwidth
+                roof_x = sorted([min(intensity) / 2, ridge, max(intensity) * 2])
+                roof_y = [min(peak_gops, peak_bandwidth * x) for x in roof_x]
+                roofline_fig.add_trace(
+                    go.Scatter(
+                        x=roof_x,
+                        y=roof_y,
+                        mode="lines",
+                        name=f"{board} roofline",
+                    )
+                )
 
-        op_table_frame = pd.DataFrame.from_records(op_table)
+        return roofline_fig
 
-        network_info_figure = px.bar(op_table_frame, y="duration", x="layer")
+    @app.callback(
+        Output("network-info-graph", "figure"),
+        Output("network-info-table", "data"),
+        Input("network-info-target", "value"),
+        Input("network-info-model", "value"),
+        Input("network-info-board", "value"),
+        Input("network-info-tuner", "value"),
+        Input("dataset-version", "data"),
+    )
+    def update_network_details(target, model, board, tuner, version):
+        details = data.network_details(board, model, tuner, target)
+        if details is None:
+            return go.Figure(), []
 
-        return network_info_figure, op_table
+        return details
 
     @app.callback(
         Output("overview-graph", "figure"),
@@ -153,8 +373,10 @@ def main():
         Input("overview-model-selection", "value"),
         Input("overview-board-selection", "value"),
         Input("overview-type-selection", "value"),
+        Input("dataset-version", "data"),
     )
-    def update_overview_figure(target, error, models, boards, type):
+    def update_overview_figure(target, error, models, boards, type, version):
+        measurements = data.measurements
         overview_fig = go.Figure()
         schedulers = ["baseline", "autotvm", "auto_scheduler"]
         if type == "Speedup":
@@ -23,7 +23,7 @@ import logging
 import pathlib
 import pickle
 from collections import OrderedDict, namedtuple
-from typing import Any, Dict, Iterable, List, Optional
+from typing import Any, Dict, Iterable, List, Optional, Tuple
 
 import numpy as np
 import pandas as pd
@@ -52,6 +52,8 @@ class NetworkResult:
         measurement_file: pathlib.Path,
         relay_file: pathlib.Path,
         tir_file: pathlib.Path,
+        op_counts_file: Optional[pathlib.Path] = None,
+        memory_file: Optional[pathlib.Path] = None,
     ):
         self.board = board
         self.target = target
@@ -60,6 +62,8 @@ class NetworkResult:
         self.measurement_file = measurement_file
         self.relay_file = relay_file
         self.tir_file = tir_file
+        self.op_counts_file = op_counts_file
+        self.memory_file = memory_file
 
     @property
     def measurement(self):
@@ -88,6 +92,28 @@ class NetworkResult:
 
         return tir
 
+    @property
+    def op_counts(self) -> Optional[Dict[str, Dict[str, int]]]:
+        """Op and byte counts per primfunc name, see passes.op_counter.OpCounts"""
+        op_counts = None
+
+        if self.op_counts_file is not None and self.op_counts_file.exists():
+            with self.op_counts_file.open("rb") as f:
+                op_counts = pickle.load(f)
+
+        return op_counts
+
+    @property
+    def memory(self) -> Optional[Dict[str, Dict[str, Any]]]:
+        """Memory analysis per primfunc name, see passes.memory_analysis.MemoryAnalysisResult"""
+        memory = None
+
+        if self.memory_file is not None and self.memory_file.exists():
+            with self.memory_file.open("rb") as f:
+                memory = pickle.load(f)
+
+        return memory
+
 
 def clean_file_name(x):
     x = str(x)
@@ -140,6 +166,18 @@ class PerformanceDataset:
         with network_pkl_path.open("wb") as out_file:
             pickle.dump(relay_mod, out_file)
 
+    def add_memory_estimate(self, network_name, estimate: Dict[str, int]):
+        logger.info("Adding memory estimate: %s", network_name)
+        estimate_path = (
+            self._base_dir
+            / "memory_estimates"
+            / self.board
+            / f"{network_name}_{str(self.target)}.json"
+        )
+        estimate_path.parent.mkdir(exist_ok=True, parents=True)
+        with estimate_path.open("w") as estimate_file:
+            json.dump(estimate, estimate_file)
+
     def add_tasks(self, scheduler, network_name, tasks, task_weights=None):
         task_info_filename = (
             self._base_dir / "task_info" / self.board / scheduler / network_name
@@ -247,6 +285,36 @@ class PerformanceDataset:
         with result_path.open("wb") as result_file:
             pickle.dump(primfuncs, result_file)
 
+    def add_measurement_op_counts(
+        self, scheduler, network_name, op_counts: Dict[str, Dict[str, int]]
+    ):
+        logger.info("Adding op counts")
+        result_path = (
+            self._base_dir
+            / "network_results"
+            / self.board
+            / scheduler
+            / f"{network_name}_{str(self.target)}.opcounts.pkl"
+        )
+        result_path.parent.mkdir(exist_ok=True, parents=True)
+        with result_path.open("wb") as result_file:
+            pickle.dump(op_counts, result_file)
+
+    def add_measurement_memory(
+        self, scheduler, network_name, memory: Dict[str, Dict[str, Any]]
+    ):
+        logger.info("Adding memory analysis")
+        result_path = (
+            self._base_dir
+            / "network_results"
+            / self.board
+            / scheduler
+            / f"{network_name}_{str(self.target)}.memory.pkl"
+        )
+        result_path.parent.mkdir(exist_ok=True, parents=True)
+        with result_path.open("wb") as result_file:
+            pickle.dump(memory, result_file)
+
     def add_measurement(self, scheduler, network_name, results: Dict[str, Any]):
         logger.info("Adding Measurement result")
         result_path = (
@@ -260,6 +328,28 @@ class PerformanceDataset:
         with result_path.open("w") as result_file:
             json.dump(results, result_file)
 
+    def add_throughput_measurement(
+        self, scheduler, network_name, results: Dict[str, Any]
+    ):
+        logger.info("Adding throughput measurement")
+        self._write_results("throughput_results", scheduler, network_name, results)
+
+    def add_thread_sweep(self, scheduler, network_name, results: Dict[str, Any]):
+        logger.info("Adding thread sweep")
+        self._write_results("thread_sweep_results", scheduler, network_name, results)
+
+    def _write_results(self, kind, scheduler, network_name, results: Dict[str, Any]):
+        result_path = (
+            self._base_dir
+            / kind
+            / self.board
+            / scheduler
+            / f"{network_name}_{str(self.target)}.json"
+        )
+        result_path.parent.mkdir(exist_ok=True, parents=True)
+        with result_path.open("w") as result_file:
+            json.dump(results, result_file)
+
     def _get_tuning_results_dir(self, scheduler):
         base_folder = self._base_dir / "tuning_results" / self.board / scheduler
         base_folder.mkdir(exist_ok=True, parents=True)
@@ -273,56 +363,180 @@ class DatasetFull:
         else:
             self._base_dir = pathlib.Path(base_dir)
 
-    def measurements(self) -> pd.DataFrame:
-        base_folder = self._base_dir / "network_results"
-        measurements = []
-        for result_file in base_folder.glob("*/*/*.json"):
-            parts = result_file.parts
-            model_name = parts[-1].split(".")[0]
-            model_name, target_name = (
-                "_".join(model_name.split("_")[:-1]),
-                model_name.split("_")[-1],
-            )
-            scheduler_name = parts[-2]
-            board_name = parts[-3]
-
-            result = {}
-            result["Model"] = model_name
-            result["Board"] = board_name
-            result["Tuner"] = scheduler_name
-            result["Target"] = target_name
+        # Parsed measurement rows keyed by result file, together with the
+        # modification time they have been parsed at
+        self._measurement_cache: Dict[pathlib.Path, Tuple[float, Optional[dict]]] = {}
 
-            with result_file.open() as result_stream:
-                record = json.load(result_stream)
-                if len(record["Duration (us)"]) == 0:
-                    continue
+    def _result_files(self) -> Iterable[pathlib.Path]:
+        base_folder = self._base_dir / "network_results"
+        return base_folder.glob("*/*/*.json")
+
+    def _parse_result_file_name(self, result_file: pathlib.Path):
+        parts = result_file.parts
+        model_name = parts[-1].split(".")[0]
+        model_name, target_name = (
+            "_".join(model_name.split("_")[:-1]),
+            model_name.split("_")[-1],
+        )
+        scheduler_name = parts[-2]
+        board_name = parts[-3]
+
+        return board_name, target_name, model_name, scheduler_name
+
+    def _load_measurement(self, result_file: pathlib.Path) -> Optional[dict]:
+        mtime = result_file.stat().st_mtime
+        if result_file in self._measurement_cache:
+            cached_mtime, cached_result = self._measurement_cache[result_file]
+            if cached_mtime == mtime:
+                return cached_result
+
+        (
+            board_name,
+            target_name,
+            model_name,
+            scheduler_name,
+        ) = self._parse_result_file_name(result_file)
+
+        result = {}
+        result["Model"] = model_name
+        result["Board"] = board_name
+        result["Tuner"] = scheduler_name
+        result["Target"] = target_name
+
+        with result_file.open() as result_stream:
+            record = json.load(result_stream)
+            if len(record["Duration (us)"]) == 0:
+                result = None
+            else:
                 result["Duration (us)"] = np.mean(record["Duration (us)"])
                 result["Duration StdDev"] = np.std(record["Duration (us)"])
                 result["Duration PtP"] = np.ptp(record["Duration (us)"])
+                result["Base Model"] = record.get("Base Model", model_name)
+                result["Batch Size"] = record.get("Batch Size", None)
+                result["Throughput (1/s)"] = record.get("Throughput (1/s)", np.nan)
+                if "Energy (uJ)" in record:
+                    result["Power (W)"] = sum(record["Power (W)"].values())
+                    result["Energy (uJ)"] = record["Energy (uJ)"]
+
+        self._measurement_cache[result_file] = (mtime, result)
+
+        return result
+
+    def measurements(self) -> pd.DataFrame:
+        """Summary of all measurements in the dataset
 
+        Repeated calls on the same DatasetFull only re-parse result files
+        that have been added or modified since the last call.
+        """
+        measurements = []
+        result_files = set(self._result_files())
+        for result_file in sorted(result_files):
+            result = self._load_measurement(result_file)
+            if result is None:
+                continue
             measurements.append(result)
 
+        for stale_file in set(self._measurement_cache.keys()) - result_files:
+            del self._measurement_cache[stale_file]
+
         df = pd.DataFrame.from_records(measurements)
 
         df = df.sort_values(["Board", "Model", "Tuner"])
 
         return df
 
-    def network_results(self) -> List[NetworkResult]:
-        base_folder = self._base_dir / "network_results"
+    def throughput_measurements(self) -> pd.DataFrame:
+        """Summary of all multi stream throughput measurements in the dataset"""
+        measurements = []
+        base_folder = self._base_dir / "throughput_results"
+        for result_file in sorted(base_folder.glob("*/*/*.json")):
+            (
+                board_name,
+                target_name,
+                model_name,
+                scheduler_name,
+            ) = self._parse_result_file_name(result_file)
+            with result_file.open() as result_stream:
+                record = json.load(result_stream)
+
+            measurements.append(
+                {
+                    "Model": model_name,
+                    "Board": board_name,
+                    "Tuner": scheduler_name,
+                    "Target": target_name,
+                    "Streams": record["streams"],
+                    "Batch Size": record["batch_size"],
+                    "Inferences/s": record["inferences_per_second"],
+                    "Samples/s": record["samples_per_second"],
+                    "Latency P50 (us)": record.get("latency_p50"),
+                    "Latency P95 (us)": record.get("latency_p95"),
+                    "Latency P99 (us)": record.get("latency_p99"),
+                    "CPU Utilization (%)": record.get("cpu_utilization"),
+                }
+            )
+
+        return pd.DataFrame.from_records(measurements)
+
+    def best_thread_configs(self) -> pd.DataFrame:
+        """Fastest threadpool configuration found by thread sweeps per model and board"""
         measurements = []
-        for result_file in base_folder.glob("*/*/*.json"):
-            parts = result_file.parts
-            model_name = parts[-1].split(".")[0]
-            model_name, target_name = (
-                "_".join(model_name.split("_")[:-1]),
-                model_name.split("_")[-1],
+        base_folder = self._base_dir / "thread_sweep_results"
+        for result_file in sorted(base_folder.glob("*/*/*.json")):
+            (
+                board_name,
+                target_name,
+                model_name,
+                scheduler_name,
+            ) = self._parse_result_file_name(result_file)
+            with result_file.open() as result_stream:
+                record = json.load(result_stream)
+
+            best = record["best"]
+            measurements.append(
+                {
+                    "Model": model_name,
+                    "Board": board_name,
+                    "Tuner": scheduler_name,
+                    "Target": target_name,
+                    "Affinity Mode": best["affinity_mode"],
+                    "Threads": best["num_threads"],
+                    "CPUs": best["cpus"],
+                    "Duration (us)": best["latency"],
+                    "Default Duration (us)": record["default_latency"],
+                    "Speedup": record["default_latency"] / best["latency"],
+                }
             )
-            scheduler_name = parts[-2]
-            board_name = parts[-3]
+
+        return pd.DataFrame.from_records(measurements)
+
+    def sweep_curves(self) -> pd.DataFrame:
+        """Latency and throughput of models measured at several batch sizes or input shapes
+
+        Rows are grouped by the swept model (column "Base Model") and sorted by batch size.
+        """
+        df = self.measurements()
+        points = df.groupby(["Board", "Base Model", "Tuner"])["Model"].transform(
+            "nunique"
+        )
+        df = df[points > 1]
+
+        return df.sort_values(["Board", "Base Model", "Tuner", "Batch Size"])
+
+    def network_results(self) -> List[NetworkResult]:
+        measurements = []
+        for result_file in self._result_files():
+            (
+                board_name,
+                target_name,
+                model_name,
+                scheduler_name,
+            ) = self._parse_result_file_name(result_file)
 
             relay_file = result_file.with_suffix(".relay.pkl")
             tir_file = result_file.with_suffix(".primfuncs.pkl")
+            op_counts_file = result_file.with_suffix(".opcounts.pkl")
+            memory_file = result_file.with_suffix(".memory.pkl")
 
             result = NetworkResult(
                 board_name,
@@ -332,7 +546,22 @@ class DatasetFull:
                 result_file,
                 relay_file,
                 tir_file,
+                op_counts_file,
+                memory_file,
             )
             measurements.append(result)
 
         return measurements
+
+    def network_result_index(
+        self,
+    ) -> Dict[Tuple[str, str, str, str], NetworkResult]:
+        """Network results indexed by (board, model, tuner, target)"""
+        index = {}
+        for result in self.network_results():
+            key = (result.board, result.model, result.tuner, result.target)
+            if key in index:
+                logger.critical("Multiple results found for %s", str(key))
+            index[key] = result
+
+        return index
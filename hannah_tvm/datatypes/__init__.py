@@ -16,74 +16,150 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 #
+"""Custom arbitrary width integer datatypes based on ac_int
+
+Types are registered on first use, either using custom_dtype or register_type:
+
+    x = relay.cast(x, dtype=custom_dtype(6, signed=True))  # custom[SINT6]32
+
+Registered types are recorded in the HANNAH_TVM_DATATYPES environment variable,
+so that they are registered in subprocesses, e.g. tuning workers, importing this module.
+"""
 import ctypes
 import os
+import re
+from typing import Set, Tuple
 
 import numpy as np
 import tvm
 from tvm import relay
 
 from .config import BITS, OPS, SIGNED
+from .lower import (
+    create_binary_lower_func,
+    create_cast_from_float_lower_func,
+    create_cast_to_float_lower_func,
+)
 
-dir_path = os.path.dirname(os.path.realpath(__file__))
-ctypes.CDLL(os.path.join(dir_path, "libac_types.so"), ctypes.RTLD_GLOBAL)
+ENV_VAR = "HANNAH_TVM_DATATYPES"
+TYPEID_BASE = 150
 
+dir_path = os.path.dirname(os.path.realpath(__file__))
 
-typeid = 150
-for bits in BITS:
-    for sign in SIGNED:
-        typename = "S" if sign else "U"
-        typename += "INT"
-        typename += str(bits)
+_library = None
+_registered: Set[Tuple[int, bool]] = set()
 
-        tvm.target.datatype.register(typename, typeid)
 
-        tvm.target.datatype.register_op(
-            tvm.target.datatype.create_lower_func(
-                {
-                    (32, 32): f"FloatTo{typename}",  # cast from float32 to SINT6
-                }
-            ),
-            "Cast",
-            "llvm",
-            "float",
-            typename,
+def _load_library():
+    global _library
+    if _library is None:
+        _library = ctypes.CDLL(
+            os.path.join(dir_path, "libac_types.so"), ctypes.RTLD_GLOBAL
         )
+    return _library
 
-        tvm.target.datatype.register_op(
-            tvm.target.datatype.create_lower_func({(32, 32): f"{typename}ToFloat"}),
-            "Cast",
-            "llvm",
-            typename,
-            "float",
-        )
 
-        tvm.target.datatype.register_min_func(
-            tvm.target.datatype.create_min_lower_func({32: f"Min{typename}"}, typename),
-            typename,
-        )
+def type_name(bits: int, sign: bool) -> str:
+    return ("S" if sign else "U") + "INT" + str(bits)
 
-        tvm.target.datatype.register_op(
-            tvm.target.datatype.lower_ite,
-            "Call",
-            "llvm",
-            typename,
-            intrinsic_name="tir.if_then_else",
-        )
 
+def _register_type(bits, sign, typeid):
+    typename = type_name(bits, sign)
+
+    tvm.target.datatype.register(typename, typeid)
+
+    tvm.target.datatype.register_op(
+        create_cast_from_float_lower_func(bits, sign),
+        "Cast",
+        "llvm",
+        "float",
+        typename,
+    )
+
+    tvm.target.datatype.register_op(
+        create_cast_to_float_lower_func(bits, sign),
+        "Cast",
+        "llvm",
+        typename,
+        "float",
+    )
+
+    # The minimum value is only needed once per reduction, so it stays an extern call
+    tvm.target.datatype.register_min_func(
+        tvm.target.datatype.create_min_lower_func({32: f"Min{typename}"}, typename),
+        typename,
+    )
+
+    tvm.target.datatype.register_op(
+        tvm.target.datatype.lower_ite,
+        "Call",
+        "llvm",
+        typename,
+        intrinsic_name="tir.if_then_else",
+    )
+
+    tvm.target.datatype.register_op(
+        tvm.target.datatype.lower_call_pure_extern,
+        "Call",
+        "llvm",
+        typename,
+        intrinsic_name="tir.call_pure_extern",
+    )
+    for op in OPS:
         tvm.target.datatype.register_op(
-            tvm.target.datatype.lower_call_pure_extern,
-            "Call",
+            create_binary_lower_func(op, bits, sign),
+            op,
             "llvm",
             typename,
-            intrinsic_name="tir.call_pure_extern",
         )
-        for op in OPS:
-            tvm.target.datatype.register_op(
-                tvm.target.datatype.create_lower_func({32: f"{typename}{op}"}),
-                op,
-                "llvm",
-                typename,
-            )
-
-        typeid += 1
+
+
+def register(bits: int, sign: bool = True) -> str:
+    """Register the custom datatype with the given width and signedness if necessary
+
+    Returns:
+        str: the type name, e.g. SINT6
+    """
+    if bits not in BITS or sign not in SIGNED:
+        raise Exception(f"Unsupported custom datatype: {type_name(bits, sign)}")
+
+    typename = type_name(bits, sign)
+    if (bits, sign) in _registered:
+        return typename
+
+    _load_library()
+    # Type ids are derived from width and signedness to be consistent across processes
+    typeid = TYPEID_BASE + BITS.index(bits) * len(SIGNED) + SIGNED.index(sign)
+    _register_type(bits, sign, typeid)
+    _registered.add((bits, sign))
+
+    names = [name for name in os.environ.get(ENV_VAR, "").split(",") if name]
+    if typename not in names:
+        os.environ[ENV_VAR] = ",".join(names + [typename])
+
+    return typename
+
+
+def register_type(typename: str) -> str:
+    """Register a custom datatype by name, e.g. SINT6 or UINT3"""
+    match = re.fullmatch(r"([SU])INT(\d+)", typename)
+    if match is None:
+        raise Exception(f"Invalid custom datatype name: {typename}")
+    return register(int(match.group(2)), match.group(1) == "S")
+
+
+def register_all():
+    """Register all supported custom datatypes"""
+    for bits in BITS:
+        for sign in SIGNED:
+            register(bits, sign)
+
+
+def custom_dtype(bits: int, sign: bool = True) -> str:
+    """The dtype string of a custom datatype, registering the type on first use"""
+    return f"custom[{register(bits, sign)}]32"
+
+
+for _typename in os.environ.get(ENV_VAR, "").split(","):
+    if _typename:
+        register_type(_typename)
@@ -16,6 +16,7 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 #
+import argparse
 import pathlib
 import string
 
@@ -105,11 +106,35 @@ TVM_DLL uint32_t ${DT_NAME}Div(uint32_t a, uint32_t b) {
 )
 
 
+parser = argparse.ArgumentParser(
+    description="Generate the ac_int wrappers for custom datatypes"
+)
+parser.add_argument(
+    "--bits",
+    type=int,
+    nargs="+",
+    default=config.BITS,
+    help="Only generate the given bit widths",
+)
+parser.add_argument(
+    "--signedness",
+    choices=["signed", "unsigned", "both"],
+    default="both",
+    help="Only generate signed or unsigned types",
+)
+args = parser.parse_args()
+
+signs = [
+    sign
+    for sign in config.SIGNED
+    if args.signedness == "both" or sign == (args.signedness == "signed")
+]
+
 result = header
 
 
-for width in config.BITS:
-    for sign in config.SIGNED:
+for width in args.bits:
+    for sign in signs:
         BITS = width
         SIGNED = "true" if sign else "false"
         NAME_PREFIX = "S" if sign else "U"
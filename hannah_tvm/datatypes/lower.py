@@ -0,0 +1,118 @@
+#
+# Copyright (c) 2024 hannah-tvm contributors.
+#
+# This file is part of hannah-tvm.
+# See https://atreus.informatik.uni-tuebingen.de/ties/ai/hannah/hannah-tvm for further info.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Inline TIR lowering of the ac_int based custom datatypes
+
+Custom datatype values are stored in 32 bits, with the value sign extended
+for signed and zero extended for unsigned types, like the normalized
+representation of ac_int. The lowering emits plain integer arithmetic on this
+representation instead of calls into libac_types.so, so the generated code can
+be inlined and vectorized.
+"""
+
+import tvm
+from tvm.runtime import DataType
+
+
+def _dtype(base: str, lanes: int) -> str:
+    return base if lanes == 1 else f"{base}x{lanes}"
+
+
+def _const(value: int, base: str, lanes: int):
+    const = tvm.tir.const(value, base)
+    return const if lanes == 1 else tvm.tir.Broadcast(const, lanes)
+
+
+def _to_int(value, lanes: int):
+    return tvm.tir.reinterpret(_dtype("int32", lanes), value)
+
+
+def _to_uint(value, lanes: int):
+    return tvm.tir.reinterpret(_dtype("uint32", lanes), value)
+
+
+def _wrap(value, bits: int, signed: bool, lanes: int):
+    """Truncate an int32 value to bits, and sign or zero extend it to 32 bits"""
+    if bits >= 32:
+        return value
+    if signed:
+        shift = _const(32 - bits, "int32", lanes)
+        return tvm.tir.shift_right(tvm.tir.shift_left(value, shift), shift)
+    return tvm.tir.bitwise_and(value, _const((1 << bits) - 1, "int32", lanes))
+
+
+def create_binary_lower_func(op: str, bits: int, signed: bool):
+    """Lowering of the binary operations Min, Max, Add, Sub, Mul and Div"""
+
+    def lower(expr):
+        lanes = DataType(expr.dtype).lanes
+        a = _to_int(expr.a, lanes)
+        b = _to_int(expr.b, lanes)
+
+        # Add, Sub and Mul on uint32 wrap modulo 2**32, int32 overflow is undefined
+        if op == "Add":
+            result = _to_int(_to_uint(a, lanes) + _to_uint(b, lanes), lanes)
+        elif op == "Sub":
+            result = _to_int(_to_uint(a, lanes) - _to_uint(b, lanes), lanes)
+        elif op == "Mul":
+            result = _to_int(_to_uint(a, lanes) * _to_uint(b, lanes), lanes)
+        elif signed and op == "Div":
+            result = tvm.tir.Div(a, b)
+        elif signed and op == "Min":
+            result = tvm.tir.Min(a, b)
+        elif signed and op == "Max":
+            result = tvm.tir.Max(a, b)
+        else:
+            # Values of unsigned types are zero extended, so they compare and divide as uint32
+            ua = _to_uint(a, lanes)
+            ub = _to_uint(b, lanes)
+            if op == "Div":
+                return tvm.tir.Div(ua, ub)
+            elif op == "Min":
+                return tvm.tir.Min(ua, ub)
+            elif op == "Max":
+                return tvm.tir.Max(ua, ub)
+            raise Exception(f"Unsupported custom datatype operation: {op}")
+
+        return _to_uint(_wrap(result, bits, signed, lanes), lanes)
+
+    return lower
+
+
+def create_cast_from_float_lower_func(bits: int, signed: bool):
+    """Lowering of casts from float, rounding towards zero and wrapping around like ac_int"""
+
+    def lower(expr):
+        lanes = DataType(expr.dtype).lanes
+        value = tvm.tir.Cast(_dtype("int64", lanes), expr.value)
+        value = tvm.tir.Cast(_dtype("int32", lanes), value)
+        return _to_uint(_wrap(value, bits, signed, lanes), lanes)
+
+    return lower
+
+
+def create_cast_to_float_lower_func(bits: int, signed: bool):
+    """Lowering of casts to float"""
+
+    def lower(expr):
+        lanes = DataType(expr.dtype).lanes
+        value = expr.value
+        if signed:
+            value = _to_int(value, lanes)
+        return tvm.tir.Cast(expr.dtype, value)
+
+    return lower
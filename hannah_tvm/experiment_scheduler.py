@@ -17,6 +17,7 @@
 # limitations under the License.
 #
 import contextlib
+import copy
 import logging
 import time
 from abc import ABC, abstractmethod
@@ -24,10 +25,12 @@ from abc import ABC, abstractmethod
 import numpy as np
 import tabulate
 import tvm.rpc.tracker
+from omegaconf import open_dict
 from tqdm import tqdm
 from tqdm.contrib.logging import logging_redirect_tqdm
 
 from .connectors import init_board_connector
+from .load import shape_items
 from .task import ModelConfig, TaskStatus, TuningTask
 
 logger = logging.getLogger(__name__)
@@ -116,6 +119,8 @@ class ExperimentSchedulerBase(ABC):
             "progress",
             "latency",
             "latency_stdev",
+            "throughput",
+            "energy",
         ]
         results_filtered = [
             {k: v for k, v in res.items() if k in headers} for res in results
@@ -133,15 +138,51 @@ class ExperimentSchedulerBase(ABC):
         self.finish()
 
 
+def sweep_points(model_name, model_config):
+    """Expand the batch size and input shape sweeps of a model config
+
+    Returns a list of (model key, model config) with one entry per combination of
+    swept input shapes and batch sizes, or the model itself if nothing is swept.
+    """
+    batch_sizes = model_config.get("batch_sizes", None) or [None]
+    shape_sweep = model_config.get("input_shape_sweep", None) or [None]
+    if batch_sizes == [None] and shape_sweep == [None]:
+        return [(model_name, model_config)]
+
+    points = []
+    for input_shapes in shape_sweep:
+        for batch_size in batch_sizes:
+            point_name = model_name
+            point_config = copy.deepcopy(model_config)
+            with open_dict(point_config):
+                point_config.batch_sizes = None
+                point_config.input_shape_sweep = None
+                if input_shapes is not None:
+                    point_config.input_shapes = input_shapes
+                    for _, shape in shape_items(input_shapes):
+                        point_name += "_" + "x".join(str(dim) for dim in shape)
+                if batch_size is not None:
+                    point_config.batch_size = batch_size
+                    point_name += f"_bs{batch_size}"
+            points.append((point_name, point_config))
+
+    return points
+
+
 class TuningExperimentScheduler(ExperimentSchedulerBase):
     def _extract_tasks(self):
         for model_name, model_config in self.config.model.items():
-            task = TuningTask(
-                model_name,
-                self.config.backend.board,
-                model_config=model_config,
-                task_connector=self.board_connector.task_connector(),
-                tuner=self.config.backend.tuner,
-            )
-            self.worklist.append(task)
-            self.tasks.append(task)
+            # Sweep points are tuned one after another, auto_scheduler and autotvm
+            # do not tune workloads again that previous points have already tuned,
+            # meta_schedule tunes each point from scratch
+            for point_name, point_config in sweep_points(model_name, model_config):
+                task = TuningTask(
+                    point_name,
+                    self.config.backend.board,
+                    model_config=point_config,
+                    task_connector=self.board_connector.task_connector(),
+                    tuner=self.config.backend.tuner,
+                    base_model=model_name,
+                )
+                self.worklist.append(task)
+                self.tasks.append(task)
@@ -21,7 +21,9 @@ import logging
 import torch
 import tvm
 
-from .tracer import QuantizationTracer, RelayConverter
+from .tracer import ConversionError, QuantizationTracer, RelayConverter
+
+logger = logging.getLogger(__name__)
 
 
 def remove_dropout(gm):
@@ -37,7 +39,7 @@ def remove_dropout(gm):
     return gm
 
 
-def build_relay(model, dummy_input):
+def build_relay(model, dummy_input, shape_only=True, pack_weights=False):
     try:
         if not isinstance(model, torch.fx.graph_module.GraphModule):
             tracer = QuantizationTracer()
@@ -45,10 +47,19 @@ def build_relay(model, dummy_input):
             graph_module = torch.fx.GraphModule(model, traced_graph)
         else:
             graph_module = model
-        converter = RelayConverter(graph_module)
+        converter = RelayConverter(
+            graph_module, shape_only=shape_only, pack_weights=pack_weights
+        )
         mod, params = converter.run(dummy_input)
     except Exception as e:
-        logging.warning(
+        if isinstance(e, ConversionError):
+            logger.warning(
+                "No relay converters for: %s, use register_module_converter or register_function_converter to add them",
+                ", ".join(e.nodes),
+            )
+        else:
+            logger.warning("Conversion to relay failed: %s", str(e))
+        logger.warning(
             "Failed to convert model to relay, using fx converter trying with legacy converter"
         )
 
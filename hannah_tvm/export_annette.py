@@ -18,6 +18,8 @@
 #
 import argparse
 import json
+import multiprocessing as mp
+import pathlib
 from collections import OrderedDict
 from pprint import pprint
 
@@ -33,23 +35,22 @@ def main():
 
     dataset = DatasetFull()
 
-    network_model = args.model
-    board = args.board
-    target = args.target
-    tuner = args.tuner
-
     print(args)
 
-    export_successful = False
-    for network_result in dataset.network_results():
-        if network_model != "all" and network_result.model != network_model:
-            continue
-        if board != "all" and board != network_result.board:
-            continue
-        if target != "all" and target != network_result.target:
-            continue
-        if tuner != "all" and tuner != network_result.tuner:
-            continue
+    selected_results = [
+        network_result
+        for network_result in dataset.network_results()
+        if _matches(network_result, args)
+    ]
+
+    if not selected_results:
+        raise ValueError("No results found for the given parameters!")
+
+    if args.batch_dir:
+        export_batch(selected_results, args.batch_dir, jobs=args.jobs)
+        return
+
+    for network_result in selected_results:
         print("=========================")
         print("Model:", network_result.model)
         print("Board:", network_result.board)
@@ -67,7 +68,7 @@ def main():
 
         result_gen = AnnetteResultGenerator(relay)
         res = result_gen.generate_layer_dict()
-        res = result_gen.add_durations(measurements, tuner)
+        res = result_gen.add_durations(measurements, network_result.tuner)
 
         print()
         print("Result:")
@@ -79,10 +80,60 @@ def main():
             print(f"Exported hannah-tvm-tune result JSON to: {args.export_path}")
             print()
 
-        export_successful = True
 
-    if not export_successful:
-        raise ValueError("No results found for the given parameters!")
+def _matches(network_result, args):
+    if args.model != "all" and network_result.model != args.model:
+        return False
+    if args.board != "all" and network_result.board != args.board:
+        return False
+    if args.target != "all" and network_result.target != args.target:
+        return False
+    if args.tuner != "all" and network_result.tuner != args.tuner:
+        return False
+    return True
+
+
+def _export_network_result(job):
+    network_result, export_dir = job
+
+    result_gen = AnnetteResultGenerator(network_result.relay)
+    result_gen.generate_layer_dict()
+    result_gen.add_durations(network_result.measurement, network_result.tuner)
+
+    file_name = "_".join(
+        [
+            network_result.board,
+            network_result.model,
+            network_result.target,
+            network_result.tuner,
+        ]
+    )
+    export_path = pathlib.Path(export_dir) / f"{file_name}.json"
+    result_gen.json_export_to(export_path)
+
+    return export_path
+
+
+def export_batch(network_results, export_dir, jobs=None):
+    """Export annette results for all given network results into export_dir
+
+    Every network result is exported to its own file named
+    <board>_<model>_<target>_<tuner>.json. The exports are independent of
+    each other and are distributed over a pool of `jobs` worker processes.
+    """
+    export_dir = pathlib.Path(export_dir)
+    export_dir.mkdir(exist_ok=True, parents=True)
+
+    jobs_list = [(network_result, export_dir) for network_result in network_results]
+    if jobs == 1 or len(jobs_list) == 1:
+        export_paths = [_export_network_result(job) for job in jobs_list]
+    else:
+        with mp.Pool(jobs) as pool:
+            export_paths = pool.map(_export_network_result, jobs_list)
+
+    print(f"Exported {len(export_paths)} hannah-tvm-tune results to: {export_dir}")
+
+    return export_paths
 
 
 def parse_args():
@@ -92,6 +143,16 @@ def parse_args():
     parser.add_argument("target")
     parser.add_argument("tuner")
     parser.add_argument("--export_path")
+    parser.add_argument(
+        "--batch_dir",
+        help="Export every matching result as <board>_<model>_<target>_<tuner>.json into this directory",
+    )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=None,
+        help="Number of parallel export processes for --batch_dir (default: number of cpus)",
+    )
 
     return parser.parse_args()
 
@@ -110,6 +171,9 @@ class AnnetteResultGenerator(ExprVisitor):
         self.relay_graph = relay_graph
         self.layers = OrderedDict()
         self.latest_fn_hash = "None"
+        # Number of layers created for each function hash, used to give
+        # repeated functions a unique "<hash>-<n>" key without rescanning self.layers
+        self.hash_counts = {}
 
     def visit(self, expr):
         if expr in self.memo_map and isinstance(expr, Op):
@@ -118,11 +182,9 @@ class AnnetteResultGenerator(ExprVisitor):
 
     def visit_function(self, fn):
         curr_hash = fn.attrs["hash"] if "hash" in fn.attrs else "None"
-        # Check for hash collisions and update the ones colliding:
-        if curr_hash in [h.split("-")[0] for h in self.layers.keys()]:
-            curr_hash = self.update_colliding_hashes(curr_hash)
-
-        self.latest_fn_hash = curr_hash
+        # Layers are keyed "<hash>-<n>" during traversal, keys of hashes
+        # without collisions are stripped again in finalize_colliding_hashes
+        self.latest_fn_hash = f"{curr_hash}-{self.hash_counts.get(curr_hash, 0)}"
 
         self.visit(fn.body)
         for x in fn.params:
@@ -147,9 +209,10 @@ class AnnetteResultGenerator(ExprVisitor):
         op = call.op
         if isinstance(op, Op):
             curr_fn_hash = self.latest_fn_hash
-            if curr_fn_hash not in self.layers.keys():
+            if curr_fn_hash not in self.layers:
                 self.layers[curr_fn_hash] = {"ops": [], "duration (us)": 0.0}
-                # self.layers.move_to_end(curr_fn_hash, last=True)
+                orig_hash = curr_fn_hash.split("-")[0]
+                self.hash_counts[orig_hash] = self.hash_counts.get(orig_hash, 0) + 1
 
             out_op_descr = {"name": op.name}
             if hasattr(call.attrs, "kernel_size"):
@@ -162,34 +225,27 @@ class AnnetteResultGenerator(ExprVisitor):
 
         self.visit(call.op)
 
-    def update_colliding_hashes(self, hash):
+    def finalize_colliding_hashes(self):
         """
-        Updates hashes aka keys of self.layers, s.t. those that appear multiples times
+        Updates hashes aka keys of self.layers, s.t. only those that appear multiple times
         are postfixed with "-n", for n = 0, 1, 2, ...
         """
         new_layer_dict = OrderedDict()
-        # num_collisions = len([k for k in self.layers.keys() if k.split('-')[0] == hash])
-        num_collisions = 0
-        for old_key, val in self.layers.items():
-            old_key_hash = old_key.split("-")[0]
-            if old_key_hash == hash:
-                new_key = f"{old_key_hash}-{num_collisions}"
-                num_collisions += 1
-            else:
-                new_key = old_key
-            new_layer_dict[new_key] = val
+        for key, val in self.layers.items():
+            orig_hash = key.split("-")[0]
+            if self.hash_counts[orig_hash] == 1:
+                key = orig_hash
+            new_layer_dict[key] = val
 
         self.layers = new_layer_dict
-        return f"{hash}-{num_collisions}"
+        return self.layers
 
     def generate_layer_dict(self):
         self.visit(self.relay_graph)
-        return self.layers
+        return self.finalize_colliding_hashes()
 
     def add_durations(self, measurement, tuner):
         # Insert duration into executed layer data structure:
-        pprint(self.layers)
-
         if tuner == "tensorrt":
             # Results for TensorRT are currently not reported per layer.
             # Additional layers are therefore removed from the result section.
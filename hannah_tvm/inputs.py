@@ -0,0 +1,164 @@
+#
+# Copyright (c) 2024 hannah-tvm contributors.
+#
+# This file is part of hannah-tvm.
+# See https://atreus.informatik.uni-tuebingen.de/ties/ai/hannah/hannah-tvm for further info.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Input data used when measuring models
+
+By default models are measured with the random inputs generated by the model
+loaders. Models with data dependent performance (activation sparsity, early
+exits, saturating quantized kernels) can set `input_data` in their model config
+to measure a set of representative samples instead. It can be
+
+- a directory of `.npy` files with one array per input, these are memory mapped
+- an `.npz` file with one array per input
+- a directory of `.npz` files each holding one sample
+- a config with a `_target_` instantiating a custom InputProvider
+
+Arrays either have the shape of the input (a single sample) or an additional
+leading sample axis.
+"""
+
+import glob
+import logging
+import os
+from abc import ABC, abstractmethod
+from typing import Any, Dict, Iterator, List, Mapping, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class InputProvider(ABC):
+    @abstractmethod
+    def samples(
+        self, shapes: Dict[str, tuple], dtypes: Dict[str, Any]
+    ) -> Iterator[Dict[str, np.ndarray]]:
+        """Yield dictionaries mapping input names to data of the given shapes and dtypes"""
+        pass
+
+
+class ArrayInputProvider(InputProvider):
+    """Samples from one array per input stored in an `.npz` file or a directory of `.npy` files"""
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+
+    def _arrays(self) -> Mapping[str, np.ndarray]:
+        if os.path.isdir(self.path):
+            return {
+                os.path.splitext(os.path.basename(file_name))[0]: np.load(
+                    file_name, mmap_mode="r"
+                )
+                for file_name in glob.glob(os.path.join(self.path, "*.npy"))
+            }
+        return np.load(self.path)
+
+    def samples(self, shapes, dtypes):
+        arrays = self._arrays()
+
+        sample_arrays = {}
+        for name, shape in shapes.items():
+            if name not in arrays:
+                raise ValueError(f"No data for input {name} in {self.path}")
+            array = arrays[name]
+            if tuple(array.shape) == tuple(shape):
+                array = array[np.newaxis]
+            elif tuple(array.shape[1:]) != tuple(shape):
+                raise ValueError(
+                    f"Data for input {name} in {self.path} has shape {array.shape}, expected {tuple(shape)}"
+                )
+            sample_arrays[name] = array
+
+        num_samples = min(array.shape[0] for array in sample_arrays.values())
+        for sample in range(num_samples):
+            yield {
+                name: np.ascontiguousarray(array[sample], dtype=dtypes[name])
+                for name, array in sample_arrays.items()
+            }
+
+
+class SampleDirectoryInputProvider(InputProvider):
+    """Samples stored as one `.npz` file per sample"""
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+
+    def samples(self, shapes, dtypes):
+        for file_name in sorted(glob.glob(os.path.join(self.path, "*.npz"))):
+            with np.load(file_name) as data:
+                sample = {}
+                for name, shape in shapes.items():
+                    array = data[name]
+                    if tuple(array.shape) != tuple(shape):
+                        raise ValueError(
+                            f"Data for input {name} in {file_name} has shape {array.shape}, expected {tuple(shape)}"
+                        )
+                    sample[name] = np.ascontiguousarray(array, dtype=dtypes[name])
+                yield sample
+
+
+def input_provider(input_data: Any) -> Optional[InputProvider]:
+    "Create the input provider for the input_data of a model config"
+    if input_data is None:
+        return None
+    if isinstance(input_data, InputProvider):
+        return input_data
+    if not isinstance(input_data, str):
+        import hydra.utils
+
+        return hydra.utils.instantiate(input_data)
+
+    from hydra.utils import to_absolute_path
+
+    path = to_absolute_path(input_data)
+    if os.path.isdir(path) and not glob.glob(os.path.join(path, "*.npy")):
+        return SampleDirectoryInputProvider(path)
+    return ArrayInputProvider(path)
+
+
+def measurement_samples(
+    model: Any, inputs: Dict[str, np.ndarray], default_num_samples: int = 8
+) -> List[Dict[str, np.ndarray]]:
+    """Inputs to measure a model with
+
+    `inputs` are the inputs generated by the model loader, they define the expected
+    shapes and dtypes and are used as the only sample if no input data is configured.
+    At most `default_num_samples` samples are measured, unless the model config sets
+    `num_input_samples`.
+    """
+    provider = input_provider(getattr(model, "input_data", None))
+    if provider is None:
+        return [inputs]
+
+    shapes = {name: tuple(value.shape) for name, value in inputs.items()}
+    dtypes = {name: value.dtype for name, value in inputs.items()}
+
+    num_samples = getattr(model, "num_input_samples", None)
+    if num_samples is None:
+        num_samples = default_num_samples
+    samples = []
+    for sample in provider.samples(shapes, dtypes):
+        if num_samples > 0 and len(samples) >= num_samples:
+            break
+        samples.append(sample)
+
+    if not samples:
+        raise ValueError(f"Input data {model.input_data} does not contain any samples")
+
+    logger.info("Measuring with %d input samples", len(samples))
+
+    return samples
@@ -16,7 +16,9 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 #
+import hashlib
 import logging
+import mmap
 import os
 import sys
 
@@ -28,12 +30,62 @@ import tvm.relay as relay
 from hydra.utils import to_absolute_path
 from omegaconf import OmegaConf
 
+from .model_cache import derived_dir, fetch, local_path
+
 logger = logging.getLogger("hannah-tvm.compile")
 
 cache_dir = appdirs.user_cache_dir("hannah-tvm")
 
 
-def _load_torch(model_path, input_shapes):
+def _read_buffer(model_path):
+    """Read the model file, local files are memory mapped instead of read into memory.
+
+    The mapping is not closed explicitly, as frontends keep views into the buffer
+    alive, it is released with the last reference to it.
+    """
+    path = local_path(model_path)
+    if path is None:
+        with fsspec.open(model_path, "rb") as f:
+            return f.read()
+
+    with open(path, "rb") as f:
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def _file_key(path):
+    "Key identifying the current version of a local file"
+    stat = os.stat(path)
+    key = f"{os.path.realpath(path)}:{stat.st_size}:{stat.st_mtime_ns}"
+    return hashlib.sha256(key.encode()).hexdigest()
+
+
+def shape_items(input_shapes):
+    "Input shapes given as mapping or as list of (name, shape) pairs"
+    if input_shapes is None:
+        return []
+    if hasattr(input_shapes, "items"):
+        return list(input_shapes.items())
+    return [(name, shape) for name, shape in input_shapes]
+
+
+def _override_shapes(shapes, input_shapes=None, batch_size=None):
+    """Apply the configured input shapes and batch size to the shapes read from a model"""
+    shapes = dict(shapes)
+    for name, shape in shape_items(input_shapes):
+        if name not in shapes:
+            raise Exception(f"Model has no input {name}, inputs are: {list(shapes)}")
+        shapes[name] = tuple(shape)
+
+    if batch_size is not None:
+        shapes = {
+            name: (batch_size,) + tuple(shape[1:]) if len(shape) > 0 else shape
+            for name, shape in shapes.items()
+        }
+
+    return shapes
+
+
+def _load_torch(model_path, input_shapes, batch_size=None):
     logger.info("Loading model %s", str(model_path))
 
     try:
@@ -47,7 +99,8 @@ def _load_torch(model_path, input_shapes):
         script_model = torch.jit.load(f)
 
     input_info = []
-    for name, shape in input_shapes:
+    shapes = _override_shapes(dict(shape_items(input_shapes)), batch_size=batch_size)
+    for name, shape in shapes.items():
         input_info.append((name, tuple(shape)))
 
     mod, params = relay.frontend.from_pytorch(script_model, input_info)
@@ -59,24 +112,47 @@ def _load_torch(model_path, input_shapes):
     return mod, params, input_data
 
 
-def _load_onnx(model_path, input_shapes):
+def _load_onnx(
+    model_path, input_shapes, batch_size=None, check=True, infer_shapes=True
+):
     logger.info("Loading model %s", str(model_path))
     try:
         import onnx
+        import onnx.external_data_helper
         import onnx.version_converter
     except ImportError:
         logger.error("Could not import onnx, please make sure it is installed")
         sys.exit(-1)
 
-    model_file = fsspec.open(
-        "filecache::" + model_path,
-        filecache={"cache_storage": os.path.join(cache_dir, "models")},
+    # The model is checked and loaded from a local copy, which allows onnx to
+    # check models above 2GB from their path and to load external data
+    model_file = fetch(model_path)
+    # Files derived from the model are stored in the model cache
+    model_dir = derived_dir(_file_key(model_file))
+
+    if check:
+        # Successful checks are recorded, so unchanged models are only checked once
+        checked_marker = os.path.join(model_dir, "onnx_checked")
+        if not os.path.exists(checked_marker):
+            onnx.checker.check_model(model_file)
+            with open(checked_marker, "w") as f:
+                f.write(model_file)
+
+    load_file = model_file
+    if infer_shapes:
+        # Shape inference runs on the files, the inferred model is cached
+        load_file = os.path.join(model_dir, "onnx_inferred.onnx")
+        if not os.path.exists(load_file):
+            tmp_file = f"{load_file}.{os.getpid()}.tmp"
+            onnx.shape_inference.infer_shapes_path(model_file, tmp_file)
+            os.replace(tmp_file, load_file)
+
+    onnx_model = onnx.load(load_file, load_external_data=False)
+    # External data is stored relative to the original model file
+    onnx.external_data_helper.load_external_data_for_model(
+        onnx_model, os.path.dirname(model_file)
     )
-    with model_file as f:
-        onnx_model = onnx.load(f)
-        onnx.checker.check_model(onnx_model)
-        # onnx_model = onnx.version_converter.convert_version(onnx_model, 11)
-        onnx_model = onnx.shape_inference.infer_shapes(onnx_model)
+    # onnx_model = onnx.version_converter.convert_version(onnx_model, 11)
     graph = onnx_model.graph
 
     type_map = {
@@ -105,6 +181,8 @@ def _load_onnx(model_path, input_shapes):
         shape_dict[input.name] = tuple(input_shape)
         dtype_dict[input.name] = type_map[input.type.tensor_type.elem_type]
 
+    shape_dict = _override_shapes(shape_dict, input_shapes, batch_size)
+
     print("loading onnx")
     mod, params = relay.frontend.from_onnx(onnx_model, shape_dict, dtype_dict)
 
@@ -115,7 +193,7 @@ def _load_onnx(model_path, input_shapes):
     return mod, params, input_data
 
 
-def _load_tflite(model_path, input_shapes):
+def _load_tflite(model_path, input_shapes, batch_size=None):
     logger.info("Loading model %s", str(model_path))
 
     try:
@@ -158,11 +236,8 @@ def _load_tflite(model_path, input_shapes):
                 t = g.Tensors(g.Outputs(i))
                 self.out_tensors.append(TensorInfo(t))
 
-    model_file = fsspec.open(model_path, "rb")
-
-    with model_file as f:
-        model_buf = f.read()
-        tflite_model = tflite.Model.GetRootAsModel(model_buf, 0)
+    model_buf = _read_buffer(model_path)
+    tflite_model = tflite.Model.GetRootAsModel(model_buf, 0)
 
     shapes = {}
     types = {}
@@ -173,18 +248,22 @@ def _load_tflite(model_path, input_shapes):
         shapes[t.name] = t.shape
         types[t.name] = t.ty
 
+    shapes = _override_shapes(shapes, input_shapes, batch_size)
+
     mod, params = relay.frontend.from_tflite(
         tflite_model, shape_dict=shapes, dtype_dict=types
     )
 
     inputs = {}
     for tensor_info in model_info.in_tensors:
-        inputs[t.name] = np.random.uniform(size=t.shape).astype(t.ty)
+        inputs[tensor_info.name] = np.random.uniform(
+            size=shapes[tensor_info.name]
+        ).astype(tensor_info.ty)
 
     return mod, params, inputs
 
 
-def _load_tensorflow(model_path, input_shapes):
+def _load_tensorflow(model_path, input_shapes, batch_size=None):
     import tvm.relay.testing.tf as tf_testing
 
     try:
@@ -198,24 +277,27 @@ def _load_tensorflow(model_path, input_shapes):
     except ImportError:
         tf_compat_v1 = tf
 
+    # protobuf only parses bytes and copies the data anyway, so the GraphDef is
+    # not memory mapped
+    graph_def = tf_compat_v1.GraphDef()
     with tf_compat_v1.gfile.GFile(model_path, "rb") as f:
-        graph_def = tf_compat_v1.GraphDef()
         graph_def.ParseFromString(f.read())
-        tf.import_graph_def(graph_def, name="")
 
-        graph_def = tf_testing.ProcessGraphDefParam(graph_def)
+    tf.import_graph_def(graph_def, name="")
+
+    graph_def = tf_testing.ProcessGraphDefParam(graph_def)
 
-        node_names = [n.name for n in graph_def.node]
+    node_names = [n.name for n in graph_def.node]
 
-        with tf_compat_v1.Session() as sess:
-            graph_def = tf_testing.AddShapesToGraphDef(sess, node_names[-1])
+    with tf_compat_v1.Session() as sess:
+        graph_def = tf_testing.AddShapesToGraphDef(sess, node_names[-1])
 
-        all_placeholders = [
-            placeholder
-            for op in tf_compat_v1.get_default_graph().get_operations()
-            if op.type == "Placeholder"
-            for placeholder in op.values()
-        ]
+    all_placeholders = [
+        placeholder
+        for op in tf_compat_v1.get_default_graph().get_operations()
+        if op.type == "Placeholder"
+        for placeholder in op.values()
+    ]
 
     shapes = {}
     types = {}
@@ -224,6 +306,8 @@ def _load_tensorflow(model_path, input_shapes):
         shapes[input.op.name] = tuple(input.shape)
         types[input.op.name] = input.dtype.as_numpy_dtype
 
+    shapes = _override_shapes(shapes, input_shapes, batch_size)
+
     mod, params = relay.frontend.from_tensorflow(graph_def, shape=shapes)
 
     inputs = {}
@@ -236,9 +320,13 @@ def _load_tensorflow(model_path, input_shapes):
 
 
 def load_model(model):
-    model_path = model.url
     input_shapes = model.input_shapes
+    batch_size = getattr(model, "batch_size", None)
     filename = model.filename
+    # Remote models are shared between tasks through the model cache
+    model_path = fetch(
+        model.url, sha256=getattr(model, "sha256", None), filename=filename
+    )
 
     if filename is not None:
         suffix = filename.split(".")[-1]
@@ -246,12 +334,18 @@ def load_model(model):
         suffix = model_path.split(".")[-1]
 
     if suffix == "onnx":
-        return _load_onnx(model_path, input_shapes)
+        return _load_onnx(
+            model_path,
+            input_shapes,
+            batch_size=batch_size,
+            check=getattr(model, "check", True),
+            infer_shapes=getattr(model, "infer_shapes", True),
+        )
     elif suffix == "pt":
-        return _load_torch(model_path, input_shapes)
+        return _load_torch(model_path, input_shapes, batch_size=batch_size)
     elif suffix == "tflite":
-        return _load_tflite(model_path, input_shapes)
+        return _load_tflite(model_path, input_shapes, batch_size=batch_size)
     elif suffix == "pb":
-        return _load_tensorflow(model_path, input_shapes)
+        return _load_tensorflow(model_path, input_shapes, batch_size=batch_size)
     else:
         raise Exception(f"File format not supported {suffix}")
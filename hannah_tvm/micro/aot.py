@@ -38,6 +38,8 @@ from tvm.micro.testing.utils import mlf_extract_workspace_size_bytes
 from tvm.relay.backend import Executor, Runtime
 from tvm.relay.backend.utils import mangle_module_name
 
+from ..utils.dlpack import to_tvm
+
 _LOG = logging.getLogger(__name__)
 
 NP_TYPE_TO_C = {
@@ -656,7 +658,7 @@ def generate_ref_data(mod, input_data, params=None, target="llvm"):
     lib.export_library(lib_path)
     lib = tvm.runtime.load_module(lib_path)
     grt_mod = graph_executor.GraphModule(lib["default"](tvm.cpu()))
-    grt_mod.set_input(**input_data)
+    grt_mod.set_input(**{name: to_tvm(val) for name, val in input_data.items()})
     grt_mod.run()
     output_count = grt_mod.get_num_outputs()
     out = [grt_mod.get_output(i).numpy() for i in range(output_count)]
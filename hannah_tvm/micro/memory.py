@@ -0,0 +1,199 @@
+#
+# Copyright (c) 2024 hannah-tvm contributors.
+#
+# This file is part of hannah-tvm.
+# See https://atreus.informatik.uni-tuebingen.de/ties/ai/hannah/hannah-tvm for further info.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+"""Static memory estimation for micro targets"""
+import logging
+import pathlib
+import tempfile
+from dataclasses import asdict, dataclass
+from functools import reduce
+from typing import Dict, List, Optional
+
+import numpy as np
+import tvm
+from tvm import relay
+from tvm.micro import export_model_library_format
+from tvm.micro.testing.utils import mlf_extract_workspace_size_bytes
+from tvm.relay import ExprVisitor
+
+from ..passes.op_counter import dtype_bytes
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class MemoryEstimate:
+    """Estimated memory requirements of a model
+
+    Attributes:
+        workspace_bytes (int): size of the intermediate tensors live at the same time
+        constant_bytes (int): size of the model parameters and constants
+        io_bytes (int): size of the model inputs and outputs
+    """
+
+    workspace_bytes: int
+    constant_bytes: int
+    io_bytes: int
+
+    @property
+    def ram_bytes(self) -> int:
+        return self.workspace_bytes + self.io_bytes
+
+    def to_dict(self) -> Dict[str, int]:
+        result = asdict(self)
+        result["ram_bytes"] = self.ram_bytes
+        return result
+
+
+def _type_bytes(checked_type) -> int:
+    if isinstance(checked_type, relay.TupleType):
+        return sum(_type_bytes(field) for field in checked_type.fields)
+    if isinstance(checked_type, relay.TensorType):
+        elements = reduce(lambda x, y: x * y, [int(d) for d in checked_type.shape], 1)
+        return elements * dtype_bytes(checked_type.dtype)
+
+    logger.warning("Unhandled type %s assuming size 0", str(checked_type))
+    return 0
+
+
+def _producers(expr) -> List[relay.Call]:
+    if isinstance(expr, relay.Call):
+        return [expr]
+    elif isinstance(expr, relay.Tuple):
+        return [p for field in expr.fields for p in _producers(field)]
+    elif isinstance(expr, relay.TupleGetItem):
+        return _producers(expr.tuple_value)
+    return []
+
+
+class _CallOrder(ExprVisitor):
+    """Collects constants and top level calls in execution order"""
+
+    def __init__(self):
+        super().__init__()
+        self.calls = []
+        self.constant_bytes = 0
+
+    def visit_call(self, call):
+        for arg in call.args:
+            self.visit(arg)
+        # Fused primitive functions are not descended into
+        if not isinstance(call.op, relay.Function):
+            self.visit(call.op)
+        self.calls.append(call)
+
+    def visit_constant(self, const):
+        self.constant_bytes += const.data.numpy().nbytes
+
+
+def _fuse(mod):
+    seq = tvm.transform.Sequential(
+        [
+            relay.transform.InferType(),
+            relay.transform.SimplifyInference(),
+            relay.transform.FuseOps(fuse_opt_level=2),
+            relay.transform.InferType(),
+        ]
+    )
+    try:
+        with tvm.transform.PassContext(opt_level=3):
+            return seq(mod)
+    except Exception as e:
+        logger.warning("Could not fuse module for memory estimation: %s", str(e))
+        return relay.transform.InferType()(mod)
+
+
+def estimate_memory(
+    mod: tvm.IRModule, params: Optional[Dict[str, np.ndarray]] = None
+) -> MemoryEstimate:
+    """Estimate memory requirements of a relay module before it is built
+
+    The workspace estimate simulates the liveness of the outputs of the
+    fused operators in execution order, which is an upper bound for the
+    memory planned by the graph/aot executors and USMP.
+
+    Args:
+        mod (tvm.IRModule): relay module containing a main function
+        params (Optional[Dict[str, np.ndarray]]): parameters of the relay module
+
+    Returns:
+        MemoryEstimate: the estimated workspace, constant and io memory
+    """
+    if params is None:
+        params = {}
+
+    mod = _fuse(mod)
+    main = mod["main"]
+
+    io_bytes = _type_bytes(main.body.checked_type)
+    constant_bytes = 0
+    for param in main.params:
+        if param.name_hint in params:
+            constant_bytes += np.asarray(params[param.name_hint]).nbytes
+        else:
+            io_bytes += _type_bytes(param.checked_type)
+
+    call_order = _CallOrder()
+    call_order.visit(main.body)
+    constant_bytes += call_order.constant_bytes
+
+    calls = call_order.calls
+    outputs = set(_producers(main.body))
+
+    last_use = {}
+    for num, call in enumerate(calls):
+        for arg in call.args:
+            for producer in _producers(arg):
+                last_use[producer] = num
+
+    live_bytes = 0
+    workspace_bytes = 0
+    frees: Dict[int, int] = {}
+    for num, call in enumerate(calls):
+        if call not in outputs:
+            size = _type_bytes(call.checked_type)
+            live_bytes += size
+            free_at = last_use.get(call, num)
+            frees[free_at] = frees.get(free_at, 0) + size
+        workspace_bytes = max(workspace_bytes, live_bytes)
+        live_bytes -= frees.pop(num, 0)
+
+    return MemoryEstimate(workspace_bytes, constant_bytes, io_bytes)
+
+
+def planned_workspace_bytes(lib) -> int:
+    """Workspace size planned during the build, extracted from the model library format"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        mlf_path = pathlib.Path(tmp_dir) / "model.tar"
+        export_model_library_format(lib, mlf_path)
+        return mlf_extract_workspace_size_bytes(mlf_path)
+
+
+def check_memory(estimate: MemoryEstimate, micro_config) -> None:
+    """Raise if an estimate exceeds the memory limits of a micro configuration"""
+    ram_bytes = micro_config.get("ram_bytes", None)
+    flash_bytes = micro_config.get("flash_bytes", None)
+
+    if ram_bytes is not None and estimate.ram_bytes > ram_bytes:
+        raise Exception(
+            f"Model needs {estimate.ram_bytes} bytes of RAM ({estimate.workspace_bytes} workspace, {estimate.io_bytes} io) but board only provides {ram_bytes} bytes"
+        )
+    if flash_bytes is not None and estimate.constant_bytes > flash_bytes:
+        raise Exception(
+            f"Model needs {estimate.constant_bytes} bytes for constants but board only provides {flash_bytes} bytes of flash"
+        )
@@ -0,0 +1,259 @@
+#
+# Copyright (c) 2024 hannah-tvm contributors.
+#
+# This file is part of hannah-tvm.
+# See https://atreus.informatik.uni-tuebingen.de/ties/ai/hannah/hannah-tvm for further info.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Shared on disk cache for model files
+
+Remote models are downloaded once into the user cache directory and shared by
+all frontends and processes. Downloads are serialized per model with file locks,
+so parallel tuning tasks wait for a running download instead of starting their
+own. The cache is limited in size, least recently used models are evicted first.
+Files derived from models, e.g. shape inferred onnx models, are stored in cache
+entries as well, so they are accounted for and evicted like models. Entries used
+within the grace period are never evicted, as other processes may still read them.
+"""
+
+import contextlib
+import fcntl
+import hashlib
+import json
+import logging
+import os
+import shutil
+import time
+from typing import Any, Dict, Iterator, Optional
+
+import appdirs
+import fsspec
+
+logger = logging.getLogger("hannah-tvm.model_cache")
+
+ENV_MAX_BYTES = "HANNAH_TVM_MODEL_CACHE_BYTES"
+DEFAULT_MAX_BYTES = 20 * 1024**3
+DEFAULT_GRACE_PERIOD_S = 3600.0
+
+_META_FILE = "entry.json"
+_CHUNK_SIZE = 1024 * 1024
+
+
+def local_path(url: str) -> Optional[str]:
+    "Path of the model file if it is stored on the local file system, else None"
+    protocol, path = fsspec.core.split_protocol(url)
+    if protocol not in (None, "file") or "::" in url:
+        return None
+    return os.path.abspath(path)
+
+
+def _dir_size(path: str) -> int:
+    "Size of the files in a cache entry, without its metadata"
+    size = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            if name == _META_FILE:
+                continue
+            with contextlib.suppress(OSError):
+                size += os.path.getsize(os.path.join(root, name))
+    return size
+
+
+class ModelCache:
+    def __init__(
+        self,
+        cache_dir: Optional[str] = None,
+        max_bytes: Optional[int] = None,
+        grace_period_s: float = DEFAULT_GRACE_PERIOD_S,
+    ) -> None:
+        if cache_dir is None:
+            cache_dir = os.path.join(
+                appdirs.user_cache_dir("hannah-tvm"), "model_cache"
+            )
+        if max_bytes is None:
+            max_bytes = int(os.environ.get(ENV_MAX_BYTES, DEFAULT_MAX_BYTES))
+
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.grace_period_s = grace_period_s
+
+    def fetch(
+        self, url: str, sha256: Optional[str] = None, filename: Optional[str] = None
+    ) -> str:
+        """Return a local path for the model at `url`, downloading it if necessary.
+
+        Local files are returned as is. If `sha256` is given, the cached copy of a
+        remote model must match it, a mismatching copy is downloaded again and a
+        ValueError is raised if the download does not match either.
+        """
+        path = local_path(url)
+        if path is not None:
+            return path
+
+        entry_dir = self._entry_dir(url)
+        os.makedirs(self.cache_dir, exist_ok=True)
+        with self._lock(entry_dir):
+            meta = self._read_meta(entry_dir)
+            if (
+                meta is not None
+                and sha256 is not None
+                and meta["sha256"] != sha256.lower()
+            ):
+                logger.warning(
+                    "Cached copy of %s does not match its hash, downloading it again",
+                    url,
+                )
+                meta = None
+            if meta is None:
+                meta = self._download(url, entry_dir, filename)
+            if sha256 is not None and meta["sha256"] != sha256.lower():
+                shutil.rmtree(entry_dir, ignore_errors=True)
+                raise ValueError(
+                    f"Hash mismatch for model {url}: expected {sha256.lower()}, got {meta['sha256']}"
+                )
+
+            meta["last_used"] = time.time()
+            self._write_meta(entry_dir, meta)
+            path = os.path.join(entry_dir, meta["filename"])
+
+        self.evict(keep=entry_dir)
+
+        return path
+
+    def derived_dir(self, key: str) -> str:
+        """Directory for files derived from the model identified by `key`
+
+        The directory is a cache entry of its own, its files count towards the cache
+        size and are evicted together when the entry has not been used for long.
+        """
+        entry_dir = self._entry_dir(f"derived:{key}")
+        os.makedirs(entry_dir, exist_ok=True)
+        with self._lock(entry_dir):
+            meta = self._read_meta(entry_dir)
+            if meta is None:
+                meta = {"url": None, "filename": None, "sha256": None}
+            meta["size"] = _dir_size(entry_dir)
+            meta["last_used"] = time.time()
+            self._write_meta(entry_dir, meta)
+
+        self.evict(keep=entry_dir)
+
+        return entry_dir
+
+    def evict(self, keep: Optional[str] = None) -> None:
+        """Remove least recently used entries until the cache fits into max_bytes
+
+        Entries used within the grace period are kept, because processes that
+        fetched them may still be reading their files.
+        """
+        entries = []
+        for name in os.listdir(self.cache_dir) if os.path.isdir(self.cache_dir) else []:
+            entry_dir = os.path.join(self.cache_dir, name)
+            meta = self._read_meta(entry_dir)
+            if meta is not None:
+                # Derived files are added to entries after their metadata is written
+                entries.append((meta["last_used"], _dir_size(entry_dir), entry_dir))
+
+        total_bytes = sum(size for _, size, _ in entries)
+        now = time.time()
+        for last_used, size, entry_dir in sorted(entries):
+            if total_bytes <= self.max_bytes:
+                break
+            if entry_dir == keep or now - last_used < self.grace_period_s:
+                continue
+            # Models currently being downloaded or fetched by another process are kept
+            with self._lock(entry_dir, blocking=False) as locked:
+                if not locked:
+                    continue
+                logger.info("Evicting %s from the model cache", entry_dir)
+                shutil.rmtree(entry_dir, ignore_errors=True)
+                total_bytes -= size
+
+    def _entry_dir(self, url: str) -> str:
+        return os.path.join(
+            self.cache_dir, hashlib.sha256(url.encode()).hexdigest()[:24]
+        )
+
+    @contextlib.contextmanager
+    def _lock(self, entry_dir: str, blocking: bool = True) -> Iterator[bool]:
+        with open(entry_dir + ".lock", "w") as lock_file:
+            try:
+                fcntl.flock(
+                    lock_file,
+                    fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB,
+                )
+            except BlockingIOError:
+                yield False
+                return
+            try:
+                yield True
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _download(
+        self, url: str, entry_dir: str, filename: Optional[str]
+    ) -> Dict[str, Any]:
+        logger.info("Downloading model %s", url)
+        shutil.rmtree(entry_dir, ignore_errors=True)
+        os.makedirs(entry_dir)
+
+        if filename is None:
+            filename = os.path.basename(
+                fsspec.core.split_protocol(url)[1].split("?")[0]
+            )
+        tmp_file = os.path.join(entry_dir, filename + ".tmp")
+
+        digest = hashlib.sha256()
+        size = 0
+        with fsspec.open(url, "rb") as src, open(tmp_file, "wb") as dst:
+            while True:
+                chunk = src.read(_CHUNK_SIZE)
+                if not chunk:
+                    break
+                digest.update(chunk)
+                dst.write(chunk)
+                size += len(chunk)
+        os.replace(tmp_file, os.path.join(entry_dir, filename))
+
+        return {
+            "url": url,
+            "filename": filename,
+            "sha256": digest.hexdigest(),
+            "size": size,
+            "last_used": time.time(),
+        }
+
+    def _read_meta(self, entry_dir: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(os.path.join(entry_dir, _META_FILE)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write_meta(self, entry_dir: str, meta: Dict[str, Any]) -> None:
+        tmp_file = os.path.join(entry_dir, _META_FILE + ".tmp")
+        with open(tmp_file, "w") as f:
+            json.dump(meta, f)
+        os.replace(tmp_file, os.path.join(entry_dir, _META_FILE))
+
+
+def fetch(
+    url: str, sha256: Optional[str] = None, filename: Optional[str] = None
+) -> str:
+    "Fetch a model using the default model cache"
+    return ModelCache().fetch(url, sha256=sha256, filename=filename)
+
+
+def derived_dir(key: str) -> str:
+    "Directory for files derived from a model in the default model cache"
+    return ModelCache().derived_dir(key)
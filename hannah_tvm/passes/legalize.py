@@ -19,6 +19,14 @@
 import tvm.relay
 
 
+def _integer_range(dtype: str):
+    """Range of values of the integer dtype, e.g. int4 or uint12"""
+    if dtype.startswith("uint"):
+        return 0, 2 ** int(dtype[4:]) - 1
+    bits = int(dtype[3:])
+    return -(2 ** (bits - 1)), 2 ** (bits - 1) - 1
+
+
 @tvm.relay.transform.function_pass(opt_level=0)
 class LegalizeQuantizedTypes(tvm.relay.expr_functor.ExprMutator):
     def __init__(self):
@@ -98,7 +106,10 @@ class LegalizeQuantizedTypes(tvm.relay.expr_functor.ExprMutator):
             new_fn, new_args, new_attrs, call.type_args, call.span
         )
 
-        if call.op.name == "nn.conv1d":
+        out_dtype = None
+        if not isinstance(call.op, tvm.ir.Op):
+            pass
+        elif call.op.name == "nn.conv1d":
             out_dtype = call.attrs.out_dtype
             new_attrs = dict(call.attrs)
             new_attrs["out_dtype"] = self.dtype_map[out_dtype]
@@ -128,5 +139,23 @@ class LegalizeQuantizedTypes(tvm.relay.expr_functor.ExprMutator):
             new_attrs = dict(call.attrs)
             new_attrs["dtype"] = self.dtype_map[out_dtype]
             new_call = tvm.relay.cast(*new_args, **new_attrs)
+        elif call.op.name == "clip":
+            # Merge with the saturating clip of a preceding requantize or cast
+            data = new_args[0]
+            if (
+                isinstance(data, tvm.relay.Call)
+                and isinstance(data.op, tvm.ir.Op)
+                and data.op.name == "clip"
+            ):
+                new_call = tvm.relay.clip(
+                    data.args[0],
+                    max(float(call.attrs.a_min), float(data.attrs.a_min)),
+                    min(float(call.attrs.a_max), float(data.attrs.a_max)),
+                )
+
+        # Saturate values narrowed to sub byte or odd bit width types
+        if out_dtype is not None and self.dtype_map[out_dtype] != out_dtype:
+            a_min, a_max = _integer_range(out_dtype)
+            new_call = tvm.relay.clip(new_call, a_min, a_max)
 
         return new_call
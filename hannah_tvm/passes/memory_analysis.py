@@ -16,39 +16,84 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 #
+import argparse
 import logging
-from dataclasses import dataclass
+from dataclasses import asdict, dataclass, field
 from functools import reduce
+from typing import Dict, Optional
 
 import tvm
-from tvm import autotvm, relay, tir
+from tvm import relay, tir
+
+from .op_counter import const_extent, dtype_bytes
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class BufferInfo:
+    """Footprint and traffic of a single buffer"""
+
+    name: str
+    dtype: str
+    scope: str
+    size_bytes: int
+    is_param: bool = False
+    bytes_loaded: int = 0
+    bytes_stored: int = 0
 
 
 @dataclass
-class DomainElement:
-    extent: int
-    var: str
+class MemoryAnalysisResult:
+    """Memory analysis of a single PrimFunc"""
+
+    name: str
+    buffers: Dict[str, BufferInfo] = field(default_factory=dict)
+    peak_workspace_bytes: int = 0
+
+    @property
+    def io_bytes(self) -> int:
+        return sum(b.size_bytes for b in self.buffers.values() if b.is_param)
+
+    @property
+    def peak_live_bytes(self) -> int:
+        return self.io_bytes + self.peak_workspace_bytes
+
+    @property
+    def bytes_loaded(self) -> int:
+        return sum(b.bytes_loaded for b in self.buffers.values())
+
+    @property
+    def bytes_stored(self) -> int:
+        return sum(b.bytes_stored for b in self.buffers.values())
+
+    def to_dict(self):
+        result = asdict(self)
+        result["io_bytes"] = self.io_bytes
+        result["peak_live_bytes"] = self.peak_live_bytes
+        result["bytes_loaded"] = self.bytes_loaded
+        result["bytes_stored"] = self.bytes_stored
+        return result
 
 
 class MemoryAnalysis:
+    """Analyzes buffer footprints, peak live memory and memory traffic of a PrimFunc
+
+    Parameter buffers are considered live for the whole function, allocations
+    are live inside the scope of their Allocate statement. Loads and stores are
+    accumulated over the full loop iteration domain, loops with non constant
+    extents are counted as a single iteration.
+    """
+
     def __init__(self):
-        self.global_symbol = {}
-        self.buffers = {}
-        self.memory_accesses = []
-
-    def _dtype_size(self, dtype):
-        if dtype.startswith("int"):
-            dtype = dtype.replace("int", int)
-            size = int(dtype)
-        elif dtype.startswith("float"):
-            dtype = dtype.replace("float", "")
-            size = int(dtype)
-        else:
-            logging.warn(f"Unknown dtype {dtype} assuming 32 bits")
-            size = 32
-        return size
+        self.results: Dict[str, MemoryAnalysisResult] = {}
+        self.buffers: Dict[tir.Var, BufferInfo] = {}
+
+    def _dtype_size(self, dtype) -> int:
+        """Size of a single element of dtype in bytes"""
+        return dtype_bytes(dtype)
 
-    def _buffer_size(self, buffer):
+    def _buffer_size(self, buffer) -> int:
         dtype = buffer.dtype
         element_size = self._dtype_size(dtype)
         shape = []
@@ -57,95 +102,201 @@ class MemoryAnalysis:
         elif isinstance(buffer, tir.Buffer):
             shape = buffer.shape
         else:
-            logging.warning(f"Unhandled buffer type: {type(buffer)}")
+            logger.warning(f"Unhandled buffer type: {type(buffer)}")
+
+        extents = [const_extent(extent) for extent in shape]
+        if None in extents:
+            logger.warning(f"Buffer with non constant shape {shape} assuming size 0")
+            return 0
 
-        elements = reduce(lambda x, y: x * y, shape, 1)
-        if elements == 0:
-            elements = 1
+        elements = reduce(lambda x, y: x * y, extents, 1)
 
         return element_size * elements
 
-    def extract_buffers(self, op):
-        if isinstance(op, tir.stmt.Allocate):
-            # print(op)
-            assert op.span is None
-            # if tvm.ir.structural_equal(op.condition, tvm.ir.make_node("IntImm", dtype="int32", value=1)):
-            assert op.condition.value == 1
-            self.buffers[op.buffer_var] = op
-
-    def extract_memory_references(self, op, iteration_domain=None):
-        if iteration_domain is None:
-            iteration_domain = []
-
-        print(type(op))
-
-        if isinstance(op, tir.Load):
-            print("load", op)
-        elif isinstance(op, tir.Store):
-            print("store", op)
-        elif isinstance(op, tir.BufferLoad):
-            logging.warning("unhandled buffer_load %s", op)
-        elif isinstance(op, tir.BufferStore):
-            logging.warning("buffer_store %s", op)
-        elif isinstance(op, tir.ProducerLoad):
-            logging.warning("producer_load %s", op)
-        elif isinstance(op, tir.ProducerStore):
-            logging.warning("producer_store %s", op)
-        elif isinstance(op, tir.AttrStmt):
-            if op.attr_key == "thread_extent":
-                assert isinstance(op.node, tir.expr.IterVar)
-                extent = op.value
-                iter_var = op.node.thread_tag
-
-                iteration_domain.append(DomainElement(extent, iter_var))
-                print("iteration_domain", iteration_domain)
+    def _scope(self, buffer_var) -> str:
+        try:
+            return str(buffer_var.type_annotation.storage_scope)
+        except AttributeError:
+            return "global"
 
-        else:
-            if hasattr(op, "body"):
-                self.extract_memory_references(op.body, iteration_domain)
+    def _buffer_info(self, buffer_var, buffer=None) -> BufferInfo:
+        if buffer_var not in self.buffers:
+            # Buffer not declared by params or allocations e.g. buffers of
+            # builtin calls, we only record its traffic
+            name = buffer.name if buffer is not None else str(buffer_var)
+            dtype = buffer.dtype if buffer is not None else "unknown"
+            self.buffers[buffer_var] = BufferInfo(
+                name, str(dtype), self._scope(buffer_var), 0
+            )
+        return self.buffers[buffer_var]
 
-    def __call__(self, f, mod, ctx):
-        self.global_symbol = f.attrs["global_symbol"]
+    def _visit_stmt(self, stmt, multiplier) -> int:
+        """Visit a statement and return the peak allocated workspace inside it"""
+        if isinstance(stmt, tir.For):
+            extent = const_extent(stmt.extent)
+            if extent is None:
+                logger.warning(
+                    "Loop %s has non constant extent %s, counting a single iteration",
+                    str(stmt.loop_var),
+                    str(stmt.extent),
+                )
+                extent = 1
+            return self._visit_stmt(stmt.body, multiplier * extent)
+        elif isinstance(stmt, tir.AttrStmt):
+            if stmt.attr_key in ("thread_extent", "virtual_thread"):
+                extent = const_extent(stmt.value)
+                multiplier *= extent if extent is not None else 1
+            return self._visit_stmt(stmt.body, multiplier)
+        elif isinstance(stmt, tir.Allocate):
+            size = self._buffer_size(stmt)
+            self.buffers[stmt.buffer_var] = BufferInfo(
+                stmt.buffer_var.name,
+                str(stmt.dtype),
+                self._scope(stmt.buffer_var),
+                size,
+            )
+            return size + self._visit_stmt(stmt.body, multiplier)
+        elif isinstance(stmt, tir.SeqStmt):
+            peak = 0
+            for child in stmt.seq:
+                peak = max(peak, self._visit_stmt(child, multiplier))
+            return peak
+        elif isinstance(stmt, tir.BufferStore):
+            info = self._buffer_info(stmt.buffer.data, stmt.buffer)
+            info.bytes_stored += multiplier * self._dtype_size(stmt.value.dtype)
+            self._visit_expr(stmt.value, multiplier)
+            for index in stmt.indices:
+                self._visit_expr(index, multiplier)
+            return 0
+        elif isinstance(stmt, tir.IfThenElse):
+            self._visit_expr(stmt.condition, multiplier)
+            peak = self._visit_stmt(stmt.then_case, multiplier)
+            if stmt.else_case is not None:
+                peak = max(peak, self._visit_stmt(stmt.else_case, multiplier))
+            return peak
+        elif isinstance(stmt, tir.LetStmt):
+            self._visit_expr(stmt.value, multiplier)
+            return self._visit_stmt(stmt.body, multiplier)
+        elif isinstance(stmt, tir.Evaluate):
+            self._visit_expr(stmt.value, multiplier)
+            return 0
+        elif hasattr(stmt, "body"):
+            # DeclBuffer, AssertStmt, ...
+            return self._visit_stmt(stmt.body, multiplier)
+
+        return 0
+
+    def _visit_expr(self, expr, multiplier):
+        def visit(op):
+            if isinstance(op, tir.BufferLoad):
+                info = self._buffer_info(op.buffer.data, op.buffer)
+                info.bytes_loaded += multiplier * self._dtype_size(op.dtype)
+
+        tir.stmt_functor.post_order_visit(expr, visit)
+
+    def analyze(self, f) -> MemoryAnalysisResult:
+        self.buffers = {}
         for param in f.params:
+            if param not in f.buffer_map:
+                continue
             buffer = f.buffer_map[param]
-            self.buffers[buffer] = buffer
+            self.buffers[buffer.data] = BufferInfo(
+                buffer.name,
+                str(buffer.dtype),
+                self._scope(buffer.data),
+                self._buffer_size(buffer),
+                is_param=True,
+            )
 
-        tir.stmt_functor.post_order_visit(f.body, self.extract_buffers)
+        if f.attrs is not None and "global_symbol" in f.attrs:
+            name = str(f.attrs["global_symbol"])
+        else:
+            name = f"primfunc_{len(self.results)}"
 
-        self.extract_memory_references(f.body)
+        peak_workspace = self._visit_stmt(f.body, 1)
 
-        for var, buffer in self.buffers.items():
-            print(var, self._buffer_size(buffer))
+        result = MemoryAnalysisResult(name, peak_workspace_bytes=peak_workspace)
+        for info in self.buffers.values():
+            name = info.name
+            num = 1
+            while name in result.buffers:
+                name = f"{info.name}_{num}"
+                num += 1
+            result.buffers[name] = info
 
+        return result
 
-@tvm.tir.transform.prim_func_pass(opt_level=0)
-def memory_analysis(f, mod, ctx):
-    print("===================================================")
-    print("Analyzing:", f)
-    print("")
+    def __call__(self, f, mod, ctx):
+        result = self.analyze(f)
+        self.results[result.name] = result
 
-    analysis = MemoryAnalysis()
-    analysis(f, mod, ctx)
+        return f
+
+
+def analyze_memory(
+    primfuncs: Dict[str, tir.PrimFunc],
+) -> Dict[str, MemoryAnalysisResult]:
+    """Run the memory analysis for a dictionary of named primfuncs"""
+    results = {}
+    for name, f in primfuncs.items():
+        result = MemoryAnalysis().analyze(f)
+        result.name = name
+        results[name] = result
 
-    print("===================================================")
-    print("")
+    return results
 
-    return f
+
+def memory_analysis(analysis: Optional[MemoryAnalysis] = None):
+    """Create a prim_func_pass recording its results in `analysis`"""
+    if analysis is None:
+        analysis = MemoryAnalysis()
+
+    return tvm.tir.transform.prim_func_pass(
+        analysis, opt_level=0, name="hannah_tvm.tir.memory_analysis"
+    )
+
+
+def format_results(results: Dict[str, MemoryAnalysisResult]) -> str:
+    import tabulate
+
+    rows = []
+    for name, result in results.items():
+        rows.append(
+            {
+                "function": name,
+                "io (B)": result.io_bytes,
+                "peak workspace (B)": result.peak_workspace_bytes,
+                "peak live (B)": result.peak_live_bytes,
+                "loaded (B)": result.bytes_loaded,
+                "stored (B)": result.bytes_stored,
+            }
+        )
+
+    return tabulate.tabulate(rows, headers="keys")
 
 
 def memory_main():
-    import sys
+    from ..config import Model
+    from ..load import load_model
+
+    parser = argparse.ArgumentParser(
+        description="Report buffer footprints, peak live memory and memory traffic per PrimFunc"
+    )
+    parser.add_argument("model", help="Model file or url")
+    parser.add_argument("--target", default="llvm")
+    parser.add_argument("--target-host", default=None)
+    args = parser.parse_args()
 
-    from .load import load_model
+    logging.basicConfig(level=logging.INFO)
 
-    model_file = sys.argv[1]
-    mod, params, input_shapes = load_model(model_file)
+    mod, params, inputs = load_model(Model(url=args.model))
 
-    target = tvm.target.Target("nvidia/jetson-tx2")
-    target_host = tvm.target.Target("llvm")
+    target = tvm.target.Target(args.target, host=args.target_host)
 
-    autotvm.measure.measure_methods.set_cuda_target_arch(target.attrs["arch"])
+    analysis = MemoryAnalysis()
     with tvm.transform.PassContext(
-        opt_level=3, config={"tir.add_lower_pass": [(4, memory_analysis)]}
+        opt_level=3, config={"tir.add_lower_pass": [(4, memory_analysis(analysis))]}
     ):
-        lib = relay.build(mod, target=target, target_host=target_host, params=params)
+        relay.build(mod, target=target, params=params)
+
+    print(format_results(analysis.results))
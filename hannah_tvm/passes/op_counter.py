@@ -16,23 +16,195 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 #
+import logging
+from dataclasses import asdict, dataclass
+from typing import Dict, Optional
+
 import tvm
 import tvm.tir as tir
 
+logger = logging.getLogger(__name__)
+
+
+_BINARY_OPS = (
+    tir.Add,
+    tir.Sub,
+    tir.Mul,
+    tir.Div,
+    tir.Mod,
+    tir.FloorDiv,
+    tir.FloorMod,
+    tir.Min,
+    tir.Max,
+    tir.EQ,
+    tir.NE,
+    tir.LT,
+    tir.LE,
+    tir.GT,
+    tir.GE,
+    tir.And,
+    tir.Or,
+)
+
+
+def dtype_bytes(dtype) -> int:
+    """Size in bytes of a (possibly vectorized) tir dtype, sub byte types are rounded up"""
+    dtype = tvm.DataType(str(dtype))
+    return (dtype.bits * dtype.lanes + 7) // 8
+
+
+def _is_float(dtype) -> bool:
+    return str(dtype).startswith(("float", "bfloat"))
+
+
+def _lanes(dtype) -> int:
+    return tvm.DataType(str(dtype)).lanes
+
+
+def const_extent(extent) -> Optional[int]:
+    """Return the value of a loop extent if it is a compile time constant"""
+    if isinstance(extent, tir.IntImm):
+        return int(extent.value)
+    extent = tvm.arith.Analyzer().simplify(extent)
+    if isinstance(extent, tir.IntImm):
+        return int(extent.value)
+    return None
+
+
+@dataclass
+class OpCounts:
+    """Operation and memory traffic counts of a PrimFunc"""
+
+    flops: int = 0
+    int_ops: int = 0
+    bytes_loaded: int = 0
+    bytes_stored: int = 0
+
+    @property
+    def ops(self) -> int:
+        return self.flops + self.int_ops
+
+    @property
+    def bytes(self) -> int:
+        return self.bytes_loaded + self.bytes_stored
+
+    def to_dict(self) -> Dict[str, int]:
+        return asdict(self)
+
 
 class OpCounter:
+    """Counts arithmetic operations and bytes moved by a PrimFunc
+
+    Counts are accumulated over the full loop iteration domain. Loops with
+    non constant extents are counted as a single iteration. Address
+    calculations in buffer indices are not counted as operations.
+    """
+
     def __init__(self):
-        self.counts = 0
+        self.counts: Dict[str, OpCounts] = {}
+
+    def __call__(self, f, mod, ctx):
+        if f.attrs is not None and "global_symbol" in f.attrs:
+            name = str(f.attrs["global_symbol"])
+        else:
+            name = f"primfunc_{len(self.counts)}"
+        self.counts[name] = self.count(f)
+        return f
+
+    def count(self, f) -> OpCounts:
+        counts = OpCounts()
+        self._visit_stmt(f.body, counts, 1)
+        return counts
 
-    def __call__(self, f):
-        return self.count(f)
+    def _visit_stmt(self, stmt, counts, multiplier):
+        if isinstance(stmt, tir.For):
+            extent = const_extent(stmt.extent)
+            if extent is None:
+                logger.warning(
+                    "Loop %s has non constant extent %s, counting a single iteration",
+                    str(stmt.loop_var),
+                    str(stmt.extent),
+                )
+                extent = 1
+            self._visit_stmt(stmt.body, counts, multiplier * extent)
+        elif isinstance(stmt, tir.AttrStmt):
+            if stmt.attr_key in ("thread_extent", "virtual_thread"):
+                extent = const_extent(stmt.value)
+                multiplier *= extent if extent is not None else 1
+            self._visit_stmt(stmt.body, counts, multiplier)
+        elif isinstance(stmt, tir.SeqStmt):
+            for child in stmt.seq:
+                self._visit_stmt(child, counts, multiplier)
+        elif isinstance(stmt, tir.BufferStore):
+            counts.bytes_stored += multiplier * dtype_bytes(stmt.value.dtype)
+            self._visit_expr(stmt.value, counts, multiplier)
+        elif isinstance(stmt, tir.IfThenElse):
+            # Upper bound: both branches are assumed to be executed
+            self._visit_expr(stmt.condition, counts, multiplier)
+            self._visit_stmt(stmt.then_case, counts, multiplier)
+            if stmt.else_case is not None:
+                self._visit_stmt(stmt.else_case, counts, multiplier)
+        elif isinstance(stmt, tir.LetStmt):
+            self._visit_expr(stmt.value, counts, multiplier)
+            self._visit_stmt(stmt.body, counts, multiplier)
+        elif isinstance(stmt, tir.Evaluate):
+            self._visit_expr(stmt.value, counts, multiplier)
+        elif isinstance(stmt, tir.BlockRealize):
+            self._visit_stmt(stmt.block, counts, multiplier)
+        elif isinstance(stmt, tir.Block):
+            if stmt.init is not None:
+                self._visit_stmt(stmt.init, counts, multiplier)
+            self._visit_stmt(stmt.body, counts, multiplier)
+        elif hasattr(stmt, "body"):
+            # Allocate, DeclBuffer, AssertStmt, ...
+            self._visit_stmt(stmt.body, counts, multiplier)
 
-    def count(self, f):
-        print(f.attrs)
+    def _visit_expr(self, expr, counts, multiplier):
+        if isinstance(expr, tir.BufferLoad):
+            counts.bytes_loaded += multiplier * dtype_bytes(expr.dtype)
+        elif isinstance(expr, _BINARY_OPS):
+            self._count_op(expr.a.dtype, counts, multiplier)
+            self._visit_expr(expr.a, counts, multiplier)
+            self._visit_expr(expr.b, counts, multiplier)
+        elif isinstance(expr, tir.Not):
+            self._count_op(expr.a.dtype, counts, multiplier)
+            self._visit_expr(expr.a, counts, multiplier)
+        elif isinstance(expr, tir.Select):
+            self._count_op(expr.dtype, counts, multiplier)
+            self._visit_expr(expr.condition, counts, multiplier)
+            self._visit_expr(expr.true_value, counts, multiplier)
+            self._visit_expr(expr.false_value, counts, multiplier)
+        elif isinstance(expr, tir.Call):
+            op_name = str(getattr(expr.op, "name", ""))
+            if not op_name.startswith(("tir.address_of", "tir.tvm_")):
+                self._count_op(expr.dtype, counts, multiplier)
+            for arg in expr.args:
+                self._visit_expr(arg, counts, multiplier)
+        elif isinstance(expr, tir.Cast):
+            self._visit_expr(expr.value, counts, multiplier)
+        elif isinstance(expr, tir.Broadcast):
+            self._visit_expr(expr.value, counts, multiplier)
+        elif isinstance(expr, tir.Let):
+            self._visit_expr(expr.value, counts, multiplier)
+            self._visit_expr(expr.body, counts, multiplier)
 
+    def _count_op(self, dtype, counts, multiplier):
+        if _is_float(dtype):
+            counts.flops += multiplier * _lanes(dtype)
+        else:
+            counts.int_ops += multiplier * _lanes(dtype)
 
-def op_counter():
+
+def count_ops(primfuncs: Dict[str, tir.PrimFunc]) -> Dict[str, OpCounts]:
+    """Count operations for a dictionary of named primfuncs"""
     counter = OpCounter()
+    return {name: counter.count(f) for name, f in primfuncs.items()}
+
+
+def op_counter(counter: Optional[OpCounter] = None):
+    """Create a prim_func_pass recording op counts in `counter`"""
+    if counter is None:
+        counter = OpCounter()
 
     return tvm.tir.transform.prim_func_pass(
         counter, opt_level=0, name="hannah_tvm.tir.op_counter"
@@ -16,6 +16,8 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 #
+import collections
+import contextlib
 import enum
 import json
 import logging
@@ -25,23 +27,17 @@ import time
 import traceback
 from dataclasses import dataclass
 from pathlib import Path
-from re import M
-from typing import Any, Dict, Optional, Sequence
+from typing import Any, Dict, List, Optional, Sequence
 
 import numpy as np
 import tvm
 import tvm.auto_scheduler as auto_scheduler
 import tvm.autotvm as autotvm
-import tvm.contrib.debugger.debug_runtime
-import tvm.meta_schedule as ms
 import tvm.relay as relay
 import tvm.rpc
 import tvm.rpc.tracker
-from matplotlib.style import available
 from omegaconf import OmegaConf
 from tvm.auto_scheduler.measure_record import dump_record_to_string
-from tvm.micro import export_model_library_format
-from tvm.relay.op.contrib.tensorrt import get_tensorrt_target, partition_for_tensorrt
 
 from hannah_tvm.dataset import PerformanceDataset
 from hannah_tvm.tuner.autotvm.callbacks import (
@@ -50,8 +46,11 @@ from hannah_tvm.tuner.autotvm.callbacks import (
 
 from . import config as _config  # noqa
 from . import load, pass_instrument
-from .micro.aot import generate_ref_data
+from .connectors.power import PowerSampler, summarize_power
+from .inputs import measurement_samples
 from .pass_instrument import PrintIR
+from .passes.memory_analysis import analyze_memory
+from .passes.op_counter import count_ops
 
 logger = logging.getLogger(__name__)
 
@@ -74,6 +73,34 @@ class ModelConfig:
     mod: tvm.IRModule
     params: Dict[str, np.ndarray]
     inputs: Dict[str, np.ndarray]
+    bind_params: bool = True
+
+
+def thread_sweep_points(thread_sweep) -> List[Dict[str, Any]]:
+    "Threadpool configurations of a thread sweep config"
+    points = []
+    for affinity_mode in thread_sweep.affinity_modes:
+        if affinity_mode in (-2, -3):
+            # Modes using explicit core affinity masks
+            for cpus in thread_sweep.cpu_sets:
+                for num_threads in thread_sweep.num_threads:
+                    points.append(
+                        {
+                            "affinity_mode": affinity_mode,
+                            "num_threads": num_threads,
+                            "cpus": list(cpus),
+                        }
+                    )
+        else:
+            for num_threads in thread_sweep.num_threads:
+                points.append(
+                    {
+                        "affinity_mode": affinity_mode,
+                        "num_threads": num_threads,
+                        "cpus": None,
+                    }
+                )
+    return points
 
 
 class TuningTask:
@@ -87,6 +114,8 @@ class TuningTask:
         task_connector,
         tuner=None,
         verbose=False,
+        reuse_tuning_log=False,
+        base_model=None,
     ):
         self._task_connector = task_connector
         self.model_key = model_key
@@ -98,10 +127,13 @@ class TuningTask:
             "" if self.tuner_config.name == "meta_scheduler" else ".json"
         )
         self.verbose = verbose
+        self.reuse_tuning_log = reuse_tuning_log
         self.results = {}
 
         self.results["board"] = board_config.name
         self.results["model"] = model_key
+        # Name of the swept model config this task is a sweep point of
+        self.results["base_model"] = base_model if base_model is not None else model_key
         self.results["error"] = None
 
         self.name = f"tuning-task-{board_config.name}-{model_key}"
@@ -110,10 +142,19 @@ class TuningTask:
 
         self.status = TaskStatus.CREATED
 
+        self.lib = None
+        self.remote_handle = None
+
+        # Parameters passed as runtime inputs to the built module, see update_params
+        self.params_bound = True
+        self.params: Dict[str, np.ndarray] = {}
+
     def run(self) -> None:
         try:
             self._task_connector.setup()
 
+            uma_backends = self._uma_backends()
+
             target = self._task_connector.target()
             self.dataset = PerformanceDataset(self.board_config.name, target.kind)
 
@@ -124,8 +165,26 @@ class TuningTask:
                     self.model_config.params,
                     self.model_config.inputs,
                 )
+                if not self.model_config.bind_params:
+                    if self.board_config.get("micro", None):
+                        logger.warning(
+                            "Unbound parameters are not supported for micro targets, binding them at build time"
+                        )
+                    else:
+                        # Build without linking the parameters, they are set on each executor instead
+                        self.params_bound = False
+                        self.params = dict(params)
+                        inputs = {**inputs, **self._param_inputs()}
+                        params = {}
             else:
                 relay_mod, params, inputs = load.load_model(self.model_config)
+            if self.board_config.get("micro", None):
+                # Each measurement generates, builds and flashes a project on micro boards
+                input_samples = measurement_samples(
+                    self.model_config, inputs, default_num_samples=1
+                )
+            else:
+                input_samples = measurement_samples(self.model_config, inputs)
 
             if self.board_config.get("desired_layouts", []):
                 desired_layouts = self.board_config.desired_layouts
@@ -143,13 +202,27 @@ class TuningTask:
                     with self._task_connector.target():
                         relay_mod = seq(relay_mod)
 
+            for uma_backend in uma_backends:
+                relay_mod = uma_backend.partition(relay_mod, params)
+
             self.dataset.add_program(self.model_key, relay_mod, params)
 
+            if self.board_config.get("micro", None):
+                self._check_memory(relay_mod, params)
+
             logger.info("Starting tuning with config:")
             for k, v in self.tuner_config.items():
                 logger.info("  %s, %s", str(k), str(v))
 
-            if self.tuner_config.name == "auto_scheduler":
+            if (
+                self.reuse_tuning_log
+                and self.tuner_config.name
+                in ["auto_scheduler", "autotvm", "meta_scheduler"]
+                and os.path.exists(self.tuner_log_file)
+            ):
+                logger.info("Reusing tuning log %s", self.tuner_log_file)
+                self.results["tuning_duration"] = 0.0
+            elif self.tuner_config.name == "auto_scheduler":
                 start_time = time.time()
                 self._run_autoscheduler(relay_mod, params)
                 final_time = time.time()
@@ -166,6 +239,11 @@ class TuningTask:
             elif self.tuner_config.name == "baseline":
                 self.results["tuning_duration"] = 0.0
             elif self.tuner_config.name == "tensorrt":
+                from tvm.relay.op.contrib.tensorrt import (
+                    get_tensorrt_target,
+                    partition_for_tensorrt,
+                )
+
                 logger.info(f"Current TensorRT target: {get_tensorrt_target()}")
                 relay_mod = partition_for_tensorrt(relay_mod, params, target)
             else:
@@ -173,7 +251,9 @@ class TuningTask:
 
             lib = self._build(relay_mod, params)
             remote_handle = self._task_connector.upload(lib)
-            self._evaluate(inputs, remote_handle)
+            self.lib = lib
+            self.remote_handle = remote_handle
+            self._evaluate(input_samples, remote_handle)
             self.status = TaskStatus.FINISHED
 
         except Exception as e:
@@ -185,14 +265,33 @@ class TuningTask:
             logger.critical(str(e))
             logger.critical("Traceback:")
             tb_str = traceback.format_tb(e.__traceback__)
-            
-            logger.critical("\n".join(tb_str))    
+
+            logger.critical("\n".join(tb_str))
 
             self.status = TaskStatus.FAILED
             self.results["error"] = e
         finally:
             self._task_connector.teardown()
 
+    def _check_memory(self, relay_mod, params):
+        """Estimate memory requirements and reject models that do not fit on the board"""
+        from .micro.memory import check_memory, estimate_memory
+
+        estimate = estimate_memory(relay_mod, params)
+        logger.info(
+            "Estimated memory for %s on %s: workspace %d B, constants %d B, io %d B",
+            self.model_key,
+            self.board_config.name,
+            estimate.workspace_bytes,
+            estimate.constant_bytes,
+            estimate.io_bytes,
+        )
+
+        self.results["memory_estimate"] = estimate.to_dict()
+        self.dataset.add_memory_estimate(self.model_key, estimate.to_dict())
+
+        check_memory(estimate, self.board_config.micro)
+
     def _run_autotvm(self, relay_mod, params):
         logger.info("Running ")
 
@@ -220,6 +319,25 @@ class TuningTask:
 
         for num, tsk in enumerate(tasks):
             prefix = f"Task {tsk.name} ({num+1}/{len(tasks)})"
+            tsk_trial = min(self.tuner_config.task_budget, len(tsk.config_space))
+
+            # Tasks already tuned for other models, e.g. other sweep points, are skipped
+            task_results = [
+                (inp, res)
+                for inp, res in pretrained_results
+                if inp.task.workload == tsk.workload and res.error_no == 0
+            ]
+            if len(task_results) >= tsk_trial:
+                logger.info(
+                    "%s: skipping, %d preloaded measurements",
+                    prefix,
+                    len(task_results),
+                )
+                best = min(task_results, key=lambda result: np.mean(result[1].costs))
+                with open(self.tuner_log_file, "a") as log_file:
+                    log_file.write(autotvm.record.encode(*best) + "\n")
+                continue
+
             if self.tuner_config.mode == "xgb":
                 tuner_obj = autotvm.tuner.XGBTuner(tsk, loss_type="reg")
             elif self.tuner_config.mode == "xgb_rank":
@@ -237,8 +355,6 @@ class TuningTask:
             if os.path.exists(tmp_log_file):
                 os.remove(tmp_log_file)
 
-            tsk_trial = min(self.tuner_config.task_budget, len(tsk.config_space))
-
             logger.info("Starting tuning of task: %d", num)
             tuner_obj.tune(
                 n_trial=tsk_trial,
@@ -258,7 +374,9 @@ class TuningTask:
 
             self.dataset.add_tuning_results("autotvm", records)
 
-            autotvm.record.pick_best(str(tmp_log_file), str(self.tuner_log_file))
+            # pick_best truncates output files given by name
+            with open(self.tuner_log_file, "a") as log_file:
+                autotvm.record.pick_best(str(tmp_log_file), log_file)
             os.remove(tmp_log_file)
 
     def _run_autoscheduler(self, relay_mod, params):
@@ -287,6 +405,25 @@ class TuningTask:
 
         logger.info("Preloaded %d measurements", preloaded_measurements)
 
+        # Workloads shared with already tuned models, e.g. other points of a
+        # shape sweep, are only tuned until they have used up their budget
+        preloaded_counts = collections.Counter(
+            inp.task.workload_key for inp, _ in available_measurements
+        )
+        remaining = [
+            (task, weight)
+            for task, weight in zip(tasks, task_weights)
+            if preloaded_counts[task.workload_key] < self.tuner_config.task_budget
+        ]
+        if len(remaining) < len(tasks):
+            logger.info(
+                "Skipping %d tasks with sufficient preloaded measurements",
+                len(tasks) - len(remaining),
+            )
+        if not remaining:
+            return
+        tasks, task_weights = (list(values) for values in zip(*remaining))
+
         runner = self._task_connector.runner("auto_scheduler")
         builder = self._task_connector.builder("auto_scheduler")
 
@@ -342,6 +479,8 @@ class TuningTask:
             self.dataset.add_tuning_results("auto_scheduler", records)
 
     def _run_meta_scheduler(self, relay_mod, params):
+        import tvm.meta_schedule as ms
+
         logger.info("Running meta scheduler")
 
         runner = self._task_connector.runner("meta_scheduler")
@@ -353,10 +492,10 @@ class TuningTask:
         database = ms.database.JSONDatabase(work_dir=self.tuner_log_file)
 
         # This profile is used to profile the TuningEfficiency not the actual performance on the target board
-        profiler = ms.Profiler()    
+        profiler = ms.Profiler()
 
         with profiler:
-           database = ms.relay_integration.tune_relay(
+            database = ms.relay_integration.tune_relay(
                 relay_mod,
                 params,
                 self._task_connector.target(),
@@ -366,14 +505,11 @@ class TuningTask:
                 builder=builder,
                 database=database,
                 max_trials_per_task=self.tuner_config.get("task_budget", 4),
-                cost_model=self.tuner_config.get('mode', 'xgb'), 
+                cost_model=self.tuner_config.get("mode", "xgb"),
             )
-           
+
         print(profiler.table())
-        
-        
 
-        
     def _build(self, relay_mod, params):
         logger.info("Compile...")
 
@@ -384,9 +520,12 @@ class TuningTask:
         target = self._task_connector.target()
 
         build_cfg = {}
-        if self.board_config.get('build', {}):
+        if self.board_config.get("build", {}):
             build_cfg.update(self.board_config.build)
-        elif str(target.kind) == "c" or self.board_config.get('disable_vectorize', True) is True:
+        elif (
+            str(target.kind) == "c"
+            or self.board_config.get("disable_vectorize", True) is True
+        ):
             build_cfg = {
                 "tir.disable_vectorize": True,
                 "tir.usmp.enable": True,
@@ -394,7 +533,7 @@ class TuningTask:
 
         executor = tvm.relay.backend.Executor("graph")
         runtime = tvm.relay.backend.Runtime("cpp")
-        if self.board_config.get('micro', None):
+        if self.board_config.get("micro", None):
             serialize = tvm.tir.transform.ConvertForLoopsToSerial()
             build_cfg["tir.add_lower_pass"] = [(1, serialize)]
             if self.board_config.micro.aot:
@@ -415,7 +554,7 @@ class TuningTask:
                         "unpacked-api": aot_config.get("use_unpacked_api", True),
                     },
                 )
-        
+
         if self.tuner_config.name == "auto_scheduler":
             with auto_scheduler.ApplyHistoryBest(self.tuner_log_file):
                 build_cfg["relay.backend.use_auto_scheduler"] = True
@@ -460,6 +599,8 @@ class TuningTask:
                     )
 
         elif self.tuner_config.name == "meta_scheduler":
+            import tvm.meta_schedule as ms
+
             database = ms.database.JSONDatabase(work_dir=self.tuner_log_file)
             lib = ms.relay_integration.compile_relay(
                 database=database,
@@ -470,7 +611,6 @@ class TuningTask:
                 pass_config=build_cfg,
             )
 
-        
         elif self.tuner_config.name == "tensorrt":
             logger.info(f"Current target: {self._task_connector.target()}")
             logger.info(f"Current build_cfg: {build_cfg}")
@@ -518,18 +658,35 @@ class TuningTask:
             )
 
         primfuncs = []
+        named_primfuncs = {}
         for name, function_metadata in lib.function_metadata.items():
             if name == MAIN_FUNC_NAME_STR:
                 continue
             tir_primfuncs = list(function_metadata.tir_primfuncs.values())
 
             primfuncs.extend(tir_primfuncs)
+            for num, primfunc in enumerate(tir_primfuncs):
+                named_primfuncs[name if num == 0 else f"{name}_{num}"] = primfunc
 
         if self.dataset is not None:
             self.dataset.add_measurement_primfuncs(
                 self.tuner_config.name, self.model_key, primfuncs
             )
 
+            op_counts = count_ops(named_primfuncs)
+            self.dataset.add_measurement_op_counts(
+                self.tuner_config.name,
+                self.model_key,
+                {name: counts.to_dict() for name, counts in op_counts.items()},
+            )
+
+            memory = analyze_memory(named_primfuncs)
+            self.dataset.add_measurement_memory(
+                self.tuner_config.name,
+                self.model_key,
+                {name: result.to_dict() for name, result in memory.items()},
+            )
+
         return lib
 
     def export(self, file_name: str = "model.tar"):
@@ -539,19 +696,41 @@ class TuningTask:
 
         lib = self._build(self.model_config.mod, self.model_config.params)
         if self.board_config.micro:
+            from tvm.micro import export_model_library_format
+
             export_model_library_format(lib, file_name)
         else:
             lib.export_library(file_name)
 
         self._task_connector.teardown()
 
-    def _evaluate(self, inputs, remote_handle):
+    def _evaluate(self, input_samples, remote_handle):
         # Create graph executor
         logger.info("Start evaluation")
 
-        prof_res = self._task_connector.measure(
-            remote_handle, inputs, self.reference_outputs
-        )
+        power_sensor = self._task_connector.power_sensor(remote_handle)
+        power_traces = []
+
+        sample_results = []
+        try:
+            for inputs in input_samples:
+                with contextlib.ExitStack() as stack:
+                    if power_sensor is not None:
+                        sampler = stack.enter_context(
+                            PowerSampler(
+                                power_sensor, self.board_config.power.interval_s
+                            )
+                        )
+                        power_traces.append(sampler.trace)
+                    sample_results.append(
+                        self._task_connector.measure(
+                            remote_handle, inputs, self.reference_outputs
+                        )
+                    )
+        finally:
+            if power_sensor is not None:
+                power_sensor.close()
+        prof_res = np.concatenate(sample_results)
 
         logger.info(
             "Mean inference time (std dev): %.2f us (%.2f us)"
@@ -561,10 +740,50 @@ class TuningTask:
         self.results["latency"] = float(np.mean(prof_res))
         self.results["latency_stdev"] = float(np.std(prof_res))
 
-        debug_profile = self._task_connector.profile(remote_handle, inputs)
+        # The leading dimension of the first input is taken as batch size
+        input_shapes = {
+            name: list(value.shape)
+            for name, value in input_samples[0].items()
+            if name not in self.params
+        }
+        first_shape = next(iter(input_shapes.values()), [])
+        batch_size = first_shape[0] if first_shape else 1
+        self.results["batch_size"] = batch_size
+        # Throughput is only meaningful for durations in wall clock time
+        throughput = None
+        if self._task_connector.measures_wall_clock and np.mean(prof_res) > 0:
+            throughput = batch_size * 1e6 / float(np.mean(prof_res))
+            self.results["throughput"] = throughput
+
+        if len(sample_results) > 1:
+            self.results["latency_per_input"] = [
+                float(np.mean(res)) for res in sample_results
+            ]
+
+        rail_power, energy = summarize_power(power_traces, sample_results)
+        if energy is not None:
+            logger.info(
+                "Mean power: %.3f W, energy per inference: %.2f uJ",
+                sum(rail_power.values()),
+                energy,
+            )
+            self.results["power"] = sum(rail_power.values())
+            self.results["energy"] = energy
+
+        debug_profile = self._task_connector.profile(remote_handle, input_samples[0])
 
         result = {}
         result["Duration (us)"] = prof_res.tolist()
+        result["Base Model"] = self.results["base_model"]
+        result["Input Shapes"] = input_shapes
+        result["Batch Size"] = batch_size
+        if throughput is not None:
+            result["Throughput (1/s)"] = throughput
+        if len(sample_results) > 1:
+            result["Input Duration (us)"] = [res.tolist() for res in sample_results]
+        if energy is not None:
+            result["Power (W)"] = rail_power
+            result["Energy (uJ)"] = energy
         if debug_profile is not None:
             logger.info("Profile information: %s", str(debug_profile))
             json_profile = debug_profile.json()
@@ -572,10 +791,160 @@ class TuningTask:
             result.update(dict_profile)
         self.dataset.add_measurement(self.tuner_config.name, self.model_key, result)
 
+        throughput_config = self.board_config.get("throughput", None)
+        if throughput_config is not None:
+            self._evaluate_throughput(
+                input_samples[0], remote_handle, throughput_config
+            )
+
+        thread_sweep = self.board_config.get("thread_sweep", None)
+        if thread_sweep is not None:
+            self._evaluate_thread_sweep(input_samples[0], remote_handle, thread_sweep)
+
+    def _evaluate_thread_sweep(self, inputs, remote_handle, thread_sweep):
+        logger.info("Measuring threadpool configurations")
+
+        # The measurement with the default configuration is the baseline
+        points = [
+            {
+                "affinity_mode": 0,
+                "num_threads": 0,
+                "cpus": None,
+                "latency": self.results["latency"],
+            }
+        ]
+        try:
+            for point in thread_sweep_points(thread_sweep):
+                try:
+                    self._task_connector.configure_threadpool(
+                        remote_handle,
+                        point["affinity_mode"],
+                        point["num_threads"],
+                        point["cpus"],
+                    )
+                    prof_res = self._task_connector.measure(
+                        remote_handle, inputs, self.reference_outputs
+                    )
+                except NotImplementedError:
+                    raise
+                except Exception as e:
+                    logger.warning(
+                        "Measurement with threadpool configuration %s failed: %s",
+                        point,
+                        str(e),
+                    )
+                    continue
+
+                logger.info(
+                    "Threadpool configuration %s: %.2f us", point, np.mean(prof_res)
+                )
+                points.append(
+                    {
+                        **point,
+                        "latency": float(np.mean(prof_res)),
+                        "Duration (us)": prof_res.tolist(),
+                    }
+                )
+        except NotImplementedError as e:
+            logger.warning(str(e))
+            return
+        finally:
+            with contextlib.suppress(NotImplementedError):
+                self._task_connector.configure_threadpool(remote_handle, 0, 0)
+
+        best = min(points, key=lambda point: point["latency"])
+        best = {
+            key: best[key]
+            for key in ("affinity_mode", "num_threads", "cpus", "latency")
+        }
+        logger.info("Best threadpool configuration: %s", best)
+
+        self.results["best_thread_config"] = best
+        self.dataset.add_thread_sweep(
+            self.tuner_config.name,
+            self.model_key,
+            {
+                "points": points,
+                "best": best,
+                "default_latency": self.results["latency"],
+            },
+        )
+
+    def _evaluate_throughput(self, inputs, remote_handle, throughput_config):
+        logger.info(
+            "Measuring throughput with %d concurrent streams", throughput_config.streams
+        )
+        try:
+            throughput = self._task_connector.measure_throughput(
+                remote_handle, inputs, throughput_config
+            )
+        except NotImplementedError as e:
+            logger.warning(str(e))
+            return
+
+        summary = throughput.summary()
+        logger.info(
+            "Throughput: %.2f inferences/s, p50/p95/p99 latency: %s us, cpu utilization: %s%%",
+            summary["inferences_per_second"],
+            "/".join(
+                f"{summary.get(f'latency_p{q}', float('nan')):.2f}"
+                for q in (50, 95, 99)
+            ),
+            summary["cpu_utilization"],
+        )
+
+        self.results["stream_throughput"] = summary
+        self.dataset.add_throughput_measurement(
+            self.tuner_config.name, self.model_key, throughput.to_dict()
+        )
+
     def __str__(self):
         s = f"TuningTask(board={self.board_config.name} model={self.model_key})"
         return s
 
     def device(self):
         # Return the task connector for the target device
-        return self._task_connector.device()    
+        return self._task_connector.device()
+
+    def executor(self):
+        """Return a new graph executor module and its device for the built model"""
+        if self.remote_handle is None:
+            raise Exception(f"{self} has not been built successfully")
+        module, dev = self._task_connector.executor(self.remote_handle)
+        self.set_params(module)
+        return module, dev
+
+    def set_params(self, module) -> None:
+        """Set the unbound parameters on a graph executor module"""
+        for name, value in self._param_inputs().items():
+            module.set_input(name, value)
+
+    def _uma_backends(self):
+        "Register the uma backends requested by the board config"
+        names = self.board_config.get("uma_backends", None)
+        if not names:
+            return []
+
+        from . import uma_backends
+
+        return [uma_backends.register(name) for name in names]
+
+    def update_params(self, params: Dict[str, np.ndarray]) -> None:
+        """Replace the parameters of a model that has been built with unbound parameters
+
+        Executors created by executor() afterwards use the new parameters,
+        existing executors need to be updated using set_input.
+        """
+        if self.params_bound:
+            raise Exception(f"{self} has been built with bound parameters")
+        missing = set(self.params.keys()) - set(params.keys())
+        if missing:
+            raise Exception(f"Missing parameters: {', '.join(sorted(missing))}")
+        self.params = {name: params[name] for name in self.params.keys()}
+
+    def _param_inputs(self) -> Dict[str, np.ndarray]:
+        # numpy arrays are cast to the dtype of the executor input by set_input
+        return {
+            name: value.numpy() if isinstance(value, tvm.nd.NDArray) else value
+            for name, value in self.params.items()
+        }
@@ -20,16 +20,18 @@ import copy
 import logging
 import math
 from dataclasses import dataclass
-from typing import Dict, List, Optional, Tuple
+from typing import Any, Callable, Dict, List, Optional, Tuple
 
+import numpy as np
 import torch.fx
 import tvm
 import tvm.relay as relay
 from hannah.models.factory import pooling, qat, qconfig
-from matplotlib import use
 from torch.ao.nn import quantized as nnq
 from torch.ao.nn.intrinsic import quantized as nni
 
+from .passes.legalize import LegalizeQuantizedTypes
+
 logger = logging.getLogger("__name__")
 
 
@@ -79,123 +81,135 @@ def get_integer_range(dtype) -> Optional[Tuple[int, int]]:
         return None
 
 
-@tvm.relay.transform.function_pass(opt_level=0)
-class LegalizeQuantizedTypes(tvm.relay.expr_functor.ExprMutator):
-    def __init__(self):
-        super().__init__()
-
-        self.dtype_map = {}
-        for i in range(1, 9):
-            self.dtype_map[f"int{i}"] = "int8"
-        for i in range(9, 17):
-            self.dtype_map[f"int{i}"] = "int16"
-        for i in range(17, 33):
-            self.dtype_map[f"int{i}"] = "int32"
-        for i in range(33, 65):
-            self.dtype_map[f"int{i}"] = "int64"
-
-        for i in range(1, 9):
-            self.dtype_map[f"uint{i}"] = "uint8"
-        for i in range(9, 17):
-            self.dtype_map[f"uint{i}"] = "uint16"
-        for i in range(17, 33):
-            self.dtype_map[f"uint{i}"] = "uint32"
-        for i in range(33, 65):
-            self.dtype_map[f"uint{i}"] = "uint64"
-
-    def transform_function(self, func, mod, ctx):
-        return self.visit(func)
-
-    def visit_constant(self, const):
-        if const.data.dtype in self.dtype_map:
-            if const.data.dtype != self.dtype_map[const.data.dtype]:
-                return const.astype(self.dtype_map[const.data.dtype])
-        return const
-
-    def visit_function(self, fn):
-        new_params = []
-        binds = {}
-        for param in fn.params:
-            # Get the parameter's type annotation.
-            var_type = param.type_annotation
-            if isinstance(var_type, tvm.ir.TensorType):
-                dtype = var_type.dtype
-
-            # See if we want to replace dtype.
-            if dtype in self.dtype_map:
-                dtype = self.dtype_map[dtype]
-            else:
-                dtype = var_type.dtype
+def storage_dtype(bits: int) -> str:
+    """Smallest numpy integer type holding a signed integer of the given bit width"""
+    for storage_bits in [8, 16, 32, 64]:
+        if bits <= storage_bits:
+            return f"int{storage_bits}"
+    raise Exception(f"Unsupported integer width: {bits}")
+
+
+def pack_subbyte(values: np.ndarray, bits: int) -> np.ndarray:
+    """Pack integers of less than 8 bits into a flat uint8 array
+
+    Each byte holds 8 // bits values, the first value in the lowest bits.
+    """
+    per_byte = 8 // bits
+    flat = values.reshape(-1).astype("int64") & ((1 << bits) - 1)
+    padded = np.zeros(-(-flat.size // per_byte) * per_byte, dtype="uint16")
+    padded[: flat.size] = flat
+    shifts = (np.arange(per_byte) * bits).astype("uint16")
+    packed = np.bitwise_or.reduce(padded.reshape(-1, per_byte) << shifts, axis=1)
+    return packed.astype("uint8")
+
+
+def unpack_subbyte(packed: np.ndarray, shape, bits: int) -> np.ndarray:
+    """Unpack signed integers packed by pack_subbyte"""
+    per_byte = 8 // bits
+    size = int(np.prod(shape))
+    shifts = (np.arange(per_byte) * bits).astype("int32")
+    values = (packed.astype("int32")[:, None] >> shifts) & ((1 << bits) - 1)
+    values = values.reshape(-1)[:size]
+    values = (values << (32 - bits)) >> (32 - bits)
+    return values.reshape(shape)
+
+
+def gen_unpack_subbyte(packed, shape, bits: int, dtype: str):
+    """Relay expression unpacking the signed integers packed by pack_subbyte
+
+    The unpacking is wrapped in a primitive function, this keeps constant folding
+    from replacing the packed constant with its unpacked value, so the unpacking
+    runs as a kernel on the device.
+    """
+    per_byte = 8 // bits
+    size = int(np.prod(shape))
+    packed_size = -(-size // per_byte)
+
+    data = relay.var("packed", shape=(packed_size,), dtype="uint8")
+    wide = relay.cast(data, "int32")
+    parts = [
+        relay.bitwise_and(
+            relay.right_shift(wide, relay.const(num * bits, "int32")),
+            relay.const((1 << bits) - 1, "int32"),
+        )
+        for num in range(per_byte)
+    ]
+    values = relay.reshape(relay.stack(parts, axis=1), (-1,))
+    if packed_size * per_byte != size:
+        values = relay.strided_slice(values, [0], [size])
+    shift = relay.const(32 - bits, "int32")
+    values = relay.right_shift(relay.left_shift(values, shift), shift)
+    values = relay.cast(relay.reshape(values, tuple(shape)), dtype)
 
-            # Generate new variable.
-            new_param = tvm.relay.expr.var(
-                param.name_hint, shape=var_type.shape, dtype=dtype
-            )
+    unpack = relay.Function([data], values).with_attr(
+        "Primitive", tvm.tir.IntImm("int32", 1)
+    )
+    return relay.Call(unpack, [packed])
 
-            new_params.append(new_param)
-            binds[param] = new_param
-
-        new_body = self.visit(fn.body)
-        # Rewrite the body to use new parameters.
-        new_body = tvm.relay.expr.bind(new_body, binds)
-
-        # Construct the updated function and return.
-        return tvm.relay.Function(
-            new_params,
-            new_body,
-            # You could change the return type, if you use None it will re-infer.
-            None,
-            type_params=fn.type_params,
-            attrs=fn.attrs,
-        )
 
-    def visit_call(self, call):
-        new_args = [self.visit(arg) for arg in call.args]
+def as_scale(scale) -> np.ndarray:
+    """Convert a per tensor or per channel quantization scale to a float32 array"""
+    if torch.is_tensor(scale):
+        scale = scale.detach().cpu().numpy()
+    return np.asarray(scale, dtype="float32")
 
-        new_attrs = call.attrs
-        new_fn = self.visit(call.op)
-        new_call = tvm.relay.Call(
-            new_fn, new_args, new_attrs, call.type_args, call.span
-        )
 
-        out_dtype = None
-        if call.op.name == "nn.conv1d":
-            out_dtype = call.attrs.out_dtype
-            new_attrs = dict(call.attrs)
-            new_attrs["out_dtype"] = self.dtype_map[out_dtype]
-            new_call = tvm.relay.nn.conv1d(*new_args, **new_attrs)
-        elif call.op.name == "nn.conv2d":
-            out_dtype = call.attrs.out_dtype
-            new_attrs = dict(call.attrs)
-            new_attrs["out_dtype"] = self.dtype_map[out_dtype]
-            new_call = tvm.relay.nn.conv2d(*new_args, **new_attrs)
-        elif call.op.name == "nn.conv3d":
-            out_dtype = call.attrs.out_dtype
-            new_attrs = dict(call.attrs)
-            new_attrs["out_dtype"] = self.dtype_map[out_dtype]
-            new_call = tvm.relay.nn.conv3d(*new_args, **new_attrs)
-        elif call.op.name == "nn.dense":
-            out_dtype = call.attrs.out_dtype
-            new_attrs = dict(call.attrs)
-            new_attrs["out_dtype"] = self.dtype_map[out_dtype]
-            new_call = tvm.relay.nn.dense(*new_args, **new_attrs)
-        elif call.op.name == "qnn.requantize":
-            out_dtype = call.attrs.out_dtype
-            new_attrs = dict(call.attrs)
-            new_attrs["out_dtype"] = self.dtype_map[out_dtype]
-            new_call = tvm.relay.qnn.op.requantize(*new_args, **new_attrs)
-        elif call.op.name == "cast":
-            out_dtype = call.attrs.dtype
-            new_attrs = dict(call.attrs)
-            new_attrs["dtype"] = self.dtype_map[out_dtype]
-            new_call = tvm.relay.cast(*new_args, **new_attrs)
-
-        if out_dtype is not None:
-            range = get_integer_range(out_dtype)
-            if range is not None:
-                new_call = tvm.relay.clip(new_call, range[0], range[1])
-
-        return new_call
+# Converters registered by users, see register_module_converter and register_function_converter
+MODULE_CONVERTERS: Dict[type, Callable] = {}
+FUNCTION_CONVERTERS: Dict[Any, Callable] = {}
+
+# Function names handled by RelayConverter._handle_function
+BUILTIN_FUNCTIONS = ["add", "sum", "truediv", "quantize_per_tensor"]
+
+
+def register_module_converter(module_type: type, converter: Optional[Callable] = None):
+    """Register a relay converter for modules of type module_type and its subclasses
+
+    Modules of this type are traced as leaf modules by the QuantizationTracer.
+    The converter is called as converter(relay_converter, node, module, result),
+    and must record its output using relay_converter.set_output. Registered
+    converters take precedence over the builtin handlers.
+
+    Can be used as a decorator:
+
+        @register_module_converter(MyLayer)
+        def convert_my_layer(converter, node, module, result):
+            data, info = converter.get_input(node)
+            converter.set_output(node, tvm.relay.nn.relu(data), info)
+    """
+
+    def register(converter):
+        MODULE_CONVERTERS[module_type] = converter
+        return converter
+
+    if converter is None:
+        return register
+    return register(converter)
+
+
+def register_function_converter(target: Any, converter: Optional[Callable] = None):
+    """Register a relay converter for call_function nodes
+
+    The target is either the called function itself or its name. The converter
+    is called as converter(relay_converter, node, result). Can be used as a
+    decorator like register_module_converter.
+    """
+
+    def register(converter):
+        FUNCTION_CONVERTERS[target] = converter
+        return converter
+
+    if converter is None:
+        return register
+    return register(converter)
+
+
+class ConversionError(Exception):
+    """Raised if a model contains nodes that RelayConverter can not convert"""
+
+    def __init__(self, nodes: List[str]):
+        self.nodes = nodes
+        super().__init__(f"Unsupported nodes: {', '.join(nodes)}")
 
 
 class QuantizationTracer(torch.fx.Tracer):
@@ -214,7 +228,7 @@ class QuantizationTracer(torch.fx.Tracer):
     ]
 
     def is_leaf_module(self, module, module_qualified_name):
-        for leaf_cls in self.LEAF_MODULES:
+        for leaf_cls in self.LEAF_MODULES + list(MODULE_CONVERTERS.keys()):
             if isinstance(module, leaf_cls):
                 return True
 
@@ -228,11 +242,28 @@ class RelayConverter(torch.fx.Interpreter):
         input_dtype="int8",
         input_scale=1 / (2**7),
         accumulator_dtype="int20",
+        shape_only=False,
+        pack_weights=False,
     ):
+        """Convert a traced quantized model to relay
+
+        Args:
+            graph_module: The traced model
+            input_dtype (str): Integer type of the model inputs
+            input_scale (float): Quantization scale of the model inputs
+            accumulator_dtype (str): Integer type used for accumulation
+            shape_only (bool): Take the shapes of intermediate results from FX node metadata
+                generated by fake tensor propagation instead of running the torch model
+            pack_weights (bool): Store weights of 4 bits or less packed into bytes, they are
+                unpacked by a kernel on the device
+        """
         super().__init__(graph_module)
         self.accumulator_dtype = accumulator_dtype
         self.input_dtype = input_dtype
         self.input_scale = input_scale
+        self.shape_only = shape_only
+        self.pack_weights = pack_weights
+        self._use_metadata = False
 
         if relay is None:
             raise Exception(
@@ -282,12 +313,25 @@ class RelayConverter(torch.fx.Interpreter):
     ):
         assert input_dtype.startswith("int")
         assert output_dtype.startswith("int")
-        if output_dtype == input_dtype and output_scale == input_scale:
+        input_scale = as_scale(input_scale)
+        output_scale = as_scale(output_scale)
+        if output_dtype == input_dtype and np.array_equal(output_scale, input_scale):
             return input
 
         input_bits = int(input_dtype[3:])
         output_bits = int(output_dtype[3:])
 
+        if np.array_equal(output_scale, input_scale):
+            # Only the integer type changes, saturate when narrowing
+            if output_bits < input_bits:
+                range = get_integer_range(output_dtype)
+                input = tvm.relay.clip(input, range[0], range[1])
+            return relay.cast(input, output_dtype)
+
+        # Fixed point rescaling only supports a single factor for all channels
+        if input_scale.size > 1 or output_scale.size > 1:
+            use_rescale = True
+
         output = input
         if use_rescale:
             output = tvm.relay.qnn.op.requantize(
@@ -301,7 +345,7 @@ class RelayConverter(torch.fx.Interpreter):
                 out_dtype=output_dtype,
             )
         else:
-            rescale = input_scale / output_scale
+            rescale = float(input_scale / output_scale)
             rescale_shift = int(math.log2(rescale))
             accumulator_dtype = (
                 input_dtype if input_bits > output_bits else output_dtype
@@ -337,6 +381,73 @@ class RelayConverter(torch.fx.Interpreter):
                 output = relay.cast(output, output_dtype)
         return output
 
+    def _gen_relu(self, data, dtype):
+        """Relu on quantized data
+
+        Relu commutes with requantize, so it is emitted after the requantize as a clip,
+        which is merged with the saturation of the requantize by LegalizeQuantizedTypes.
+        Accumulators are not saturated, so they keep a plain relu.
+        """
+        type, bits = parse_dtype(dtype)
+        if type == "uint":
+            return data
+        if type != "int" or dtype == self.accumulator_dtype:
+            return tvm.relay.nn.relu(data)
+        range = get_integer_range(dtype)
+        return tvm.relay.clip(data, 0, range[1])
+
+    def _gen_quantized_params(self, node, module, weight, bias):
+        """Quantize weight and bias of a qat module and register them as parameters
+
+        Returns:
+            the relay expressions of weight and bias, the weight scale, and the dtype and scale of the bias
+        """
+        with torch.no_grad():
+            quant_weight = module.weight_fake_quant.quantize(weight)
+            quant_bias = (
+                module.bias_fake_quant.quantize(bias) if bias is not None else None
+            )
+
+        weight_bits = module.weight_fake_quant.bits
+        weight_dtype = f"int{weight_bits}"
+        weight_scale = as_scale(module.weight_fake_quant.quantization_function.scale)
+        if weight_scale.size > 1:
+            # Per channel scales along the output channels
+            weight_scale = weight_scale.reshape(-1)
+
+        weight_name = legalize_var_name(f"{node.name}.weight")
+        weight_data = quant_weight.detach().cpu().numpy()
+        if self.pack_weights and 8 // weight_bits >= 2:
+            packed = pack_subbyte(weight_data, weight_bits)
+            weight_var = tvm.relay.var(weight_name, shape=packed.shape, dtype="uint8")
+            self.params[weight_name] = tvm.nd.array(packed)
+            weight_var = gen_unpack_subbyte(
+                weight_var, weight_data.shape, weight_bits, weight_dtype
+            )
+        else:
+            weight_var = tvm.relay.Var(
+                weight_name,
+                tvm.relay.TensorType(quant_weight.shape, dtype=weight_dtype),
+            )
+            self.params[weight_name] = tvm.nd.array(
+                weight_data.astype(storage_dtype(weight_bits))
+            )
+
+        bias_var, bias_dtype, bias_scale = None, None, None
+        if quant_bias is not None:
+            bias_bits = module.bias_fake_quant.bits
+            bias_dtype = f"int{bias_bits}"
+            bias_scale = as_scale(module.bias_fake_quant.quantization_function.scale)
+            bias_name = legalize_var_name(f"{node.name}.bias")
+            bias_var = tvm.relay.Var(
+                bias_name, tvm.relay.TensorType(quant_bias.shape, dtype=bias_dtype)
+            )
+            self.params[bias_name] = tvm.nd.array(
+                quant_bias.detach().cpu().numpy().astype(storage_dtype(bias_bits))
+            )
+
+        return weight_var, weight_scale, bias_var, bias_dtype, bias_scale
+
     def _handle_nni_conv(self, node, module, result):
         inputs = list(node.all_input_nodes)
         data = self.outputs[inputs[0].name]
@@ -399,44 +510,24 @@ class RelayConverter(torch.fx.Interpreter):
         inputs = list(node.all_input_nodes)
         data = self.outputs[inputs[0].name]
         input_info = self.tensor_info[inputs[0].name]
-        input_bits = input_info.bits
-        input_dtype = input_info.relay_dtype
         input_scale = input_info.scale
 
-        quant_weight = module.weight_fake_quant.quantize(weight)
-        quant_bias = module.bias_fake_quant.quantize(bias) if bias is not None else None
-        weight_dtype = f"int{module.weight_fake_quant.bits}"
-        weight_scale = module.weight_fake_quant.quantization_function.scale
-
-        weight_name = legalize_var_name(f"{node.name}.weight")
-        weight = tvm.relay.Var(
-            weight_name, tvm.relay.TensorType(quant_weight.shape, dtype=weight_dtype)
-        )
-        self.params[weight_name] = tvm.nd.array(
-            (quant_weight).detach().numpy().astype("byte")
-        )
-        if bias is not None:
-            bias_dtype = f"int{module.bias_fake_quant.bits}"
-            bias_scale = module.bias_fake_quant.quantization_function.scale
-            bias_name = legalize_var_name(f"{node.name}.bias")
-            bias = tvm.relay.Var(
-                bias_name, tvm.relay.TensorType(quant_bias.shape, dtype=bias_dtype)
-            )
-            self.params[bias_name] = tvm.nd.array(
-                (quant_bias).detach().numpy().astype("byte")
-            )
-
-        inputs = list(node.all_input_nodes)
-        data = self.outputs[inputs[0].name]
+        (
+            weight,
+            weight_scale,
+            bias,
+            bias_dtype,
+            bias_scale,
+        ) = self._gen_quantized_params(node, module, weight, bias)
 
         linear_out = tvm.relay.nn.dense(
             data, weight, out_dtype=self.accumulator_dtype
         )  # FIXME use proper out dtype
 
-        accumulator_scale = weight_scale * input_scale
+        accumulator_scale = weight_scale * as_scale(input_scale)
 
         if bias is not None:
-            if bias_scale >= accumulator_scale:
+            if accumulator_scale.size == 1 and np.all(bias_scale >= accumulator_scale):
                 bias = self._gen_requantize(
                     bias,
                     bias_scale,
@@ -446,7 +537,7 @@ class RelayConverter(torch.fx.Interpreter):
                     use_rescale=True,
                     axis=0,
                 )
-            elif bias_scale < accumulator_scale:
+            else:
                 linear_out = self._gen_requantize(
                     linear_out,
                     accumulator_scale,
@@ -454,16 +545,13 @@ class RelayConverter(torch.fx.Interpreter):
                     bias_scale,
                     self.accumulator_dtype,
                     use_rescale=True,
-                    axis=0,
+                    axis=-1,
                 )
                 bias = relay.cast(bias, self.accumulator_dtype)
                 accumulator_scale = bias_scale
 
             linear_out = tvm.relay.nn.bias_add(linear_out, bias)
 
-        if isinstance(module, qat.LinearReLU):
-            linear_out = tvm.relay.nn.relu(linear_out)
-
         if hasattr(module.activation_post_process, "bits") and module.out_quant:
             output_dtype = f"int{module.activation_post_process.bits}"
             output_scale = module.activation_post_process.quantization_function.scale
@@ -480,6 +568,8 @@ class RelayConverter(torch.fx.Interpreter):
             output_dtype,
             use_rescale=True,
         )
+        if isinstance(module, qat.LinearReLU):
+            linear_out = self._gen_relu(linear_out, output_dtype)
 
         self.outputs[node.name] = linear_out
         dtype, bits = parse_dtype(output_dtype)
@@ -508,38 +598,21 @@ class RelayConverter(torch.fx.Interpreter):
         groups = module.groups
         out_channels = module.out_channels
 
-        quant_weight = module.weight_fake_quant.quantize(weight)
-        quant_bias = module.bias_fake_quant.quantize(bias) if bias is not None else None
-
-        weight_dtype = f"int{module.weight_fake_quant.bits}"
-        weight_scale = module.weight_fake_quant.quantization_function.scale
-
         inputs = list(node.all_input_nodes)
         data = self.outputs[inputs[0].name]
         input_info = self.tensor_info[inputs[0].name]
-        input_bits = input_info.bits
-        input_dtype = input_info.relay_dtype
         input_scale = input_info.scale
 
-        weight_name = legalize_var_name(f"{node.name}.weight")
-        weight = tvm.relay.Var(
-            weight_name, tvm.relay.TensorType(quant_weight.shape, dtype=weight_dtype)
-        )
-        self.params[weight_name] = tvm.nd.array(
-            (quant_weight).detach().numpy().astype("byte")
-        )
-        if bias is not None:
-            bias_dtype = f"int{module.bias_fake_quant.bits}"
-            bias_scale = module.bias_fake_quant.quantization_function.scale
-            bias_name = legalize_var_name(f"{node.name}.bias")
-            bias = tvm.relay.Var(
-                bias_name, tvm.relay.TensorType(quant_bias.shape, dtype=bias_dtype)
-            )
-            self.params[bias_name] = tvm.nd.array(
-                (quant_bias).detach().numpy().astype("byte")
-            )
+        (
+            weight,
+            weight_scale,
+            bias,
+            bias_dtype,
+            bias_scale,
+        ) = self._gen_quantized_params(node, module, weight, bias)
+        weight_shape = list(module.weight.shape)
 
-        if quant_weight.dim() == 3:
+        if len(weight_shape) == 3:
             conv_out = tvm.relay.nn.conv1d(
                 data,
                 weight,
@@ -548,12 +621,12 @@ class RelayConverter(torch.fx.Interpreter):
                 dilation=dilation,
                 groups=groups,
                 channels=out_channels,
-                kernel_size=quant_weight.size(2),
+                kernel_size=weight_shape[2],
                 data_layout="NCW",
                 kernel_layout="OIW",
                 out_dtype=self.accumulator_dtype,
             )  # FIXME use proper out dtype
-        elif quant_weight.dim() == 4:
+        elif len(weight_shape) == 4:
             conv_out = tvm.relay.nn.conv2d(
                 data,
                 weight,
@@ -562,21 +635,21 @@ class RelayConverter(torch.fx.Interpreter):
                 dilation=dilation,
                 groups=groups,
                 channels=out_channels,
-                kernel_size=(quant_weight.size(2), quant_weight.size(3)),
+                kernel_size=(weight_shape[2], weight_shape[3]),
                 data_layout="NCHW",
                 kernel_layout="OIHW",
                 out_dtype=self.accumulator_dtype,
             )
         else:
             raise Exception(
-                f"Quantized weights of dimension {quant_weight.dim()} are not supported"
+                f"Quantized weights of dimension {len(weight_shape)} are not supported"
             )
 
         # print("conv_out:", conv_out)
-        accumulator_scale = weight_scale * input_scale
+        accumulator_scale = weight_scale * as_scale(input_scale)
 
         if bias is not None:
-            if bias_scale >= accumulator_scale:
+            if accumulator_scale.size == 1 and np.all(bias_scale >= accumulator_scale):
                 bias = self._gen_requantize(
                     bias,
                     bias_scale,
@@ -586,7 +659,7 @@ class RelayConverter(torch.fx.Interpreter):
                     use_rescale=True,
                     axis=0,
                 )
-            elif bias_scale < accumulator_scale:
+            else:
                 conv_out = self._gen_requantize(
                     conv_out,
                     accumulator_scale,
@@ -594,7 +667,7 @@ class RelayConverter(torch.fx.Interpreter):
                     bias_scale,
                     self.accumulator_dtype,
                     use_rescale=True,
-                    axis=0,
+                    axis=1,
                 )
                 bias = relay.cast(bias, self.accumulator_dtype)
                 accumulator_scale = bias_scale
@@ -604,14 +677,6 @@ class RelayConverter(torch.fx.Interpreter):
 
             conv_out = tvm.relay.nn.bias_add(conv_out, bias)
 
-        if (
-            isinstance(module, qat.ConvBnReLU1d)
-            or isinstance(module, qat.ConvBnReLU2d)
-            or isinstance(module, qat.ConvReLU1d)
-            or isinstance(module, qat.ConvReLU2d)
-        ):
-            conv_out = tvm.relay.nn.relu(conv_out)
-
         if (
             hasattr(module.activation_post_process, "bits")
             and getattr(module, "out_quant", True) is True
@@ -630,7 +695,15 @@ class RelayConverter(torch.fx.Interpreter):
             output_scale,
             output_dtype,
             use_rescale=True,
+            axis=1,
         )
+        if (
+            isinstance(module, qat.ConvBnReLU1d)
+            or isinstance(module, qat.ConvBnReLU2d)
+            or isinstance(module, qat.ConvReLU1d)
+            or isinstance(module, qat.ConvReLU2d)
+        ):
+            conv_out = self._gen_relu(conv_out, output_dtype)
 
         self.outputs[node.name] = conv_out
         dtype, bits = parse_dtype(output_dtype)
@@ -642,7 +715,7 @@ class RelayConverter(torch.fx.Interpreter):
         inputs = list(node.all_input_nodes)
         assert len(inputs) == 1
         data = self.outputs[inputs[0].name]
-        relu = tvm.relay.nn.relu(data)
+        relu = self._gen_relu(data, self.tensor_info[inputs[0].name].relay_dtype)
         self.outputs[node.name] = relu
         output_metadata = copy.deepcopy(self.tensor_info[inputs[0].name])
         self.tensor_info[node.name] = output_metadata
@@ -698,13 +771,60 @@ class RelayConverter(torch.fx.Interpreter):
         else:
             raise Exception(f"Unhandled target: {target}")
 
+    def get_input(self, node, num=0):
+        """Relay expression and tensor metadata of the num-th input of node"""
+        input = list(node.all_input_nodes)[num]
+        return self.outputs[input.name], self.tensor_info[input.name]
+
+    def set_output(self, node, output, metadata: TensorMetadata):
+        """Record the relay expression and tensor metadata of the result of node"""
+        self.outputs[node.name] = output
+        self.tensor_info[node.name] = metadata
+
+    def _module_converter(self, module):
+        for cls in type(module).__mro__:
+            if cls in MODULE_CONVERTERS:
+                converter = MODULE_CONVERTERS[cls]
+                return lambda node, module, result: converter(
+                    self, node, module, result
+                )
+        return self.module_map.get(type(module), None)
+
+    def _function_converter(self, target):
+        name = getattr(target, "__name__", None)
+        for key in [target, name]:
+            try:
+                converter = FUNCTION_CONVERTERS.get(key, None)
+            except TypeError:
+                converter = None
+            if converter is not None:
+                return lambda node, result: converter(self, node, result)
+        if name in BUILTIN_FUNCTIONS:
+            return self._handle_function
+        return None
+
+    def unsupported_nodes(self) -> List[str]:
+        """Names of the graph nodes without a converter"""
+        unsupported = []
+        for node in self.module.graph.nodes:
+            if node.op == "call_module":
+                module = self.modules[node.target]
+                if self._module_converter(module) is None:
+                    unsupported.append(f"{node.name} ({type(module).__name__})")
+            elif node.op == "call_function":
+                if self._function_converter(node.target) is None:
+                    name = getattr(node.target, "__name__", str(node.target))
+                    unsupported.append(f"{node.name} ({name})")
+            elif node.op not in ["placeholder", "get_attr", "output"]:
+                unsupported.append(f"{node.name} ({node.op})")
+        return unsupported
+
     def _handle_module(self, node, result):
         module = self.modules[node.target]
-        if type(module) in self.module_map:
-            self.module_map[type(module)](node, module, result)
-        else:
-            # breakpoint()
-            raise Exception(f"Support for module: {module} is not supported")
+        converter = self._module_converter(module)
+        if converter is None:
+            raise ConversionError([f"{node.name} ({type(module).__name__})"])
+        converter(node, module, result)
 
     def _handle_placeholder(self, node, result):
         var = relay.var(
@@ -736,7 +856,9 @@ class RelayConverter(torch.fx.Interpreter):
             assert lhs_data.dtype == rhs_data.dtype
             output_dtype = lhs_data.dtype
             output_bits = max(lhs_data.bits, rhs_data.bits)
-            output_scale = min(lhs_data.scale, rhs_data.scale)
+            output_scale = np.minimum(
+                as_scale(lhs_data.scale), as_scale(rhs_data.scale)
+            )
 
             lhs = self._gen_requantize(
                 lhs,
@@ -800,13 +922,51 @@ class RelayConverter(torch.fx.Interpreter):
         else:
             raise Exception(f"Unandled function {target}")
 
+    def _node_metadata(self, node):
+        """Shape and dtype of the result of node from the FX node metadata"""
+        if node.op == "output":
+            return None
+        if "val" in node.meta:
+            return node.meta["val"]
+        if "tensor_meta" in node.meta:
+            return node.meta["tensor_meta"]
+        raise Exception(f"Node {node} has no shape metadata")
+
+    def _propagate_metadata(self, input) -> bool:
+        """Annotate all nodes with the shapes for input using fake tensor propagation
+
+        Returns:
+            True if the propagation succeeded
+        """
+        try:
+            from torch._subclasses.fake_tensor import FakeTensorMode
+            from torch.fx.passes.fake_tensor_prop import FakeTensorProp
+
+            fake_mode = FakeTensorMode(allow_non_fake_inputs=True)
+            FakeTensorProp(self.module, mode=fake_mode).propagate(input)
+        except Exception as e:
+            logger.warning(
+                "Fake tensor propagation failed, running the torch model instead: %s",
+                str(e),
+            )
+            return False
+
+        return True
+
     def run_node(self, node):
-        result = super().run_node(node)
+        if self._use_metadata:
+            result = self._node_metadata(node)
+        else:
+            result = super().run_node(node)
 
         if node.op == "call_module":
             result_metadata = self._handle_module(node, result)
         elif node.op == "call_function":
-            result_metadata = self._handle_function(node, result)
+            converter = self._function_converter(node.target)
+            if converter is None:
+                name = getattr(node.target, "__name__", str(node.target))
+                raise ConversionError([f"{node.name} ({name})"])
+            result_metadata = converter(node, result)
         elif node.op == "output":
             result_metadata = self._handle_output(node, result)
         elif node.op == "placeholder":
@@ -824,7 +984,15 @@ class RelayConverter(torch.fx.Interpreter):
     def run(self, input):
         tvm_mod = tvm.IRModule()
 
-        super().run(input)
+        unsupported = self.unsupported_nodes()
+        if unsupported:
+            raise ConversionError(unsupported)
+
+        self._use_metadata = self.shape_only and self._propagate_metadata(input)
+        try:
+            super().run(input)
+        finally:
+            self._use_metadata = False
 
         ret = (
             self.returns[0] if len(self.returns) == 1 else tvm.relay.Tuple(self.returns)
@@ -15,51 +15,190 @@
 # WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 # See the License for the specific language governing permissions and
 # limitations under the License.
-#
 
 # Automatically run backend.register for detected uma backends
 # TODO: propagate to tvm and write RFC, and upstream
+#
+# Discovering backends imports every module of the uma_backends package, the
+# result is kept in an index file in the user cache directory which is rebuilt
+# whenever a file in the package changes. Backends are only instantiated and
+# registered when they are requested by name e.g. from the board config.
 
 import importlib
 import inspect
+import json
 import logging
+import os
 import pkgutil
 import sys
 import warnings
-from typing import Any, List, Type
+from typing import Any, Dict, Iterator, List, Optional, Type
 
+import appdirs
 from tvm.relay.backend.contrib.uma.backend import UMABackend
 
+INDEX_FILE = os.path.join(appdirs.user_cache_dir("hannah-tvm"), "uma_backends.json")
+
 _INITIALIZED = False
-_BACKENDS = []
+_BACKENDS: Dict[str, UMABackend] = {}
+_INDEX: Optional[Dict[str, str]] = None
+_INDEX_STATE: Any = None  # (package paths, package mtime) of the loaded index
 
 _logger = logging.getLogger(__name__)
 
 
-def backends():
+def backends() -> Iterator[UMABackend]:
     if not _INITIALIZED:
         init()
 
-    for backend in _BACKENDS:
+    for backend in list(_BACKENDS.values()):
         yield backend
 
 
 def init() -> None:
+    """Register all available uma backends"""
+    global _INITIALIZED
+
+    for name in index():
+        register(name)
+
+    _INITIALIZED = True
+
+
+def register(name: str) -> UMABackend:
+    """Register the uma backend with target name `name`, backends are only registered once"""
+    if name in _BACKENDS:
+        return _BACKENDS[name]
+
+    backend_cls = _load_backend_class(name, index())
+    if backend_cls is None:
+        # The index might be outdated e.g. if a backend has been installed as a different package
+        backend_cls = _load_backend_class(name, index(refresh=True))
+    if backend_cls is None:
+        raise ValueError(
+            f"Unknown uma backend '{name}', available backends: {', '.join(sorted(index()))}"
+        )
+
+    _logger.info("Registering uma backend %s", name)
+    backend = backend_cls()
+    backend.register()
+    _BACKENDS[name] = backend
+
+    return backend
+
+
+def index(refresh: bool = False) -> Dict[str, str]:
+    """Mapping of uma target names to the backend classes providing them, as "module:class" """
+    top_level = _top_level()
+    mtime = _package_mtime(top_level)
+    paths = [path for mdl in top_level for path in mdl.__path__]
+
+    if not refresh and _INDEX is not None and _INDEX_STATE == (paths, mtime):
+        return _INDEX
+
+    backend_index = None if refresh else _read_index(paths, mtime)
+    if backend_index is None:
+        backend_index = {}
+        for backend_cls in _scan_all(top_level):
+            name = backend_cls().target_name
+            if backend_index.get(name, _class_path(backend_cls)) != _class_path(
+                backend_cls
+            ):
+                _logger.warning(
+                    "uma backend %s is provided by %s and %s, using the latter",
+                    name,
+                    backend_index[name],
+                    _class_path(backend_cls),
+                )
+            backend_index[name] = _class_path(backend_cls)
+        _write_index(paths, mtime, backend_index)
+
+    _set_index(backend_index, paths, mtime)
+
+    return backend_index
+
+
+def _set_index(backend_index: Dict[str, str], paths: List[str], mtime: float) -> None:
+    global _INDEX, _INDEX_STATE
+    _INDEX = backend_index
+    _INDEX_STATE = (paths, mtime)
+
+
+def _top_level() -> List[Any]:
     top_level = []
 
     try:
         mod = importlib.import_module("uma_backends")
         top_level.append(mod)
     except ImportError:
-        # If no plugins are installed the hydra_plugins package does not exist.
+        # If no plugins are installed the uma_backends package does not exist.
         pass
 
-    backend_classes = _scan_all(top_level)
+    return top_level
+
+
+def _package_mtime(top_level: List[Any]) -> float:
+    "Latest modification time of a file or directory in the backend packages"
+    mtime = 0.0
+    for mdl in top_level:
+        for path in mdl.__path__:
+            for root, dirs, files in os.walk(path):
+                dirs[:] = [d for d in dirs if d != "__pycache__"]
+                mtime = max(mtime, os.stat(root).st_mtime)
+                for file_name in files:
+                    if file_name.endswith(".py"):
+                        mtime = max(
+                            mtime, os.stat(os.path.join(root, file_name)).st_mtime
+                        )
+    return mtime
+
+
+def _read_index(paths: List[str], mtime: float) -> Optional[Dict[str, str]]:
+    try:
+        with open(INDEX_FILE) as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return None
+
+    if data.get("paths") != paths or data.get("mtime") != mtime:
+        return None
+
+    return data.get("backends")
+
+
+def _write_index(paths: List[str], mtime: float, backend_index: Dict[str, str]) -> None:
+    try:
+        os.makedirs(os.path.dirname(INDEX_FILE), exist_ok=True)
+        tmp_file = f"{INDEX_FILE}.{os.getpid()}.tmp"
+        with open(tmp_file, "w") as f:
+            json.dump({"paths": paths, "mtime": mtime, "backends": backend_index}, f)
+        os.replace(tmp_file, INDEX_FILE)
+    except OSError as e:
+        _logger.warning("Could not write uma backend index %s: %s", INDEX_FILE, e)
+
+
+def _class_path(cls: Type[UMABackend]) -> str:
+    return f"{cls.__module__}:{cls.__qualname__}"
+
+
+def _load_backend_class(
+    name: str, backend_index: Dict[str, str]
+) -> Optional[Type[UMABackend]]:
+    if name not in backend_index:
+        return None
+
+    module_name, class_name = backend_index[name].split(":", 1)
+    try:
+        obj = importlib.import_module(module_name)
+        for attr in class_name.split("."):
+            obj = getattr(obj, attr)
+    except (ImportError, AttributeError):
+        return None
+
+    if not _is_concrete_backend_type(obj):
+        return None
 
-    for backend_cls in backend_classes:
-        backend = backend_cls()
-        backend.register()
-        _BACKENDS.append(backend)
+    return obj
 
 
 def _scan_all(top_level: List[Any]) -> List[Type[UMABackend]]:
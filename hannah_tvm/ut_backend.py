@@ -20,6 +20,7 @@ import copy
 import logging
 import sys
 
+import torch
 import tvm
 from hannah.callbacks.backends import InferenceBackendBase
 
@@ -84,15 +85,17 @@ class UMAUltraTrailBackend(InferenceBackendBase):
             logging.critical("Backend batch is empty")
             return None
 
-        inputs = inputs.cpu()
-        inputs = inputs[: self.limit_batch_size]
+        # Only move the samples that are actually run to host memory
+        inputs = inputs[: self.limit_batch_size].cpu()
 
-        x = self.torch_model._extract_features(inputs)
-        x = self.torch_model.normalizer(x)
-        y = self.torch_model.model(x)
+        with torch.no_grad():
+            x = self.torch_model._extract_features(inputs)
+            x = self.torch_model.normalizer(x)
+            y = self.torch_model.model(x)
 
-        xs = x.cpu().split(1)
-        ys = y.cpu().split(1)
+        # split and squeeze return views, the samples share the batch memory
+        xs = x.split(1)
+        ys = y.split(1)
         ys = [t.squeeze() for t in ys]
 
         results = self.ut_backend.run(xs, ys)
@@ -16,4 +16,5 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 #
+from .dlpack import to_torch, to_tvm
 from .relay_viz import RelayVisualizer
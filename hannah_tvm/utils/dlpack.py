@@ -0,0 +1,88 @@
+#
+# Copyright (c) 2024 hannah-tvm contributors.
+#
+# This file is part of hannah-tvm.
+# See https://atreus.informatik.uni-tuebingen.de/ties/ai/hannah/hannah-tvm for further info.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+"""Zero-copy exchange of tensors between torch, numpy and tvm using DLPack"""
+from typing import Optional
+
+import numpy as np
+import tvm
+
+
+def to_tvm(data, dtype: Optional[str] = None) -> tvm.nd.NDArray:
+    """Convert a torch tensor or numpy array to a tvm NDArray sharing its memory
+
+    The data is only copied if it needs a dtype conversion, is not
+    contiguous, or can not be imported via DLPack, e.g. read only numpy arrays
+    or buffers that are not aligned as required by tvm.
+
+    Args:
+        data: torch.Tensor, np.ndarray or tvm.nd.NDArray
+        dtype (Optional[str]): target dtype, defaults to the dtype of data
+
+    Returns:
+        tvm.nd.NDArray: NDArray on the device of data
+    """
+    if isinstance(data, tvm.nd.NDArray):
+        if dtype is not None and data.dtype != dtype:
+            return tvm.nd.array(data.numpy().astype(dtype), device=data.device)
+        return data
+
+    if isinstance(data, np.ndarray):
+        if dtype is not None and data.dtype != dtype:
+            data = data.astype(dtype)
+        data = np.ascontiguousarray(data)
+        try:
+            return tvm.nd.from_dlpack(data)
+        except (AttributeError, BufferError, TypeError, tvm.TVMError):
+            return tvm.nd.array(data)
+
+    import torch
+
+    if isinstance(data, torch.Tensor):
+        data = data.detach()
+        if dtype is not None:
+            data = data.to(getattr(torch, dtype))
+        data = data.contiguous()
+        try:
+            return tvm.nd.from_dlpack(torch.utils.dlpack.to_dlpack(data))
+        except (BufferError, TypeError, tvm.TVMError):
+            if data.is_cuda:
+                device = tvm.cuda(data.device.index or 0)
+            else:
+                device = tvm.cpu()
+            return tvm.nd.array(data.cpu().numpy(), device=device)
+
+    return tvm.nd.array(np.asarray(data, dtype=dtype))
+
+
+def to_torch(data: tvm.nd.NDArray):
+    """Convert a tvm NDArray to a torch tensor sharing its memory
+
+    NDArrays of remote rpc sessions or on other devices than the CPU are copied
+    to a torch CPU tensor.
+    """
+    import torch
+
+    if data.device.device_type != tvm.cpu().device_type:
+        # Includes remote devices, whose device types are offset by the session mask
+        return torch.from_numpy(data.numpy())
+
+    try:
+        return torch.utils.dlpack.from_dlpack(data.to_dlpack())
+    except (BufferError, TypeError, RuntimeError, tvm.TVMError):
+        return torch.from_numpy(data.numpy())
@@ -16,12 +16,10 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 #
-from tvm.contrib import relay_viz
-from tvm.relay.testing import resnet
-
-
 class RelayVisualizer:
     def __init__(self):
+        from tvm.contrib import relay_viz
+
         # graphviz attributes
         graph_attr = {"color": "red"}
         node_attr = {"color": "blue"}
@@ -53,6 +51,8 @@ class RelayVisualizer:
         )
 
     def render(self, mod, param, output_path):
+        from tvm.contrib import relay_viz
+
         viz = relay_viz.RelayVisualizer(
             mod,
             relay_param=param,
@@ -16,6 +16,8 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 #
+import os
+
 import numpy as np
 import pytest
 import tvm
@@ -54,6 +56,7 @@ from hannah_tvm import datatypes
     ],
 )
 def test_simple(dtype: str):
+    datatypes.register_type(dtype)
     try:
         with tvm.transform.PassContext(config={"tir.disable_vectorize": True}):
             x = relay.var("x", shape=(3,), dtype="float32")
@@ -85,5 +88,76 @@ def test_simple(dtype: str):
         raise e
 
 
+def test_lazy_registration():
+    datatypes.register(5, False)
+    assert "UINT5" in os.environ[datatypes.ENV_VAR].split(",")
+    assert tvm.target.datatype.get_type_registered(
+        tvm.target.datatype.get_type_code("UINT5")
+    )
+
+
+def _wrap(values, bits, signed):
+    values = values.astype("int64") & ((1 << bits) - 1)
+    if signed:
+        values = np.where(values >= 2 ** (bits - 1), values - 2**bits, values)
+    return values
+
+
+_REFERENCE_OPS = {
+    "Add": (relay.add, lambda x, y: x + y),
+    "Sub": (relay.subtract, lambda x, y: x - y),
+    "Mul": (relay.multiply, lambda x, y: x * y),
+    "Min": (relay.minimum, np.minimum),
+    "Max": (relay.maximum, np.maximum),
+    # ac_int division truncates towards zero
+    "Div": (relay.divide, lambda x, y: np.trunc(x / y).astype("int64")),
+}
+
+
+@pytest.mark.parametrize("op", list(_REFERENCE_OPS))
+@pytest.mark.parametrize(
+    "bits,signed",
+    [
+        (4, True),
+        (4, False),
+        (7, True),
+        (12, False),
+        (20, False),
+        (24, True),
+        (32, True),
+    ],
+)
+def test_arithmetic(op: str, bits: int, signed: bool):
+    relay_op, reference_op = _REFERENCE_OPS[op]
+    dtype = datatypes.custom_dtype(bits, signed)
+    x = relay.var("x", shape=(16,), dtype="float32")
+    y = relay.var("y", shape=(16,), dtype="float32")
+    x_custom = relay.cast(x, dtype=dtype)
+    y_custom = relay.cast(y, dtype=dtype)
+    z = relay.cast(relay_op(x_custom, y_custom), dtype="float32")
+    module = tvm.IRModule.from_expr(relay.Function([x, y], z))
+    module = relay.transform.InferType()(module)
+
+    # Inputs must be exactly representable as float32
+    high = 2 ** min(bits - 1, 23) if signed else 2 ** min(bits, 24)
+    low = -high if signed else 0
+    x_input = np.random.randint(low, high, size=16)
+    y_input = np.random.randint(low, high, size=16)
+    if op == "Div":
+        y_input = np.where(y_input == 0, 1, y_input)
+    else:
+        # Make sure the extreme values, which overflow on Add, Sub and Mul, are covered
+        x_input[0], y_input[0] = high - 1, high - 1
+        x_input[1], y_input[1] = low, high - 1
+
+    with tvm.transform.PassContext(config={"tir.disable_assert": True}):
+        z_output = relay.create_executor("graph", mod=module).evaluate()(
+            x_input.astype("float32"), y_input.astype("float32")
+        )
+
+    expected = _wrap(reference_op(x_input, y_input), bits, signed)
+    np.testing.assert_array_equal(z_output.numpy(), expected.astype("float32"))
+
+
 if __name__ == "__main__":
     test_simple()
@@ -0,0 +1,114 @@
+#
+# Copyright (c) 2024 hannah-tvm contributors.
+#
+# This file is part of hannah-tvm.
+# See https://atreus.informatik.uni-tuebingen.de/ties/ai/hannah/hannah-tvm for further info.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+import pytest
+from omegaconf import OmegaConf
+
+pytest.importorskip("tvm")
+
+from hannah_tvm.connectors.daemon import BoardDaemon  # noqa: E402
+
+
+class FakeServer:
+    def __init__(self):
+        self.alive = True
+
+    def is_alive(self):
+        return self.alive
+
+
+class FakeTrackerConnection:
+    def __init__(self):
+        self.servers = []
+        # Queues are kept by the tracker after their servers are gone
+        self.queues = {"jetson": {"free": 0, "pending": 0}}
+        self.responding = True
+
+    def summary(self):
+        if not self.responding:
+            raise ConnectionError("tracker is gone")
+        return {
+            "queue_info": self.queues,
+            "server_info": [
+                {"addr": ["127.0.0.1", 9091], "key": f"server:{name}"}
+                for name in self.servers
+            ],
+        }
+
+
+@pytest.fixture
+def daemon(monkeypatch):
+    daemon = BoardDaemon(
+        [OmegaConf.create({"name": "jetson"})], registration_timeout_s=0.0
+    )
+    daemon._tracker_conn = FakeTrackerConnection()
+    daemon.started = []
+    daemon.tracker_restarts = 0
+
+    def start_server(name):
+        daemon._servers[name] = FakeServer()
+        daemon._unregistered_since.pop(name, None)
+        daemon.started.append(name)
+
+    def stop_server(name):
+        daemon._servers.pop(name)
+
+    def restart_tracker():
+        daemon.tracker_restarts += 1
+
+    monkeypatch.setattr(daemon, "_start_server", start_server)
+    monkeypatch.setattr(daemon, "_stop_server", stop_server)
+    monkeypatch.setattr(daemon, "_restart_tracker", restart_tracker)
+    daemon._start_server("jetson")
+    return daemon
+
+
+def test_registered_server_is_kept(daemon):
+    daemon._tracker_conn.servers = ["jetson"]
+    daemon.check_health()
+    daemon.check_health()
+
+    assert daemon.restarts["jetson"] == 0
+    assert daemon.status()["jetson"]["servers"] == 1
+
+
+def test_unregistered_server_is_restarted(daemon):
+    # The stale queue of the board must not count as registration
+    daemon.check_health()
+    assert daemon.restarts["jetson"] == 0
+
+    daemon.check_health()
+    assert daemon.restarts["jetson"] == 1
+    assert daemon.started == ["jetson", "jetson"]
+
+
+def test_terminated_server_is_restarted(daemon):
+    daemon._tracker_conn.servers = ["jetson"]
+    daemon._servers["jetson"].alive = False
+    daemon.check_health()
+
+    assert daemon.restarts["jetson"] == 1
+    assert daemon._servers["jetson"].is_alive()
+
+
+def test_tracker_is_restarted(daemon):
+    daemon._tracker_conn.responding = False
+    daemon.check_health()
+
+    assert daemon.tracker_restarts == 1
+    assert daemon.restarts["jetson"] == 0
@@ -0,0 +1,86 @@
+#
+# Copyright (c) 2024 hannah-tvm contributors.
+#
+# This file is part of hannah-tvm.
+# See https://atreus.informatik.uni-tuebingen.de/ties/ai/hannah/hannah-tvm for further info.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+import pytest
+
+try:
+    import tvm
+except ImportError:
+    pytest.skip("TVM not available", allow_module_level=True)
+
+
+import numpy as np
+
+from hannah_tvm.utils.dlpack import to_torch, to_tvm
+
+
+def aligned_array(shape, dtype, alignment=64):
+    "Numpy array with a buffer aligned as tvm requires for zero copy imports"
+    nbytes = int(np.prod(shape)) * np.dtype(dtype).itemsize
+    buffer = np.empty(nbytes + alignment, dtype=np.uint8)
+    offset = -buffer.ctypes.data % alignment
+    return buffer[offset : offset + nbytes].view(dtype).reshape(shape)
+
+
+def test_numpy_zero_copy():
+    data = aligned_array((4, 4), "float32")
+    data[:] = np.arange(16, dtype="float32").reshape(4, 4)
+    data_tvm = to_tvm(data)
+
+    data[0, 0] = 42.0
+    assert data_tvm.numpy()[0, 0] == 42.0
+
+
+def test_numpy_dtype_conversion():
+    data = np.arange(16, dtype="float32")
+    data_tvm = to_tvm(data, "int8")
+
+    assert data_tvm.dtype == "int8"
+    np.testing.assert_equal(data_tvm.numpy(), data.astype("int8"))
+
+
+def test_numpy_unaligned():
+    data = aligned_array((17,), "float32")
+    data[:] = np.arange(17, dtype="float32")
+
+    # Slices of aligned buffers are not aligned, they are copied instead
+    data_tvm = to_tvm(data[1:])
+    np.testing.assert_equal(data_tvm.numpy(), np.arange(1, 17, dtype="float32"))
+
+
+def test_torch_unaligned():
+    torch = pytest.importorskip("torch")
+
+    data = torch.arange(20, dtype=torch.float32)
+    batch = data[1:17]
+    data_tvm = to_tvm(batch)
+    np.testing.assert_equal(data_tvm.numpy(), batch.numpy())
+
+    assert torch.equal(to_torch(data_tvm), batch)
+
+
+def test_torch_roundtrip():
+    torch = pytest.importorskip("torch")
+
+    data = torch.rand(2, 3)
+    data_tvm = to_tvm(data)
+    data_torch = to_torch(data_tvm)
+
+    data[1, 1] = 42.0
+    assert data_tvm.numpy()[1, 1] == 42.0
+    assert data_torch[1, 1] == 42.0
@@ -0,0 +1,55 @@
+#
+# Copyright (c) 2024 hannah-tvm contributors.
+#
+# This file is part of hannah-tvm.
+# See https://atreus.informatik.uni-tuebingen.de/ties/ai/hannah/hannah-tvm for further info.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+import pytest
+
+try:
+    import tvm
+except ImportError:
+    pytest.skip("TVM not available", allow_module_level=True)
+
+
+import pickle
+from pathlib import Path
+
+from hannah_tvm.export_annette import AnnetteResultGenerator
+
+data_dir = Path(__file__).parent / "data"
+
+
+def test_colliding_hashes_sine():
+    sine_file = data_dir / "sine_llvm.relay.pkl"
+    with sine_file.open("rb") as f:
+        sine_relay = pickle.load(f)
+
+    result_gen = AnnetteResultGenerator(sine_relay)
+    layers = result_gen.generate_layer_dict()
+
+    base_hashes = [key.split("-")[0] for key in layers.keys()]
+    for key in layers.keys():
+        base_hash = key.split("-")[0]
+        if "-" in key:
+            assert base_hashes.count(base_hash) > 1
+        else:
+            assert base_hashes.count(base_hash) == 1
+
+    assert len(set(layers.keys())) == len(layers)
+
+
+if __name__ == "__main__":
+    test_colliding_hashes_sine()
@@ -28,6 +28,8 @@ except ImportError:
 from hydra import compose, initialize
 
 import hannah_tvm.config  # noqa
+from hannah_tvm import load
+from hannah_tvm.config import Model
 from hannah_tvm.tune import main
 
 
@@ -73,5 +75,36 @@ def test_pytorch():
         main(cfg)
 
 
+def test_onnx_cached_check(tmp_path, monkeypatch):
+    onnx = pytest.importorskip("onnx")
+    from onnx import TensorProto, helper
+
+    graph = helper.make_graph(
+        [helper.make_node("Relu", ["x"], ["y"])],
+        "relu",
+        [helper.make_tensor_value_info("x", TensorProto.FLOAT, [1, 8])],
+        [helper.make_tensor_value_info("y", TensorProto.FLOAT, [1, 8])],
+    )
+    model_file = tmp_path / "relu.onnx"
+    onnx.save(helper.make_model(graph), str(model_file))
+
+    monkeypatch.setattr(load, "cache_dir", str(tmp_path / "cache"))
+    mod, params, inputs = load.load_model(Model(url=str(model_file)))
+    assert inputs["x"].shape == (1, 8)
+    assert len(list((tmp_path / "cache" / "onnx_checked").iterdir())) == 1
+    assert len(list((tmp_path / "cache" / "onnx_inferred").iterdir())) == 1
+
+    # Unchanged models are not checked again
+    monkeypatch.setattr(
+        onnx.checker, "check_model", lambda *args: pytest.fail("model checked twice")
+    )
+    load.load_model(Model(url=str(model_file)))
+
+    mod, params, inputs = load.load_model(
+        Model(url=str(model_file), check=False, infer_shapes=False)
+    )
+    assert inputs["x"].shape == (1, 8)
+
+
 if __name__ == "__main__":
     test_pytorch()
@@ -1,5 +1,7 @@
 # This is a test for the hannah/tvm integration
 
+import copy
+
 from pytest import importorskip
 
 hannah = importorskip("hannah")
@@ -48,14 +50,14 @@ class SimpleModule(LightningModule):
         return ["class1", "class2", "class3", "class4", "class5"] 
 
 
-def init_backend():
+def init_backend(**kwargs):
     # initialize hydra
     with initialize_config_module(config_module="hannah_tvm.conf.backend", job_name="test_hannah_integration", version_base="1.2"):
         cfg : omegaconf.DictConfig = compose(config_name="tvm", overrides=["tuner=meta_scheduler", "board=local_cpu"])
         
         print(omegaconf.OmegaConf.to_yaml(cfg)) 
         
-        backend = TVMBackend(cfg.board, cfg.tuner)
+        backend = TVMBackend(cfg.board, cfg.tuner, **kwargs)
         
         return backend
 
@@ -70,6 +72,101 @@ def test_simple():
     backend.prepare(module)
 
 
+def test_run():
+    module = SimpleModule()
+    module.prepare_data()
+    module.setup("fit")
+
+    backend = init_backend()
+    backend.prepare(module)
+
+    x = torch.rand(3, 5)
+    y = backend.run(x)
+    assert y.shape == (3, 5)
+    assert torch.allclose(y, module(x), atol=1e-4)
+
+    result = backend.profile(x)
+    assert len(result.profile["batch_latencies"]) == 3
+
+
+def test_pipelined_run():
+    module = SimpleModule()
+    module.prepare_data()
+    module.setup("fit")
+
+    backend = init_backend()
+    backend.prepare(module)
+    pipelined_backend = init_backend(pipeline_depth=3)
+    pipelined_backend.prepare(module)
+
+    # More batches than executors, so each executor runs several batches
+    x = torch.rand(10, 5)
+    y = pipelined_backend.run(x)
+    assert torch.equal(y, backend.run(x))
+    assert torch.allclose(y, module(x), atol=1e-4)
+
+
+def test_prepare_cache():
+    module = SimpleModule()
+    module.prepare_data()
+    module.setup("fit")
+
+    backend = init_backend()
+    backend.prepare(module)
+    task = backend.task
+
+    backend.prepare(module)
+    assert backend.task is task
+
+    with torch.no_grad():
+        module.model.weight.add_(1.0)
+    backend.prepare(module)
+    assert backend.task is not task
+    assert backend.task.model_key == task.model_key
+
+    x = torch.rand(2, 5)
+    assert torch.allclose(backend.run(x), module(x), atol=1e-4)
+
+
+def test_copy_prepared_backend():
+    module = SimpleModule()
+    module.prepare_data()
+    module.setup("fit")
+
+    backend = init_backend()
+    backend.prepare(module)
+
+    backend_copy = copy.deepcopy(backend)
+    assert backend_copy._executors is None
+    assert len(backend_copy._prepared) == 0
+
+    # Copying must not touch the prepared state of the original backend
+    assert len(backend._prepared) == 1
+    x = torch.rand(2, 5)
+    assert torch.allclose(backend.run(x), module(x), atol=1e-4)
+
+
+def test_rebind_weights():
+    module = SimpleModule()
+    module.prepare_data()
+    module.setup("fit")
+
+    backend = init_backend()
+    backend.rebind_weights = True
+    backend.prepare(module)
+    task = backend.task
+    executors = backend._executors
+
+    with torch.no_grad():
+        module.model.weight.add_(1.0)
+    backend.prepare(module)
+    assert backend.task is task
+    assert backend._executors is executors
+
+    x = torch.rand(2, 5)
+    assert torch.allclose(backend.run(x), module(x), atol=1e-4)
+
+
 #def test_conv_vit():    
 #    input = Tensor(shape=(1, 3, 224, 224), name="input", dtype=FloatType(), axis = ["N", "C", "H", "W"])
 #    model = conv_vit("Vision_transformer", input)
@@ -0,0 +1,73 @@
+#
+# Copyright (c) 2024 hannah-tvm contributors.
+#
+# This file is part of hannah-tvm.
+# See https://atreus.informatik.uni-tuebingen.de/ties/ai/hannah/hannah-tvm for further info.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+tvm = pytest.importorskip("tvm")
+
+# Modules that must only be loaded when the feature using them is used
+LAZY_MODULES = [
+    "matplotlib",
+    "torch",
+    "hannah",
+    "tvm.meta_schedule",
+    "tvm.relay.op.contrib.tensorrt",
+    "tvm.contrib.debugger",
+    "hannah_tvm.connectors.automate",
+    "hannah_tvm.connectors.micro",
+]
+
+# Startup budget in seconds for importing the tuning entry point, can be adjusted for slow machines
+IMPORT_BUDGET_S = float(os.environ.get("HANNAH_TVM_IMPORT_BUDGET_S", "10.0"))
+
+
+def _import(module):
+    code = (
+        "import json, sys, time\n"
+        "start = time.perf_counter()\n"
+        f"import {module}\n"
+        "duration = time.perf_counter() - start\n"
+        "print(json.dumps({'duration': duration, 'modules': sorted(sys.modules)}))\n"
+    )
+    output = subprocess.run(
+        [sys.executable, "-c", code], check=True, capture_output=True, text=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+@pytest.mark.parametrize("module", ["hannah_tvm.tune", "hannah_tvm.task"])
+def test_lazy_imports(module):
+    result = _import(module)
+    loaded = [
+        name
+        for name in LAZY_MODULES
+        if name in result["modules"]
+        or any(loaded.startswith(name + ".") for loaded in result["modules"])
+    ]
+    assert loaded == []
+
+
+def test_import_time():
+    baseline = _import("tvm.relay")["duration"]
+    duration = _import("hannah_tvm.tune")["duration"]
+    print(f"Import time tvm.relay: {baseline:.2f}s hannah_tvm.tune: {duration:.2f}s")
+    assert duration < baseline + IMPORT_BUDGET_S
@@ -0,0 +1,95 @@
+#
+# Copyright (c) 2024 hannah-tvm contributors.
+#
+# This file is part of hannah-tvm.
+# See https://atreus.informatik.uni-tuebingen.de/ties/ai/hannah/hannah-tvm for further info.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import numpy as np
+import pytest
+
+from hannah_tvm.config import Model
+from hannah_tvm.inputs import measurement_samples
+
+INPUTS = {
+    "x": np.zeros((1, 3, 4), dtype=np.float32),
+    "y": np.zeros((1, 2), dtype=np.int8),
+}
+
+
+def test_random_inputs():
+    samples = measurement_samples(Model(url="model.onnx"), INPUTS)
+    assert len(samples) == 1
+    assert samples[0] is INPUTS
+
+
+def test_npy_directory_inputs(tmp_path):
+    np.save(tmp_path / "x.npy", np.random.uniform(size=(5, 1, 3, 4)))
+    np.save(tmp_path / "y.npy", np.arange(12).reshape(6, 1, 2))
+
+    samples = measurement_samples(
+        Model(url="model.onnx", input_data=str(tmp_path), num_input_samples=3),
+        INPUTS,
+    )
+    assert len(samples) == 3
+    for index, sample in enumerate(samples):
+        assert sample["x"].shape == (1, 3, 4)
+        assert sample["x"].dtype == np.float32
+        assert sample["y"].dtype == np.int8
+        assert sample["y"].tolist() == [[2 * index, 2 * index + 1]]
+
+
+def test_npz_inputs(tmp_path):
+    data_file = tmp_path / "data.npz"
+    np.savez(data_file, x=np.ones((1, 3, 4)), y=np.ones((4, 1, 2)))
+
+    samples = measurement_samples(
+        Model(url="model.onnx", input_data=str(data_file)), INPUTS
+    )
+    assert len(samples) == 1
+
+    np.savez(data_file, x=np.ones((3, 4)), y=np.ones((1, 2)))
+    with pytest.raises(ValueError):
+        measurement_samples(Model(url="model.onnx", input_data=str(data_file)), INPUTS)
+
+
+def test_sample_directory_inputs(tmp_path):
+    for index in range(2):
+        np.savez(
+            tmp_path / f"sample{index}.npz",
+            x=np.full((1, 3, 4), index),
+            y=np.full((1, 2), index),
+        )
+
+    samples = measurement_samples(
+        Model(url="model.onnx", input_data=str(tmp_path)), INPUTS
+    )
+    assert [int(sample["x"][0, 0, 0]) for sample in samples] == [0, 1]
+
+
+def test_num_input_samples(tmp_path):
+    np.save(tmp_path / "x.npy", np.zeros((10, 1, 3, 4)))
+    np.save(tmp_path / "y.npy", np.zeros((10, 1, 2)))
+
+    def num_samples(num_input_samples=None, **kwargs):
+        model = Model(
+            url="model.onnx",
+            input_data=str(tmp_path),
+            num_input_samples=num_input_samples,
+        )
+        return len(measurement_samples(model, INPUTS, **kwargs))
+
+    assert num_samples() == 8
+    assert num_samples(default_num_samples=1) == 1
+    assert num_samples(3, default_num_samples=1) == 3
+    assert num_samples(0) == 10
@@ -0,0 +1,62 @@
+#
+# Copyright (c) 2024 hannah-tvm contributors.
+#
+# This file is part of hannah-tvm.
+# See https://atreus.informatik.uni-tuebingen.de/ties/ai/hannah/hannah-tvm for further info.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+import pytest
+
+try:
+    import tvm
+except ImportError:
+    pytest.skip("TVM not available", allow_module_level=True)
+
+
+import tvm.te as te
+
+from hannah_tvm.passes.memory_analysis import MemoryAnalysis, memory_analysis
+
+
+def _two_stage(n=1024):
+    A = te.placeholder((n,), name="A", dtype="float32")
+    B = te.compute((n,), lambda i: A[i] + 1.0, name="B")
+    C = te.compute((n,), lambda i: B[i] * 2.0, name="C")
+    s = te.create_schedule(C.op)
+
+    return tvm.lower(s, [A, C], name="two_stage")
+
+
+def test_memory_analysis():
+    mod = _two_stage(1024)
+    result = MemoryAnalysis().analyze(mod["two_stage"])
+
+    assert result.io_bytes == 2 * 1024 * 4
+    assert result.peak_workspace_bytes == 1024 * 4
+    assert result.peak_live_bytes == 3 * 1024 * 4
+    assert result.bytes_loaded == 2 * 1024 * 4
+    assert result.bytes_stored == 2 * 1024 * 4
+
+
+def test_memory_analysis_pass():
+    mod = _two_stage(16)
+    analysis = MemoryAnalysis()
+    memory_analysis(analysis)(mod)
+
+    assert analysis.results["two_stage"].peak_workspace_bytes == 16 * 4
+
+
+if __name__ == "__main__":
+    test_memory_analysis()
+    test_memory_analysis_pass()
@@ -0,0 +1,72 @@
+#
+# Copyright (c) 2024 hannah-tvm contributors.
+#
+# This file is part of hannah-tvm.
+# See https://atreus.informatik.uni-tuebingen.de/ties/ai/hannah/hannah-tvm for further info.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+import pytest
+
+try:
+    import tvm
+except ImportError:
+    pytest.skip("TVM not available", allow_module_level=True)
+
+
+import numpy as np
+import tvm.relay as relay
+from omegaconf import OmegaConf
+
+from hannah_tvm.micro.memory import MemoryEstimate, check_memory, estimate_memory
+
+
+def _mlp():
+    x = relay.var("x", shape=(1, 16), dtype="float32")
+    w1 = relay.var("w1", shape=(16, 16), dtype="float32")
+    w2 = relay.var("w2", shape=(16, 16), dtype="float32")
+    y = relay.nn.relu(relay.nn.dense(x, w1))
+    y = relay.nn.dense(y, w2)
+
+    mod = tvm.IRModule.from_expr(relay.Function([x, w1, w2], y))
+    params = {
+        "w1": np.ones((16, 16), dtype="float32"),
+        "w2": np.ones((16, 16), dtype="float32"),
+    }
+    return mod, params
+
+
+def test_estimate_memory():
+    mod, params = _mlp()
+    estimate = estimate_memory(mod, params)
+
+    assert estimate.io_bytes == 2 * 16 * 4
+    assert estimate.constant_bytes == 2 * 16 * 16 * 4
+    assert estimate.workspace_bytes == 16 * 4
+
+
+def test_check_memory():
+    estimate = MemoryEstimate(workspace_bytes=1024, constant_bytes=4096, io_bytes=512)
+
+    check_memory(estimate, OmegaConf.create({"ram_bytes": 2048, "flash_bytes": 4096}))
+    check_memory(estimate, OmegaConf.create({}))
+
+    with pytest.raises(Exception):
+        check_memory(estimate, OmegaConf.create({"ram_bytes": 1024}))
+    with pytest.raises(Exception):
+        check_memory(estimate, OmegaConf.create({"flash_bytes": 1024}))
+
+
+if __name__ == "__main__":
+    test_estimate_memory()
+    test_check_memory()
@@ -0,0 +1,105 @@
+#
+# Copyright (c) 2024 hannah-tvm contributors.
+#
+# This file is part of hannah-tvm.
+# See https://atreus.informatik.uni-tuebingen.de/ties/ai/hannah/hannah-tvm for further info.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import hashlib
+import os
+
+import fsspec
+import pytest
+
+from hannah_tvm.model_cache import ModelCache
+
+
+def _write_remote(url, data):
+    with fsspec.open(url, "wb") as f:
+        f.write(data)
+
+
+def test_model_cache_fetch(tmp_path):
+    data = b"model" * 100
+    url = "memory://models/fetch/model.tflite"
+    _write_remote(url, data)
+
+    cache = ModelCache(cache_dir=str(tmp_path))
+    path = cache.fetch(url, sha256=hashlib.sha256(data).hexdigest())
+    assert path.endswith("model.tflite")
+    with open(path, "rb") as f:
+        assert f.read() == data
+
+    # Cached models are not downloaded again
+    fsspec.filesystem("memory").rm(url)
+    assert cache.fetch(url) == path
+
+    local_file = tmp_path / "local.onnx"
+    local_file.write_bytes(data)
+    assert cache.fetch(str(local_file)) == str(local_file)
+
+
+def test_model_cache_hash_mismatch(tmp_path):
+    url = "memory://models/mismatch/model.onnx"
+    _write_remote(url, b"model")
+
+    cache = ModelCache(cache_dir=str(tmp_path))
+    with pytest.raises(ValueError):
+        cache.fetch(url, sha256=hashlib.sha256(b"other").hexdigest())
+    assert not any(p.is_dir() for p in tmp_path.iterdir())
+
+
+def test_model_cache_eviction(tmp_path):
+    cache = ModelCache(cache_dir=str(tmp_path), max_bytes=250, grace_period_s=0.0)
+
+    paths = []
+    for i in range(3):
+        url = f"memory://models/evict/model{i}.pb"
+        _write_remote(url, bytes(100))
+        paths.append(cache.fetch(url))
+
+    # The least recently used model has been evicted
+    assert not os.path.exists(paths[0])
+    assert os.path.exists(paths[1])
+    assert os.path.exists(paths[2])
+
+
+def test_model_cache_grace_period(tmp_path):
+    cache = ModelCache(cache_dir=str(tmp_path), max_bytes=150)
+
+    paths = []
+    for i in range(2):
+        url = f"memory://models/grace/model{i}.pb"
+        _write_remote(url, bytes(100))
+        paths.append(cache.fetch(url))
+
+    # Recently fetched models may still be read by other processes
+    assert all(os.path.exists(path) for path in paths)
+
+
+def test_model_cache_derived_files(tmp_path):
+    cache = ModelCache(cache_dir=str(tmp_path), max_bytes=250, grace_period_s=0.0)
+
+    url = "memory://models/derived/model.onnx"
+    _write_remote(url, bytes(100))
+    path = cache.fetch(url)
+    derived_dir = cache.derived_dir("model-key")
+    assert os.path.dirname(derived_dir) == str(tmp_path)
+    with open(os.path.join(derived_dir, "inferred.onnx"), "wb") as f:
+        f.write(bytes(100))
+
+    # The derived file counts towards the cache size, so the model is evicted
+    _write_remote("memory://models/derived/other.onnx", bytes(100))
+    cache.fetch("memory://models/derived/other.onnx")
+    assert not os.path.exists(path)
+    assert os.path.exists(derived_dir)
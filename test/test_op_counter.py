@@ -0,0 +1,71 @@
+#
+# Copyright (c) 2024 hannah-tvm contributors.
+#
+# This file is part of hannah-tvm.
+# See https://atreus.informatik.uni-tuebingen.de/ties/ai/hannah/hannah-tvm for further info.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+import pytest
+
+try:
+    import tvm
+except ImportError:
+    pytest.skip("TVM not available", allow_module_level=True)
+
+
+import tvm.te as te
+
+from hannah_tvm.passes.op_counter import OpCounter, op_counter
+
+
+def _vector_add(n=1024, dtype="float32"):
+    A = te.placeholder((n,), name="A", dtype=dtype)
+    B = te.placeholder((n,), name="B", dtype=dtype)
+    C = te.compute((n,), lambda i: A[i] + B[i], name="C")
+    s = te.create_schedule(C.op)
+
+    return tvm.lower(s, [A, B, C], name="vector_add")
+
+
+def test_count_float():
+    mod = _vector_add(1024, "float32")
+    counts = OpCounter().count(mod["vector_add"])
+
+    assert counts.flops == 1024
+    assert counts.int_ops == 0
+    assert counts.bytes_loaded == 2 * 1024 * 4
+    assert counts.bytes_stored == 1024 * 4
+
+
+def test_count_int():
+    mod = _vector_add(256, "int8")
+    counts = OpCounter().count(mod["vector_add"])
+
+    assert counts.flops == 0
+    assert counts.int_ops == 256
+    assert counts.bytes == 3 * 256
+
+
+def test_op_counter_pass():
+    mod = _vector_add(16, "float32")
+    counter = OpCounter()
+    op_counter(counter)(mod)
+
+    assert counter.counts["vector_add"].flops == 16
+
+
+if __name__ == "__main__":
+    test_count_float()
+    test_count_int()
+    test_op_counter_pass()
@@ -0,0 +1,97 @@
+#
+# Copyright (c) 2024 hannah-tvm contributors.
+#
+# This file is part of hannah-tvm.
+# See https://atreus.informatik.uni-tuebingen.de/ties/ai/hannah/hannah-tvm for further info.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import time
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from hannah_tvm.connectors.power import (
+    FilePowerSensor,
+    PowerSampler,
+    PowerTrace,
+    summarize_power,
+)
+
+
+def test_file_power_sensor(tmp_path):
+    (tmp_path / "gpu").write_text("1500\n")
+    (tmp_path / "cpu").write_text("500\n")
+
+    sensor = FilePowerSensor(
+        {"GPU": str(tmp_path / "gpu"), "CPU": str(tmp_path / "cpu")}
+    )
+    assert sensor.read() == pytest.approx({"GPU": 1.5, "CPU": 0.5})
+
+    with PowerSampler(sensor, interval_s=0.01) as sampler:
+        time.sleep(0.1)
+    assert len(sampler.trace.samples) > 2
+    assert sampler.trace.total_power() == pytest.approx(2.0)
+
+
+def test_power_trace_average():
+    trace = PowerTrace(
+        timestamps=[0.0, 1.0, 3.0],
+        samples=[{"VDD": 1.0}, {"VDD": 3.0}, {"VDD": 3.0}],
+    )
+    # 2 J in the first second and 6 J in the following two seconds
+    assert trace.average_power() == pytest.approx({"VDD": 8.0 / 3.0})
+
+
+def test_summarize_power():
+    traces = [
+        PowerTrace(timestamps=[0.0, 1.0], samples=[{"CPU": 1.0, "GPU": 2.0}] * 2),
+        PowerTrace(),
+        PowerTrace(timestamps=[0.0, 1.0], samples=[{"CPU": 3.0}] * 2),
+    ]
+    latencies = [np.array([10.0]), np.array([20.0]), np.array([30.0])]
+
+    rail_power, energy = summarize_power(traces, latencies)
+
+    # The empty trace is skipped, and GPU is not measured in all traces
+    assert rail_power == pytest.approx({"CPU": 2.0})
+    assert energy == pytest.approx((1.0 * 10.0 + 3.0 * 30.0) / 2)
+
+
+def test_summarize_power_without_samples():
+    assert summarize_power([PowerTrace()], [np.array([10.0])]) == ({}, None)
+
+
+class FakeConnection:
+    def __init__(self, files):
+        self.files = files
+        self.closed = False
+
+    def run(self, command, hide=False):
+        paths = command.split()[1:]
+        return SimpleNamespace(stdout="\n".join(self.files[path] for path in paths))
+
+    def close(self):
+        self.closed = True
+
+
+def test_automate_power_sensor():
+    pytest.importorskip("tvm")
+    from hannah_tvm.connectors.automate import AutomatePowerSensor
+
+    connection = FakeConnection({"/sys/gpu": "1500\n", "/sys/cpu": "500\n"})
+    sensor = AutomatePowerSensor(connection, {"GPU": "/sys/gpu", "CPU": "/sys/cpu"})
+    assert sensor.read() == pytest.approx({"GPU": 1.5, "CPU": 0.5})
+
+    sensor.close()
+    assert connection.closed
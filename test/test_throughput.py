@@ -0,0 +1,152 @@
+#
+# Copyright (c) 2024 hannah-tvm contributors.
+#
+# This file is part of hannah-tvm.
+# See https://atreus.informatik.uni-tuebingen.de/ties/ai/hannah/hannah-tvm for further info.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import time
+
+import numpy as np
+import pytest
+
+from hannah_tvm.connectors.throughput import parse_cpu_times, run_streams
+
+
+class SleepModule:
+    def __init__(self, duration_s):
+        self.duration_s = duration_s
+        self.runs = 0
+
+    def run(self):
+        self.runs += 1
+        time.sleep(self.duration_s)
+
+
+class Device:
+    def sync(self):
+        pass
+
+
+def test_run_streams():
+    modules = [SleepModule(0.01), SleepModule(0.01)]
+    streams = [lambda module=module: (module, Device()) for module in modules]
+
+    proc_stats = iter(
+        [
+            "cpu  100 0 100 800 0 0 0 0 0 0\ncpu0 100 0 100 800 0 0 0 0 0 0\n",
+            "cpu  250 0 150 900 0 0 0 0 0 0\ncpu0 250 0 150 900 0 0 0 0 0 0\n",
+        ]
+    )
+    result = run_streams(
+        streams,
+        0.2,
+        warmup_runs=2,
+        batch_size=4,
+        read_proc_stat=lambda: next(proc_stats),
+    )
+
+    assert result.streams == 2
+    assert all(len(latencies) > 5 for latencies in result.latencies_us)
+    assert result.inferences == sum(module.runs - 2 for module in modules)
+    assert result.samples_per_second == pytest.approx(4 * result.inferences_per_second)
+    assert result.cpu_utilization == pytest.approx(200 / 300 * 100)
+
+    summary = result.summary()
+    assert 10000 <= summary["latency_p50"] <= summary["latency_p99"]
+
+
+def test_run_streams_error():
+    def failing_stream():
+        raise RuntimeError("no device")
+
+    with pytest.raises(RuntimeError):
+        run_streams([failing_stream, lambda: (SleepModule(0.0), Device())], 0.1)
+
+
+def test_parse_cpu_times():
+    busy, total = parse_cpu_times("cpu  10 1 5 80 4 0 0 0 0 0\nintr 1 2\n")
+    assert total == 100
+    assert busy == 16
+
+
+def _start_board_servers(board_name, num_servers):
+    pytest.importorskip("tvm")
+    from tvm import rpc
+    from tvm.rpc.tracker import Tracker
+
+    tracker = Tracker(host="127.0.0.1", port=9190, port_end=9290, silent=True)
+    servers = [
+        rpc.Server(
+            host="127.0.0.1",
+            port=9300,
+            port_end=9400,
+            key=board_name,
+            tracker_addr=("127.0.0.1", tracker.port),
+            silent=True,
+        )
+        for _ in range(num_servers)
+    ]
+
+    tracker_conn = rpc.connect_tracker("127.0.0.1", tracker.port)
+    for _ in range(100):
+        queue_info = tracker_conn.summary()["queue_info"]
+        if queue_info.get(board_name, {}).get("free", 0) == num_servers:
+            break
+        time.sleep(0.1)
+    return tracker, servers
+
+
+def _measure_automate_throughput(num_servers, streams):
+    tvm = pytest.importorskip("tvm")
+    omegaconf = pytest.importorskip("omegaconf")
+    from tvm import relay
+
+    from hannah_tvm.config import ThroughputConfig
+    from hannah_tvm.connectors.automate import AutomateTaskConnector
+
+    board_config = omegaconf.OmegaConf.create(
+        {"name": "test-board", "target": "llvm", "target_host": "llvm"}
+    )
+    tracker, servers = _start_board_servers(board_config.name, num_servers)
+    try:
+        connector = AutomateTaskConnector(board_config, tracker.port)
+        connector.setup()
+
+        x = relay.var("x", shape=(1, 16), dtype="float32")
+        mod = tvm.IRModule.from_expr(relay.Function([x], relay.nn.relu(x)))
+        lib = relay.build(mod, target=connector.target())
+
+        # The session of the handle stays open while the streams run
+        remote_handle = connector.upload(lib)
+        return connector.measure_throughput(
+            remote_handle,
+            {"x": np.random.rand(1, 16).astype("float32")},
+            ThroughputConfig(streams=streams, duration_s=0.2, warmup_runs=1),
+        )
+    finally:
+        for server in servers:
+            server.terminate()
+        tracker.terminate()
+
+
+def test_automate_throughput_sessions():
+    result = _measure_automate_throughput(num_servers=3, streams=2)
+
+    assert result.streams == 2
+    assert all(len(latencies) > 0 for latencies in result.latencies_us)
+
+
+def test_automate_throughput_missing_servers():
+    with pytest.raises(Exception, match="idle rpc servers"):
+        _measure_automate_throughput(num_servers=2, streams=2)
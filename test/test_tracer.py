@@ -60,10 +60,15 @@ try:
     from hannah.models.factory.reduction import ReductionBlockAdd
     from hannah.quantization.rounding import round_upward
 
+    from hannah_tvm.passes.legalize import LegalizeQuantizedTypes
     from hannah_tvm.tracer import (
-        LegalizeQuantizedTypes,
+        MODULE_CONVERTERS,
+        ConversionError,
         QuantizationTracer,
         RelayConverter,
+        pack_subbyte,
+        register_module_converter,
+        unpack_subbyte,
     )
 except ImportError:
     pytest.skip("hannah is not available", allow_module_level=True)
@@ -194,6 +199,7 @@ def run_test(
     approximate=False,
     target="llvm",
     output_scale=None,  # If none it is inferred from target
+    pack_weights=False,
 ):
     print(cell)
     cell.eval()
@@ -206,6 +212,7 @@ def run_test(
         input_scale=1 / 2 ** (input_bits - 1),
         accumulator_dtype="int20",
         input_dtype=f"int{input_bits}",
+        pack_weights=pack_weights,
     )
 
     input = torch.rand(input_shape)
@@ -338,6 +345,119 @@ def test_tracer(dim, act, bw_w, bw_f, bw_b, target):
     run_test(cell, input_shape, act, input_bits, output_bits, "int8", target=target)
 
 
+@pytest.mark.parametrize("dim,act", [(1, False), (1, True), (2, False), (2, True)])
+def test_tracer_shape_only(dim, act):
+    cell = Cell(dim=dim, act=act, bw_w=4, bw_f=4, bw_b=8)
+    cell.eval()
+    input_shape = (1, 4, 4) if dim == 1 else (1, 4, 4, 4)
+    input = torch.rand(input_shape)
+
+    results = []
+    for shape_only in [False, True]:
+        graph_module = torch.fx.GraphModule(cell, QuantizationTracer().trace(cell))
+        converter = RelayConverter(
+            graph_module,
+            input_scale=1 / 2**3,
+            accumulator_dtype="int20",
+            input_dtype="int4",
+            shape_only=shape_only,
+        )
+        results.append(converter.run(input))
+
+    (mod, params), (mod_shape_only, params_shape_only) = results
+    assert tvm.ir.structural_equal(mod, mod_shape_only)
+    assert params.keys() == params_shape_only.keys()
+    for name in params:
+        np.testing.assert_array_equal(
+            params[name].numpy(), params_shape_only[name].numpy()
+        )
+
+
+def test_tracer_fused_relu():
+    cell = Cell(dim=2, act=True, bw_w=4, bw_f=4, bw_b=8)
+    cell.eval()
+    graph_module = torch.fx.GraphModule(cell, QuantizationTracer().trace(cell))
+    converter = RelayConverter(graph_module, input_scale=1 / 2**3, input_dtype="int4")
+
+    mod, params = converter.run(torch.rand(1, 4, 4, 4))
+    mod = LegalizeQuantizedTypes()(tvm.relay.transform.InferType()(mod))
+
+    ops = []
+    tvm.relay.analysis.post_order_visit(
+        mod["main"],
+        lambda expr: ops.append(expr.op.name)
+        if isinstance(expr, tvm.relay.Call) and isinstance(expr.op, tvm.ir.Op)
+        else None,
+    )
+    assert "nn.relu" not in ops
+    for num in range(len(ops) - 1):
+        assert not (ops[num] == "clip" and ops[num + 1] == "clip")
+
+
+class CellClip(nn.Module):
+    def __init__(self):
+        super().__init__()
+        self.qconfig = get_trax_qat_qconfig(Config())
+        self.activation_post_process = self.qconfig.activation()
+        self.clip = nn.Hardtanh(-0.5, 0.5)
+
+    def forward(self, x):
+        x = self.activation_post_process(x)
+        return self.clip(x)
+
+
+def test_tracer_unsupported_module():
+    cell = CellClip()
+    graph_module = torch.fx.GraphModule(cell, QuantizationTracer().trace(cell))
+    converter = RelayConverter(graph_module)
+
+    assert converter.unsupported_nodes() == ["clip (Hardtanh)"]
+    with pytest.raises(ConversionError) as excinfo:
+        converter.run(torch.rand(1, 8))
+    assert excinfo.value.nodes == ["clip (Hardtanh)"]
+
+
+def test_tracer_register_module_converter():
+    @register_module_converter(nn.Hardtanh)
+    def convert_hardtanh(converter, node, module, result):
+        data, info = converter.get_input(node)
+        scale = 1 / info.scale
+        clip = tvm.relay.clip(
+            data, int(module.min_val * scale), int(module.max_val * scale)
+        )
+        converter.set_output(node, clip, info)
+
+    try:
+        cell = CellClip()
+        graph_module = torch.fx.GraphModule(cell, QuantizationTracer().trace(cell))
+        converter = RelayConverter(graph_module)
+
+        assert converter.unsupported_nodes() == []
+        mod, params = converter.run(torch.rand(1, 8))
+        assert "clip" in str(mod)
+    finally:
+        MODULE_CONVERTERS.pop(nn.Hardtanh)
+
+
+@pytest.mark.parametrize("bits", [1, 2, 3, 4])
+def test_pack_subbyte(bits):
+    values = np.random.randint(-(2 ** (bits - 1)), 2 ** (bits - 1), size=(5, 3, 7))
+    packed = pack_subbyte(values, bits)
+    assert packed.dtype == np.uint8
+    assert packed.size == -(-values.size // (8 // bits))
+    np.testing.assert_array_equal(unpack_subbyte(packed, values.shape, bits), values)
+
+
+@pytest.mark.parametrize(
+    "dim,act,bw_w,target",
+    [(1, True, 2, "llvm"), (2, False, 3, "llvm"), (2, True, 4, "c")],
+)
+def test_tracer_packed_weights(dim, act, bw_w, target):
+    cell = Cell(dim=dim, act=act, bw_w=bw_w, bw_f=4, bw_b=8)
+    input_shape = (1, 4, 4) if dim == 1 else (1, 4, 4, 4)
+    run_test(cell, input_shape, act, 4, 4, "int8", target=target, pack_weights=True)
+
+
 class CellReduction(nn.Module):
     def __init__(self, dim=1, act=False, bw_w=8, bw_b=8, bw_f=8):
         super().__init__()
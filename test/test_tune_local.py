@@ -24,9 +24,16 @@ except ImportError:
     pytest.skip("TVM not available", allow_module_level=True)
 
 
+import json
+import math
+
 from hydra import compose, initialize
+from omegaconf import OmegaConf
 
 import hannah_tvm.config
+from hannah_tvm.config import Model, ThreadSweepConfig
+from hannah_tvm.experiment_scheduler import sweep_points
+from hannah_tvm.task import thread_sweep_points
 from hannah_tvm.tune import main
 
 
@@ -56,6 +63,76 @@ def test_autotvm():
         main(cfg)
 
 
+def test_sweep_points():
+    config = OmegaConf.structured(
+        Model(
+            url="model.onnx",
+            batch_sizes=[1, 4],
+            input_shape_sweep=[{"x": [1, 3, 32, 32]}, {"x": [1, 3, 64, 64]}],
+        )
+    )
+
+    points = sweep_points("net", config)
+    assert [name for name, _ in points] == [
+        "net_1x3x32x32_bs1",
+        "net_1x3x32x32_bs4",
+        "net_1x3x64x64_bs1",
+        "net_1x3x64x64_bs4",
+    ]
+    name, point = points[1]
+    assert point.batch_size == 4
+    assert list(point.input_shapes["x"]) == [1, 3, 32, 32]
+    assert point.batch_sizes is None
+
+    assert sweep_points("net", OmegaConf.structured(Model(url="model.onnx"))) == [
+        ("net", OmegaConf.structured(Model(url="model.onnx")))
+    ]
+
+
+def test_thread_sweep_points():
+    config = OmegaConf.structured(
+        ThreadSweepConfig(
+            num_threads=[1, 2], affinity_modes=[1, -3], cpu_sets=[[0, 1], [2, 3]]
+        )
+    )
+
+    points = thread_sweep_points(config)
+    assert len(points) == 6
+    assert points[0] == {"affinity_mode": 1, "num_threads": 1, "cpus": None}
+    assert points[-1] == {"affinity_mode": -3, "num_threads": 2, "cpus": [2, 3]}
+
+
+def test_batch_size_sweep():
+    with initialize(config_path="../hannah_tvm/conf", version_base="1.2"):
+        cfg = compose(
+            config_name="config",
+            overrides=[
+                "model=sine",
+                "model.sine.batch_sizes=[1,2]",
+                "backend/board=local_cpu",
+                "backend/tuner=baseline",
+            ],
+        )
+        main(cfg)
+
+
+def test_measurement_throughput(tmp_path):
+    results = tmp_path / "network_results" / "board" / "baseline"
+    results.mkdir(parents=True)
+    # Throughput is only recorded by connectors measuring wall clock time
+    with (results / "net_bs4_llvm.json").open("w") as f:
+        json.dump(
+            {"Duration (us)": [100.0], "Batch Size": 4, "Throughput (1/s)": 40000.0},
+            f,
+        )
+    with (results / "micro_llvm.json").open("w") as f:
+        json.dump({"Duration (us)": [-1], "Batch Size": 1}, f)
+
+    df = DatasetFull(tmp_path).measurements().set_index("Model")
+    assert df.loc["net_bs4", "Throughput (1/s)"] == 40000.0
+    assert math.isnan(df.loc["micro", "Throughput (1/s)"])
+
+
 if __name__ == "__main__":
     test_auto_scheduler()
     test_autotvm()
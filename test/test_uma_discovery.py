@@ -42,3 +42,31 @@ def test_uma_backend_registry():
 
     assert "backend1" in backend_names
     assert "backend2" in backend_names
+
+
+@pytest.mark.skipif(
+    not uma_available(), reason='Only run if tvm has been compiled with "USE_UMA=ON"'
+)
+def test_uma_backend_index(tmp_path, monkeypatch):
+    index_file = tmp_path / "uma_backends.json"
+    monkeypatch.setattr(uma_backends, "INDEX_FILE", str(index_file))
+    monkeypatch.setattr(uma_backends, "_INDEX", None)
+
+    index = uma_backends.index()
+    assert index["backend1"].endswith(":MyBackend1")
+    assert index["backend2"].endswith(":MyBackend2")
+    assert index_file.exists()
+
+    with pytest.raises(ValueError):
+        uma_backends.register("unknown_backend")
+
+    # A fresh process reads the index without scanning the backend packages
+    monkeypatch.setattr(uma_backends, "_INDEX", None)
+    monkeypatch.setattr(
+        uma_backends, "_scan_all", lambda top_level: pytest.fail("index not reused")
+    )
+    assert uma_backends.index() == index
+
+    backend = uma_backends.register("backend2")
+    assert backend.target_name == "backend2"
+    assert uma_backends.register("backend2") is backend